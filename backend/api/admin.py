@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 
+from .recipe_cache import touch_recipes
+from .services import change_cart_totals, sync_recipe_cart_totals
+
 from .models import (
     FoodgramUser,
     Recipe,
@@ -9,7 +13,9 @@ from .models import (
     RecipeIngredient,
     Favorite,
     ShoppingCart,
+    ShoppingCartTotal,
     Subscription,
+    Job,
 )
 
 
@@ -45,7 +51,7 @@ class FoodgramUserAdmin(UserAdmin):
         """
         if user.avatar:
             return (
-                f'<img src="{user.avatar.url}" '
+                f'<img src="{user.avatar.rendition_url("avatar", "webp")}" '
                 f'width="50" height="50" style="border-radius: 50%;" />'
             )
         return "-"
@@ -122,7 +128,7 @@ class RecipeAdmin(admin.ModelAdmin):
         """
         if recipe.image:
             return (
-                f'<img src="{recipe.image.url}"'
+                f'<img src="{recipe.image.rendition_url("admin", "webp")}" '
                 f'width="100" height="100" style="object-fit: cover;" />'
             )
         return "-"
@@ -148,6 +154,21 @@ class IngredientAdmin(admin.ModelAdmin):
         """
         return ingredient.recipe_ingredients.count()
 
+    # Удаление ингредиента удаляет его из рецептов каскадом, без сигналов.
+    def delete_model(self, request, ingredient):
+        recipe_ids = list(
+            ingredient.recipe_ingredients.values_list("recipe_id", flat=True)
+        )
+        super().delete_model(request, ingredient)
+        touch_recipes(recipe_ids)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(RecipeIngredient.objects.filter(
+            ingredient__in=queryset
+        ).values_list("recipe_id", flat=True))
+        super().delete_queryset(request, queryset)
+        touch_recipes(recipe_ids)
+
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
@@ -155,6 +176,28 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
 
     list_display = ("id", "recipe", "ingredient", "amount")
 
+    # Правки через админку переносятся в итоги корзин (ShoppingCartTotal)
+    # и отмечаются в изменённых рецептах.
+    def save_model(self, request, recipe_ingredient, form, change):
+        recipe_ids = [recipe_ingredient.recipe_id]
+        if change:
+            recipe_ids.append(form.initial["recipe"])
+        with sync_recipe_cart_totals(recipe_ids):
+            super().save_model(request, recipe_ingredient, form, change)
+        touch_recipes(recipe_ids)
+
+    def delete_model(self, request, recipe_ingredient):
+        recipe_ids = [recipe_ingredient.recipe_id]
+        with sync_recipe_cart_totals(recipe_ids):
+            super().delete_model(request, recipe_ingredient)
+        touch_recipes(recipe_ids)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list("recipe_id", flat=True))
+        with sync_recipe_cart_totals(recipe_ids):
+            super().delete_queryset(request, queryset)
+        touch_recipes(recipe_ids)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -171,6 +214,33 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "recipe")
     list_filter = ("user", "recipe")
 
+    # Правки через админку переносятся в итоги корзин (ShoppingCartTotal).
+    def save_model(self, request, cart_item, form, change):
+        if change:
+            change_cart_totals(
+                form.initial["user"], form.initial["recipe"], sign=-1
+            )
+        super().save_model(request, cart_item, form, change)
+        change_cart_totals(cart_item.user_id, cart_item.recipe_id)
+
+    def delete_model(self, request, cart_item):
+        change_cart_totals(cart_item.user_id, cart_item.recipe_id, sign=-1)
+        super().delete_model(request, cart_item)
+
+    def delete_queryset(self, request, queryset):
+        for user_id, recipe_id in queryset.values_list("user_id", "recipe_id"):
+            change_cart_totals(user_id, recipe_id, sign=-1)
+        super().delete_queryset(request, queryset)
+
+
+@admin.register(ShoppingCartTotal)
+class ShoppingCartTotalAdmin(admin.ModelAdmin):
+    """Просмотр итогов списков покупок."""
+
+    list_display = ("id", "user", "ingredient", "total_amount")
+    list_filter = ("user",)
+    list_select_related = ("user", "ingredient")
+
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -178,3 +248,20 @@ class SubscriptionAdmin(admin.ModelAdmin):
 
     list_display = ("id", "user", "author")
     list_filter = ("user", "author")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Просмотр очереди фоновых задач."""
+
+    list_display = ("id", "name", "status", "attempts", "run_at", "locked_by")
+    list_filter = ("status", "name")
+    readonly_fields = ("created_at", "locked_by", "locked_at", "last_error")
+    actions = ("retry",)
+
+    @admin.action(description="Повторить выбранные задачи")
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.QUEUED, attempts=0, last_error="",
+            run_at=timezone.now(),
+        )
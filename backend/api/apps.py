@@ -3,8 +3,10 @@ from django.db.models.signals import post_migrate
 from django.core.management import call_command
 
 
-def load_initial_data(sender, **kwargs):
-    call_command("load_initial_data")
+def load_initial_data(sender, verbosity=1, **kwargs):
+    # Файла с каталогом может не быть (тесты, разработка): загрузка
+    # идемпотентна и повторяется после каждой миграции.
+    call_command("load_initial_data", missing_ok=True, verbosity=verbosity)
 
 
 class ApiConfig(AppConfig):
@@ -12,4 +14,6 @@ class ApiConfig(AppConfig):
     name = "api"
 
     def ready(self):
+        from . import signals  # noqa: F401
+
         post_migrate.connect(load_initial_data, sender=self)
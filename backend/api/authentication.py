@@ -0,0 +1,148 @@
+"""
+Аутентификация по токену без запроса к базе данных на каждый запрос.
+
+Значения полей пользователя и токена хранятся в ограниченном
+LRU-кэше процесса с временем жизни AUTH_TOKEN_CACHE_TTL и, если
+AUTH_TOKEN_CACHE_SHARED включён, в общем кэше Django. Актуальность
+записи проверяется по версии токена в общем кэше (см. versioning):
+удаление токена (выход через djoser token/logout) и изменение
+пользователя меняют версию, и запись перестаёт использоваться во всех
+процессах сразу.
+Без общего кэша другие процессы узнают об изменении только по
+истечении времени жизни записи.
+
+В кэше лежат только кортежи значений полей: на каждый запрос по ним
+создаются новые объекты пользователя и токена, поэтому запросы не
+делят состояние моделей (_state, кэш связей, FieldFile аватара).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+
+from .versioning import bump_version, get_version
+
+
+def get_token_cache_key(key):
+    # Сам токен в ключ кэша не попадает.
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+class TokenLRUCache:
+    """
+    LRU-кэш процесса: ключ — (значение, версия, срок годности).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, entry_version, expires = entry
+            if entry_version != version or expires < monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, version):
+        ttl = getattr(settings, "AUTH_TOKEN_CACHE_TTL", 300)
+        max_size = getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 10000)
+        with self._lock:
+            self._entries[key] = (value, version, monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenLRUCache()
+
+
+def is_shared():
+    return getattr(settings, "AUTH_TOKEN_CACHE_SHARED", True)
+
+
+def invalidate_tokens(keys):
+    """
+    Сбрасывает закэшированные пользователей токенов keys.
+    """
+    cache_keys = [get_token_cache_key(key) for key in keys]
+    for cache_key in cache_keys:
+        token_cache.pop(cache_key)
+    if cache_keys and is_shared():
+        bump_version(*cache_keys)
+
+
+def freeze(instance):
+    """
+    Значения полей instance в порядке concrete_fields.
+    """
+    return tuple(
+        getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    )
+
+
+def thaw(model, values):
+    """
+    Новый объект model из значений, сохранённых freeze().
+    """
+    return model.from_db(
+        router.db_for_read(model),
+        [field.attname for field in model._meta.concrete_fields],
+        values,
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшированием результата проверки токена.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        version = get_version(cache_key) if is_shared() else None
+        credentials = token_cache.get(cache_key, version)
+        if credentials is None:
+            credentials = self.load_credentials(key, cache_key, version)
+            token_cache.set(cache_key, credentials, version)
+        user_values, token_values = credentials
+        model = self.get_model()
+        user = thaw(model.user.field.related_model, user_values)
+        token = thaw(model, token_values)
+        token.user = user
+        return user, token
+
+    def load_credentials(self, key, cache_key, version):
+        credentials = None
+        shared_key = f"{cache_key}:{version}"
+        if is_shared():
+            credentials = cache.get(shared_key)
+        if credentials is None:
+            # Неверный токен или неактивный пользователь — исключение,
+            # такие ответы не кэшируются.
+            user, token = super().authenticate_credentials(key)
+            credentials = freeze(user), freeze(token)
+            if is_shared():
+                cache.set(
+                    shared_key, credentials,
+                    getattr(settings, "AUTH_TOKEN_CACHE_TTL", 300),
+                )
+        return credentials
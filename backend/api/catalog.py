@@ -0,0 +1,217 @@
+"""
+Каталог ингредиентов в памяти процесса.
+
+Каталог небольшой и почти не меняется, поэтому автодополнение по
+началу названия обслуживается без обращения к базе данных, а готовые
+JSON-ответы (вместе со сжатыми вариантами) хранятся в памяти.
+Актуальность отслеживается по версии каталога в кэше Django: сигналы
+модели Ingredient меняют версию, и данные каждого процесса
+перестраиваются при следующем обращении.
+"""
+import bisect
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from .renderers import FastJSONRenderer
+from .versioning import bump_version, get_version
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+CATALOG_VERSION_KEY = "ingredient-catalog-version"
+
+# Полный каталог сжимается один раз на версию и процесс, поэтому
+# сильнее всего. Ответы по префиксам сжимаются на каждом промахе
+# кэша в запросе пользователя: быстрые уровни.
+FULL_GZIP_LEVEL = 9
+FULL_BROTLI_QUALITY = 11
+PREFIX_GZIP_LEVEL = 1
+PREFIX_BROTLI_QUALITY = 4
+
+# Символ, который больше любого символа в названии: верхняя граница
+# диапазона строк с заданным префиксом.
+_MAX_CHAR = "\U0010ffff"
+
+
+def get_catalog_version():
+    """
+    Текущая версия каталога ингредиентов.
+    """
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """
+    Отмечает каталог изменённым во всех процессах.
+    """
+    bump_version(CATALOG_VERSION_KEY)
+
+
+class IngredientPrefixIndex:
+    """
+    Отсортированный по названию (без учёта регистра) массив
+    ингредиентов с поиском по префиксу через bisect.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (версия, ключи поиска, строки) заменяются одним присваиванием,
+        # чтобы параллельные запросы видели согласованный снимок.
+        self._snapshot = (None, [], [])
+
+    def _get_snapshot(self):
+        version = get_catalog_version()
+        snapshot = self._snapshot
+        if snapshot[0] == version:
+            return snapshot
+        with self._lock:
+            if self._snapshot[0] != version:
+                self._snapshot = self._build(version)
+            return self._snapshot
+
+    @staticmethod
+    def _build(version):
+        from .models import Ingredient
+
+        rows = sorted(
+            Ingredient.objects.values(
+                "id", "name", "measurement_unit"
+            ).order_by().iterator(),
+            key=lambda row: (row["name"].casefold(), row["name"], row["id"]),
+        )
+        return version, [row["name"].casefold() for row in rows], rows
+
+    def search(self, prefix):
+        """
+        Ингредиенты, название которых начинается с prefix.
+
+        :param prefix: Начало названия (регистр не учитывается).
+        :return: Список словарей с полями id, name, measurement_unit.
+        """
+        _, keys, rows = self._get_snapshot()
+        key = prefix.casefold()
+        start = bisect.bisect_left(keys, key)
+        end = bisect.bisect_left(keys, key + _MAX_CHAR, lo=start)
+        return rows[start:end]
+
+
+ingredient_index = IngredientPrefixIndex()
+
+
+class CatalogPayload:
+    """
+    Готовый JSON-ответ каталога: тело, сжатые варианты и их ETag.
+    Полный каталог (full) сжимается сильнее ответов по префиксу.
+    """
+
+    def __init__(self, version, body, full=False):
+        digest = hashlib.md5(body).hexdigest()
+        self.tag = f"{version}-{digest}"
+        self.variants = {
+            "identity": body,
+            "gzip": gzip.compress(
+                body, mtime=0,
+                compresslevel=FULL_GZIP_LEVEL if full else PREFIX_GZIP_LEVEL,
+            ),
+        }
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(
+                body,
+                quality=FULL_BROTLI_QUALITY if full else PREFIX_BROTLI_QUALITY,
+            )
+
+    def etag(self, encoding):
+        # Сильный ETag должен различаться для разных Content-Encoding.
+        if encoding == "identity":
+            return f'"{self.tag}"'
+        return f'"{self.tag}-{encoding}"'
+
+    def matches(self, if_none_match):
+        if if_none_match.strip() == "*":
+            return True
+        tags = {self.etag(encoding) for encoding in self.variants}
+        return any(
+            tag.strip().removeprefix("W/") in tags
+            for tag in if_none_match.split(",")
+        )
+
+    def choose_encoding(self, accept_encoding):
+        accepted = set()
+        for item in accept_encoding.split(","):
+            coding, _, params = item.strip().partition(";")
+            if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00"):
+                accepted.add(coding.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return "identity"
+
+
+class CatalogPayloadCache:
+    """
+    Ограниченный LRU-кэш ответов каталога: полного списка и результатов
+    поиска по частым префиксам.
+    """
+
+    max_entries = 256
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._payloads = OrderedDict()
+
+    def get(self, prefix=""):
+        version = get_catalog_version()
+        key = prefix.casefold()
+        with self._lock:
+            if self._version != version:
+                self._version = version
+                self._payloads.clear()
+            payload = self._payloads.get(key)
+            if payload is not None:
+                self._payloads.move_to_end(key)
+                return payload
+        body = FastJSONRenderer().render(ingredient_index.search(prefix))
+        payload = CatalogPayload(version, body, full=not key)
+        with self._lock:
+            if self._version == version:
+                self._payloads[key] = payload
+                if len(self._payloads) > self.max_entries:
+                    self._payloads.popitem(last=False)
+        return payload
+
+
+catalog_payloads = CatalogPayloadCache()
+
+
+def catalog_response(request, prefix=""):
+    """
+    Ответ со списком ингредиентов, начинающихся с prefix.
+
+    Сериализация не выполняется: отдаются готовые байты в подходящем
+    сжатии, а на совпавший If-None-Match — 304.
+    """
+    payload = catalog_payloads.get(prefix)
+    encoding = payload.choose_encoding(
+        request.META.get("HTTP_ACCEPT_ENCODING", "")
+    )
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match and payload.matches(if_none_match):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            payload.variants[encoding], content_type="application/json"
+        )
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+    response["ETag"] = payload.etag(encoding)
+    response["Cache-Control"] = "no-cache"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,73 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) к рецептам и профилям.
+
+Валидаторы считаются до сериализации: по updated_at рецептов и
+авторов, версии каталога ингредиентов и версии состояния зрителя.
+Версия состояния зрителя меняется при изменении его избранного,
+корзины и подписок, поэтому флаги is_favorited, is_in_shopping_cart и
+is_subscribed в закэшированном клиентом ответе остаются верными.
+Last-Modified отдаётся только анонимным зрителям: у аутентифицированных
+ответ зависит ещё и от состояния зрителя, у которого нет даты.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .catalog import CATALOG_VERSION_KEY
+from .versioning import bump_version, get_versions
+
+
+def viewer_state_key(user_id):
+    return f"viewer-state:{user_id}"
+
+
+def bump_viewer_state(user_id):
+    """
+    Отмечает изменение избранного, корзины или подписок пользователя.
+    """
+    bump_version(viewer_state_key(user_id))
+
+
+def make_etag(request, *parts):
+    """
+    Сильный ETag по частям parts, версии каталога и состоянию зрителя.
+    """
+    user = request.user
+    keys = [CATALOG_VERSION_KEY]
+    if user.is_authenticated:
+        keys.append(viewer_state_key(user.pk))
+    versions = get_versions(keys)
+    digest = hashlib.md5(repr((
+        parts,
+        # Ссылки на изображения в ответах абсолютные.
+        request.build_absolute_uri("/"),
+        user.pk,
+        [versions[key] for key in keys],
+    )).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional_get(request, get_response, etag, last_modified=None):
+    """
+    Ответ 304, если валидаторы клиента совпали, иначе get_response()
+    с заголовками ETag и Last-Modified.
+
+    :param last_modified: datetime последнего изменения или None.
+    """
+    if request.user.is_authenticated:
+        last_modified = None
+    timestamp = last_modified and int(last_modified.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = get_response()
+    response["ETag"] = etag
+    if timestamp:
+        response["Last-Modified"] = http_date(timestamp)
+    response["Cache-Control"] = (
+        "private, no-cache" if request.user.is_authenticated else "no-cache"
+    )
+    patch_vary_headers(response, ("Authorization", "Cookie"))
+    return response
@@ -0,0 +1,66 @@
+"""
+Поля сериализаторов для изображений с рендишенами (см. api.images).
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from .images import RENDITION_FORMATS, process_image
+
+
+class ProcessedImageField(Base64ImageField):
+    """
+    Base64ImageField, который проверяет изображение и убирает метаданные
+    за одно декодирование.
+    """
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(data, str):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        if ";base64," in data:
+            data = data.split(";base64,", 1)[1]
+        max_size = getattr(settings, "IMAGE_MAX_UPLOAD_SIZE", 10 * 1024 * 1024)
+        if len(data) // 4 * 3 > max_size:
+            raise serializers.ValidationError(
+                f"Файл больше {max_size // (1024 * 1024)} МБ."
+            )
+        try:
+            raw = base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        try:
+            return process_image(raw)
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.messages)
+
+
+class ImageRenditionsField(serializers.Field):
+    """
+    Адреса рендишенов изображения: {имя: {"webp": URL, "jpeg": URL}}.
+    Ещё не построенные рендишены заменяются адресом оригинала.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, file):
+        if not file:
+            return None
+        return {
+            rendition: {
+                fmt: self.build_url(file.rendition_url(rendition, fmt))
+                for fmt in RENDITION_FORMATS
+            }
+            for rendition in file.field.renditions
+        }
+
+    def build_url(self, url):
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
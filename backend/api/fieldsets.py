@@ -0,0 +1,141 @@
+"""
+Выборочный вывод полей: параметры ?fields= и ?omit=.
+
+Оба параметра — списки полей через запятую, вложенные поля задаются
+через точку: ?fields=id,name,image,cooking_time,author.first_name
+оставляет в карточке рецепта только эти поля, ?omit=text,ingredients
+убирает перечисленные. Неизвестные имена игнорируются.
+
+Представления, поддерживающие выборку, передают набор полей
+корневому сериализатору в context["fieldset"] и по нему же сужают
+запрос к базе данных (only(), без лишних аннотаций и предвыборок).
+"""
+from rest_framework.serializers import ListSerializer
+
+
+def parse_field_paths(value):
+    """
+    Дерево полей по строке «a,b.c»: {"a": {}, "b": {"c": {}}}.
+    """
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldset:
+    """
+    Набор полей вывода.
+
+    :param only: Дерево оставляемых полей или None (все поля).
+    :param omit: Дерево убираемых полей: лист убирает поле целиком,
+        поддерево — поля вложенного объекта.
+    """
+
+    def __init__(self, only=None, omit=None):
+        self.only = only
+        self.omit = omit or {}
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        fields = params.get("fields")
+        return cls(
+            parse_field_paths(fields) if fields else None,
+            parse_field_paths(params.get("omit", "")),
+        )
+
+    def __bool__(self):
+        return self.only is not None or bool(self.omit)
+
+    def __repr__(self):
+        return f"SparseFieldset({self.only!r}, {self.omit!r})"
+
+    def includes(self, name):
+        if self.only is not None and name not in self.only:
+            return False
+        return not (name in self.omit and not self.omit[name])
+
+    def filter(self, names):
+        """
+        Поля из names, которые попадают в вывод.
+        """
+        return [name for name in names if self.includes(name)]
+
+    def require(self, *names):
+        """
+        Копия набора, в который всегда входят поля names.
+        """
+        only = None if self.only is None else {
+            **self.only, **{name: {} for name in names}
+        }
+        return SparseFieldset(only, {
+            name: tree for name, tree in self.omit.items()
+            if name not in names or tree
+        })
+
+    def child(self, name):
+        """
+        Набор полей вложенного объекта name.
+        """
+        only = None if self.only is None else self.only.get(name) or None
+        return SparseFieldset(only, self.omit.get(name))
+
+    def prune(self, data):
+        """
+        Копия готовых данных (словарей и списков) без лишних полей.
+        """
+        if not self:
+            return data
+        if isinstance(data, list):
+            return [self.prune(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+        return {
+            name: self.child(name).prune(value)
+            for name, value in data.items()
+            if self.includes(name)
+        }
+
+
+class SparseFieldsetMixin:
+    """
+    Сериализатор, выводящий только поля из набора.
+
+    Корневой сериализатор берёт набор из context["fieldset"], вложенные
+    получают свою часть от родителя или аргументом fieldset.
+    fieldset_aliases задаёт поля, которые выбираются под другим именем.
+    """
+
+    fieldset_aliases = {}
+
+    def __init__(self, *args, fieldset=None, **kwargs):
+        self.fieldset = fieldset
+        super().__init__(*args, **kwargs)
+
+    def get_fieldset(self):
+        if self.fieldset is not None:
+            return self.fieldset
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if parent is None:
+            return self.context.get("fieldset")
+        return None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.get_fieldset()
+        if not fieldset:
+            return fields
+        for name in list(fields):
+            if not fieldset.includes(self.fieldset_aliases.get(name, name)):
+                del fields[name]
+                continue
+            field = getattr(fields[name], "child", fields[name])
+            if isinstance(field, SparseFieldsetMixin):
+                field.fieldset = fieldset.child(name)
+        return fields
@@ -0,0 +1,264 @@
+"""
+Обработка загружаемых изображений рецептов и аватаров.
+
+Изображение из base64 декодируется один раз: размеры проверяются по
+заголовку до распаковки пикселей, затем сохраняется оригинал без
+метаданных (EXIF, ICC, комментарии), уменьшенный до
+IMAGE_MAX_STORED_SIDE. Уменьшенные копии (рендишены) для карточки,
+страницы рецепта, аватара и админки в WebP и JPEG строит фоновая
+задача build_renditions (см. api.jobs) после сохранения файла.
+
+Рендишены лежат рядом с оригиналом: recipes/images/<имя>.card.webp,
+и удаляются хранилищем вместе с ним (api.storage).
+Какие рендишены нужны полю модели, задаёт RenditionImageField, а
+поля сериализаторов — в api.fields.
+"""
+import io
+import posixpath
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from PIL import Image, ImageOps
+
+from .jobs import enqueue, job
+
+Rendition = namedtuple("Rendition", ("width", "height", "crop"))
+
+RENDITIONS = {
+    "card": Rendition(480, 320, crop=True),
+    "detail": Rendition(1200, 1200, crop=False),
+    "avatar": Rendition(50, 50, crop=True),
+    "admin": Rendition(100, 100, crop=True),
+}
+
+# Формат: (формат Pillow, расширение файла, параметры сохранения).
+RENDITION_FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {
+        "quality": 82, "optimize": True, "progressive": True,
+    }),
+}
+
+ALLOWED_FORMATS = ("JPEG", "PNG", "GIF", "WEBP")
+
+
+def encode_image(image, image_format, **options):
+    """
+    Байты изображения в формате image_format без метаданных.
+    """
+    if image_format == "JPEG" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def make_rendition(image, rendition):
+    """
+    Изображение, вписанное в размеры rendition или (crop) заполняющее
+    их с обрезкой по центру.
+
+    reducing_gap сначала сжимает изображение в целое число раз быстрым
+    методом, а LANCZOS применяется к уже уменьшенному.
+    """
+    width, height = image.size
+    if rendition.crop:
+        scale = max(rendition.width / width, rendition.height / height)
+        crop_width = rendition.width / scale
+        crop_height = rendition.height / scale
+        left = (width - crop_width) / 2
+        top = (height - crop_height) / 2
+        return image.resize(
+            (rendition.width, rendition.height), Image.LANCZOS,
+            box=(left, top, left + crop_width, top + crop_height),
+            reducing_gap=3.0,
+        )
+    scale = min(rendition.width / width, rendition.height / height, 1)
+    size = (max(round(width * scale), 1), max(round(height * scale), 1))
+    return image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+
+def render_renditions(image, renditions):
+    """
+    Рендишены renditions: {(имя, формат): байты}.
+    """
+    files = {}
+    for name in renditions:
+        resized = make_rendition(image, RENDITIONS[name])
+        for fmt, (image_format, _, options) in RENDITION_FORMATS.items():
+            files[name, fmt] = encode_image(resized, image_format, **options)
+    return files
+
+
+def open_image(raw):
+    """
+    Декодированное изображение из байтов raw с учётом ориентации EXIF.
+
+    :raises ValidationError: Не изображение, неподдерживаемый формат
+        или слишком большие размеры.
+    """
+    max_side = getattr(settings, "IMAGE_MAX_SIDE", 8000)
+    max_pixels = getattr(settings, "IMAGE_MAX_PIXELS", 40_000_000)
+    stored_side = getattr(settings, "IMAGE_MAX_STORED_SIDE", 2560)
+    try:
+        # Читается только заголовок, пиксели ещё не распакованы.
+        image = Image.open(io.BytesIO(raw))
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError("Загрузите корректное изображение.")
+    if image.format not in ALLOWED_FORMATS:
+        raise ValidationError(
+            "Поддерживаются изображения JPEG, PNG, GIF и WebP."
+        )
+    width, height = image.size
+    if max(width, height) > max_side or width * height > max_pixels:
+        raise ValidationError(
+            f"Изображение больше {max_side} точек по стороне "
+            f"или {max_pixels} точек всего."
+        )
+    # JPEG распаковывается сразу в уменьшенном масштабе.
+    image.draft("RGB", (stored_side, stored_side))
+    try:
+        image.load()
+    except (OSError, SyntaxError, ValueError):
+        raise ValidationError("Загрузите корректное изображение.")
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    image.thumbnail((stored_side, stored_side), Image.LANCZOS, 3.0)
+    return image
+
+
+def process_image(raw):
+    """
+    Оригинал загруженного изображения без метаданных.
+
+    :return: ContentFile; имя по содержимому даёт хранилище.
+    """
+    image = open_image(raw)
+    if image.mode == "RGBA":
+        original = encode_image(image, "PNG", optimize=True)
+        extension = "png"
+    else:
+        original = encode_image(image, "JPEG", quality=90, optimize=True)
+        extension = "jpg"
+    return ContentFile(original, name=f"image.{extension}")
+
+
+def get_rendition_name(name, rendition, fmt):
+    root, _ = posixpath.splitext(name)
+    return f"{root}.{rendition}.{RENDITION_FORMATS[fmt][1]}"
+
+
+@job
+def build_renditions(name, renditions):
+    """
+    Строит недостающие рендишены renditions файла name в основном
+    хранилище. Файл, удалённый до запуска задачи, пропускается.
+
+    Готовые рендишены не перезаписываются: nginx отдаёт их как
+    неизменяемые (см. api.storage).
+    """
+    if not default_storage.exists(name):
+        return
+    missing = {
+        (rendition, fmt): get_rendition_name(name, rendition, fmt)
+        for rendition in renditions
+        for fmt in RENDITION_FORMATS
+    }
+    missing = {
+        key: rendition_name for key, rendition_name in missing.items()
+        if not default_storage.exists(rendition_name)
+    }
+    if not missing:
+        return
+    with default_storage.open(name, "rb") as file:
+        image = open_image(file.read())
+    for key, data in render_renditions(
+        image, {rendition for rendition, _ in missing}
+    ).items():
+        if key in missing:
+            default_storage.save_derived(missing[key], ContentFile(data))
+
+
+class RenditionFieldFile(ImageFieldFile):
+    """
+    Файл изображения с рендишенами, которые хранятся рядом с ним.
+    """
+
+    def rendition_name(self, rendition, fmt):
+        return get_rendition_name(self.name, rendition, fmt)
+
+    def rendition_url(self, rendition, fmt):
+        """
+        Адрес рендишена или, пока задача build_renditions его не
+        построила, адрес оригинала.
+        """
+        name = self.rendition_name(rendition, fmt)
+        if not self.storage.exists(name):
+            return self.url
+        return self.storage.url(name)
+
+    def rendition_names(self):
+        return [
+            self.rendition_name(rendition, fmt)
+            for rendition in self.field.renditions
+            for fmt in RENDITION_FORMATS
+        ]
+
+    def renditions_ready(self):
+        """
+        Построены ли все рендишены файла.
+        """
+        return all(map(self.storage.exists, self.rendition_names()))
+
+    def save(self, name, content, save=True):
+        super().save(name, content, save)
+        if self.field.renditions:
+            enqueue(
+                build_renditions,
+                name=self.name, renditions=self.field.renditions,
+            )
+
+    save.alters_data = True
+
+    def delete(self, save=True):
+        # Файл нужен, пока на него ссылается запись в базе: ссылку на
+        # него снимает сохранение модели (api.signals).
+        if not self:
+            return
+        if hasattr(self, "_file"):
+            self.close()
+            del self.file
+        self.name = None
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = False
+        if save:
+            self.instance.save()
+
+    delete.alters_data = True
+
+
+class RenditionImageField(models.ImageField):
+    """
+    ImageField, у файлов которого есть рендишены renditions.
+    """
+
+    attr_class = RenditionFieldFile
+
+    def __init__(self, *args, renditions=(), **kwargs):
+        self.renditions = tuple(renditions)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["renditions"] = self.renditions
+        return name, path, args, kwargs
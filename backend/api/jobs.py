@@ -0,0 +1,217 @@
+"""
+Фоновые задачи в очереди на таблице базы данных (модель Job).
+
+Задача — функция, зарегистрированная декоратором @job. enqueue()
+добавляет строку Job в текущей транзакции, поэтому задача видна
+обработчикам только после коммита и пропадает при откате. Обработчики
+(manage.py run_workers) забирают задачи:
+
+* в PostgreSQL (и других базах с SKIP LOCKED) — SELECT … FOR UPDATE
+  SKIP LOCKED, обработчики не ждут друг друга;
+* в SQLite — условным UPDATE … WHERE status = 'queued' (сравнение с
+  обменом): запись в SQLite последовательна, и задачу получает ровно
+  тот обработчик, чей UPDATE изменил строку.
+
+Успешно выполненная задача удаляется. Упавшая повторяется через
+JOB_RETRY_DELAY * 2^(попытка - 1) секунд (не больше JOB_RETRY_MAX_DELAY),
+после max_attempts попыток остаётся в статусе failed с текстом ошибки.
+Задачи обработчика, пропавшего дольше JOB_LOCK_TIMEOUT секунд,
+возвращаются в очередь.
+
+С JOBS_EAGER = True (тесты) enqueue() выполняет задачу сразу.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+JOBS = {}
+
+
+def job(func=None, *, max_attempts=None):
+    """
+    Регистрирует функцию как фоновую задачу под именем
+    «модуль.имя». Аргументы задачи должны сериализоваться в JSON.
+    """
+    def register(func):
+        func.job_name = f"{func.__module__}.{func.__qualname__}"
+        func.job_max_attempts = max_attempts
+        JOBS[func.job_name] = func
+        return func
+
+    return register(func) if func is not None else register
+
+
+def get_job(name):
+    """
+    Функция задачи name.
+
+    :raises LookupError: Задача не зарегистрирована.
+    """
+    try:
+        return JOBS[name]
+    except KeyError:
+        raise LookupError(f"Неизвестная задача {name}.")
+
+
+def enqueue(func, *, delay=0, max_attempts=None, **kwargs):
+    """
+    Ставит задачу func(**kwargs) в очередь.
+
+    :param func: Функция, зарегистрированная @job.
+    :param delay: Отсрочка запуска в секундах.
+    :return: Созданный Job или None в режиме JOBS_EAGER.
+    """
+    from .models import Job
+
+    get_job(func.job_name)
+    # Аргументы проходят через JSON и в немедленном режиме, чтобы
+    # ошибки сериализации проявлялись в тестах.
+    payload = json.loads(json.dumps(kwargs))
+    if getattr(settings, "JOBS_EAGER", False):
+        func(**payload)
+        return None
+    return Job.objects.create(
+        name=func.job_name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=(
+            max_attempts or func.job_max_attempts
+            or getattr(settings, "JOB_MAX_ATTEMPTS", 5)
+        ),
+    )
+
+
+def get_retry_delay(attempts):
+    """
+    Пауза перед следующей попыткой (в секундах) после attempts
+    неудачных попыток, со случайным разбросом ±20%.
+    """
+    base = getattr(settings, "JOB_RETRY_DELAY", 10)
+    limit = getattr(settings, "JOB_RETRY_MAX_DELAY", 3600)
+    return min(base * 2 ** (attempts - 1), limit) * random.uniform(0.8, 1.2)
+
+
+class Worker:
+    """
+    Обработчик очереди: забирает и выполняет задачи по одной.
+    """
+
+    def __init__(self, name=None, poll_interval=1.0):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.stopping = False
+        self.requeued_at = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def claim(self):
+        """
+        Забирает готовую к запуску задачу или возвращает None.
+        """
+        from .models import Job
+
+        now = timezone.now()
+        queued = Job.objects.filter(
+            status=Job.Status.QUEUED, run_at__lte=now
+        ).order_by("run_at", "id")
+        claimed = {
+            "status": Job.Status.RUNNING,
+            "locked_by": self.name,
+            "locked_at": now,
+        }
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                job = queued.select_for_update(skip_locked=True).first()
+                if job is None:
+                    return None
+                job.attempts += 1
+                for field, value in claimed.items():
+                    setattr(job, field, value)
+                job.save(update_fields=[*claimed, "attempts"])
+                return job
+        for job_id in queued.values_list("id", flat=True)[:10]:
+            if Job.objects.filter(
+                pk=job_id, status=Job.Status.QUEUED
+            ).update(**claimed, attempts=F("attempts") + 1):
+                return Job.objects.get(pk=job_id)
+        return None
+
+    def requeue_stale(self):
+        """
+        Возвращает в очередь задачи пропавших обработчиков.
+        """
+        from .models import Job
+
+        stale = Job.objects.filter(
+            status=Job.Status.RUNNING,
+            locked_at__lt=timezone.now() - timedelta(
+                seconds=getattr(settings, "JOB_LOCK_TIMEOUT", 600)
+            ),
+        )
+        stale.filter(attempts__gte=F("max_attempts")).update(
+            status=Job.Status.FAILED, locked_by="", locked_at=None,
+            last_error="Обработчик не завершил задачу.",
+        )
+        stale.update(status=Job.Status.QUEUED, locked_by="", locked_at=None)
+
+    def run_job(self, job):
+        from .models import Job
+
+        mine = Job.objects.filter(pk=job.pk, locked_by=self.name)
+        try:
+            get_job(job.name)(**job.payload)
+        except Exception:
+            error = traceback.format_exc()
+            logger.exception("Задача %s #%s упала", job.name, job.pk)
+            if job.attempts >= job.max_attempts:
+                mine.update(
+                    status=Job.Status.FAILED, locked_by="", locked_at=None,
+                    last_error=error,
+                )
+            else:
+                mine.update(
+                    status=Job.Status.QUEUED, locked_by="", locked_at=None,
+                    last_error=error,
+                    run_at=timezone.now() + timedelta(
+                        seconds=get_retry_delay(job.attempts)
+                    ),
+                )
+        else:
+            mine.delete()
+
+    def run(self, burst=False):
+        """
+        Выполняет задачи, пока не вызван stop() или (burst) пока
+        очередь не опустеет.
+        """
+        while not self.stopping:
+            close_old_connections()
+            try:
+                if time.monotonic() - self.requeued_at > 60:
+                    self.requeue_stale()
+                    self.requeued_at = time.monotonic()
+                job = self.claim()
+            except OperationalError:
+                # SQLite: база занята записью другого процесса.
+                logger.warning("Очередь задач недоступна", exc_info=True)
+                job = None
+            if job is not None:
+                self.run_job(job)
+            elif burst:
+                break
+            else:
+                time.sleep(self.poll_interval)
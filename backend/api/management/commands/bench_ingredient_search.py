@@ -0,0 +1,51 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from api.catalog import ingredient_index
+from api.models import Ingredient
+from api.serializers import IngredientSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение автодополнения ингредиентов через ORM "
+        "и через индекс в памяти"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations", type=int, default=200,
+            help="Число повторов для каждого префикса",
+        )
+        parser.add_argument(
+            "prefixes", nargs="*", default=["а", "мо", "сах", "кар", "я"],
+            help="Префиксы для поиска",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        prefixes = options["prefixes"]
+
+        def orm_search(prefix):
+            return IngredientSerializer(
+                Ingredient.objects.filter(name__istartswith=prefix),
+                many=True,
+            ).data
+
+        # Первый вызов строит индекс, в замер он не входит.
+        ingredient_index.search("")
+        for name, search in (
+            ("ORM", orm_search),
+            ("Индекс", ingredient_index.search),
+        ):
+            started = perf_counter()
+            for _ in range(iterations):
+                for prefix in prefixes:
+                    search(prefix)
+            elapsed = perf_counter() - started
+            calls = iterations * len(prefixes)
+            self.stdout.write(
+                f"{name}: {calls} запросов за {elapsed:.3f} с, "
+                f"{elapsed / calls * 1e6:.1f} мкс на запрос"
+            )
@@ -0,0 +1,79 @@
+import io
+from itertools import cycle, islice
+from time import perf_counter
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Recipe
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import RecipeReadSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение отрисовки и разбора страниц рецептов через "
+        "JSONRenderer/JSONParser и FastJSONRenderer/FastJSONParser"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rounds", type=int, default=50,
+            help="Число повторов для каждого размера страницы",
+        )
+        parser.add_argument(
+            "sizes", nargs="*", type=int, default=[6, 50, 500],
+            help="Размеры страниц",
+        )
+
+    def measure(self, func, rounds):
+        started = perf_counter()
+        for _ in range(rounds):
+            func()
+        return (perf_counter() - started) / rounds * 1e6
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson не установлен, сравниваются копии.")
+        sizes = options["sizes"]
+        rounds = options["rounds"]
+        request = RequestFactory().get("/api/recipes/")
+        request.user = AnonymousUser()
+        recipes = RecipeReadSerializer(
+            Recipe.objects.for_viewer(request.user)[:max(sizes)],
+            many=True, context={"request": request},
+        ).data
+        if not recipes:
+            raise CommandError("Нет ни одного рецепта.")
+        for size in sizes:
+            # Недостающие рецепты повторяются: важен размер страницы.
+            page = {
+                "count": size, "next": None, "previous": None,
+                "results": list(islice(cycle(recipes), size)),
+            }
+            body = JSONRenderer().render(page)
+            if FastJSONRenderer().render(page) != body:
+                raise CommandError("Результаты отрисовки различаются.")
+            results = []
+            for renderer, parser in (
+                (JSONRenderer(), JSONParser()),
+                (FastJSONRenderer(), FastJSONParser()),
+            ):
+                results.append((
+                    self.measure(lambda: renderer.render(page), rounds),
+                    self.measure(
+                        lambda: parser.parse(io.BytesIO(body)), rounds
+                    ),
+                ))
+            (render, parse), (fast_render, fast_parse) = results
+            self.stdout.write(
+                f"{size} рецептов ({len(body) / 1024:.0f} КБ): "
+                f"отрисовка {render:.0f} -> {fast_render:.0f} мкс "
+                f"(x{render / fast_render:.1f}), "
+                f"разбор {parse:.0f} -> {fast_parse:.0f} мкс "
+                f"(x{parse / fast_parse:.1f})"
+            )
@@ -0,0 +1,68 @@
+from time import perf_counter
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from api.wsgi import LeanApiApplication
+
+
+class Command(BaseCommand):
+    help = (
+        "Пропускная способность API через полный цикл обработки "
+        "запроса (в одном процессе)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+", help="Адреса для замера")
+        parser.add_argument(
+            "--requests", type=int, default=1000,
+            help="Число запросов к каждому адресу",
+        )
+        parser.add_argument(
+            "--token", help="Токен для заголовка Authorization",
+        )
+        parser.add_argument(
+            "--compare", action="store_true",
+            help="Сравнить с полной цепочкой промежуточных слоёв",
+        )
+
+    def measure(self, application, url, options):
+        headers = {}
+        if options["token"]:
+            headers["HTTP_AUTHORIZATION"] = f"Token {options['token']}"
+        factory = RequestFactory(SERVER_NAME="localhost", **headers)
+        statuses = []
+
+        def start_response(status, response_headers):
+            statuses.append(status)
+
+        def request():
+            # Тело запроса читается из wsgi.input, поэтому окружение
+            # создаётся заново; close() вызывает сервер WSGI.
+            response = application(factory.get(url).environ, start_response)
+            b"".join(response)
+            response.close()
+
+        request()
+        started = perf_counter()
+        for _ in range(options["requests"]):
+            request()
+        elapsed = perf_counter() - started
+        if int(statuses[-1].split()[0]) >= 400:
+            raise CommandError(f"{url}: ответ {statuses[-1]}.")
+        return options["requests"] / elapsed
+
+    def handle(self, *args, **options):
+        full_application = WSGIHandler()
+        lean_application = LeanApiApplication(full_application)
+        for url in options["urls"]:
+            lean = self.measure(lean_application, url, options)
+            line = f"{url}: {lean:.0f} запросов/с"
+            if options["compare"]:
+                full = self.measure(full_application, url, options)
+                line += (
+                    f", с полной цепочкой {full:.0f} запросов/с "
+                    f"({(lean / full - 1) * 100:+.1f}%)"
+                )
+            self.stdout.write(line)
@@ -0,0 +1,47 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api.models import Recipe
+from api.shortcodes import get_short_link_path, short_links
+
+
+class Command(BaseCommand):
+    help = "Число перенаправлений по коротким ссылкам в секунду"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=2000,
+            help="Число запросов в каждом замере",
+        )
+
+    def handle(self, *args, **options):
+        recipe_id = Recipe.objects.values_list("id", flat=True).first()
+        if recipe_id is None:
+            raise CommandError("Нет ни одного рецепта.")
+        path = get_short_link_path(recipe_id)
+        # Полный цикл обработки запроса, включая все промежуточные слои.
+        client = Client()
+        requests = options["requests"]
+        # Для сравнения: запрос того же объёма работы (один запрос
+        # к базе) через все промежуточные слои, URL-маршруты и DRF.
+        for name, url, clear_cache in (
+            ("Полный стек (get-link)",
+             f"/api/recipes/{recipe_id}/get-link/", False),
+            ("Короткая ссылка без кэша кодов", path, True),
+            ("Короткая ссылка с кэшем кодов", path, False),
+        ):
+            short_links.clear()
+            started = perf_counter()
+            for _ in range(requests):
+                if clear_cache:
+                    short_links.clear()
+                response = client.get(url)
+            elapsed = perf_counter() - started
+            if response.status_code >= 400:
+                raise CommandError(f"Ответ {response.status_code}.")
+            self.stdout.write(
+                f"{name}: {requests / elapsed:.0f} запросов/с, "
+                f"{elapsed / requests * 1e6:.1f} мкс на запрос"
+            )
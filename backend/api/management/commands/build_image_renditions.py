@@ -0,0 +1,42 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from api.images import build_renditions
+from api.models import FoodgramUser, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Создание рендишенов для изображений рецептов и аватаров, "
+        "загруженных до их появления"
+    )
+
+    def handle(self, *args, **options):
+        built = skipped = failed = 0
+        for model, field_name in (
+            (Recipe, "image"), (FoodgramUser, "avatar"),
+        ):
+            objects = model.objects.exclude(
+                **{field_name: ""}
+            ).exclude(**{f"{field_name}__isnull": True}).only(field_name)
+            for obj in objects.iterator():
+                file = getattr(obj, field_name)
+                # Готовые рендишены не пересоздаются: под тем же именем
+                # они кэшируются клиентами как неизменяемые.
+                if all(
+                    file.storage.exists(name)
+                    for name in file.rendition_names()
+                ):
+                    skipped += 1
+                    continue
+                try:
+                    build_renditions(file.name, file.field.renditions)
+                except (OSError, ValidationError) as error:
+                    failed += 1
+                    self.stderr.write(f"{file.name}: {error}")
+                    continue
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Рендишены созданы: {built}, уже были: {skipped}, "
+            f"ошибок: {failed}"
+        ))
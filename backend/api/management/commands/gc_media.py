@@ -0,0 +1,215 @@
+import os
+import posixpath
+import shutil
+import time
+from datetime import datetime
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import FoodgramUser, Recipe, StoredFile
+
+# Поля с файлами: по их upload_to выбираются каталоги для обхода.
+MEDIA_FIELDS = ((Recipe, "image"), (FoodgramUser, "avatar"))
+
+
+def get_root(name):
+    """
+    Общая часть имени файла и его рендишенов: каталог и имя до первой
+    точки (recipes/images/3fa9….card.webp -> recipes/images/3fa9…).
+    """
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, filename.split(".", 1)[0])
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаление файлов изображений, на которые не ссылаются "
+        "рецепты и пользователи"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать, что будет удалено",
+        )
+        parser.add_argument(
+            "--quarantine", metavar="DIR",
+            help="Перемещать файлы в каталог DIR вместо удаления",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Число файлов в одном пакете",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Пауза в секундах между пакетами",
+        )
+        parser.add_argument(
+            "--min-age", type=int, default=3600,
+            help=(
+                "Не трогать файлы моложе стольких секунд: их может "
+                "сохранять незавершённая транзакция"
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=2000,
+            help="Размер порции при чтении ссылок из базы",
+        )
+
+    def get_referenced_roots(self, chunk_size):
+        roots = set()
+        for model, field_name in MEDIA_FIELDS:
+            names = model.objects.exclude(
+                **{f"{field_name}__isnull": True}
+            ).exclude(**{field_name: ""}).values_list(field_name, flat=True)
+            for name in names.iterator(chunk_size=chunk_size):
+                roots.add(get_root(name))
+        return roots
+
+    def get_still_referenced(self, names):
+        """
+        Корни файлов из names, на которые успели сослаться после
+        чтения ссылок (например, повторная загрузка того же фото).
+        """
+        roots = set()
+        for model, field_name in MEDIA_FIELDS:
+            roots.update(map(get_root, model.objects.filter(
+                **{f"{field_name}__in": names}
+            ).values_list(field_name, flat=True)))
+        return roots
+
+    def iter_orphans(self, roots, min_age):
+        """
+        Группы (корень, [(имя, размер)]) файлов без ссылок: каталог
+        читается целиком, поэтому группа не делится между пакетами.
+        """
+        location = default_storage.location
+        deadline = time.time() - min_age
+        directories = {
+            model._meta.get_field(field_name).upload_to.strip("/")
+            for model, field_name in MEDIA_FIELDS
+        }
+        for directory in sorted(directories):
+            for path, _, files in os.walk(os.path.join(location, directory)):
+                relative = os.path.relpath(path, location).replace(
+                    os.sep, "/"
+                )
+                groups = {}
+                for filename in files:
+                    name = posixpath.join(relative, filename)
+                    root = get_root(name)
+                    self.scanned += 1
+                    if root in roots:
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(path, filename))
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_mtime > deadline:
+                        self.young += 1
+                        continue
+                    groups.setdefault(root, []).append((name, stat.st_size))
+                yield from groups.items()
+
+    def remove(self, name, quarantine):
+        path = default_storage.path(name)
+        try:
+            if quarantine:
+                target = os.path.join(quarantine, *name.split("/"))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def flush(self, batch, options):
+        """
+        Удаляет пакет групп файлов, заново проверив ссылки на них.
+        """
+        if options["dry_run"]:
+            for _, files in batch:
+                for name, size in files:
+                    if options["verbosity"] > 1:
+                        self.stdout.write(name)
+                    self.removed += 1
+                    self.size += size
+            return
+        # Файлы удаляются до фиксации: повторная загрузка того же фото
+        # дождётся удаления записи StoredFile и запишет файл заново.
+        with transaction.atomic():
+            names = [name for _, files in batch for name, _ in files]
+            still = self.get_still_referenced(names)
+            batch = [group for group in batch if group[0] not in still]
+            StoredFile.objects.filter(name__in=[
+                name for _, files in batch for name, _ in files
+            ]).delete()
+            for _, files in batch:
+                for name, size in files:
+                    if self.remove(name, options["quarantine"]):
+                        self.removed += 1
+                        self.size += size
+
+    def report(self, batches, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"Пакет {batches}: просмотрено {self.scanned}, "
+            f"без ссылок {self.removed} ({self.size / 2 ** 20:.1f} МБ), "
+            f"{self.scanned / elapsed:.0f} файлов/с"
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть положительным.")
+        quarantine = options["quarantine"]
+        if quarantine:
+            quarantine = os.path.join(
+                os.path.abspath(quarantine),
+                datetime.now().strftime("%Y%m%d-%H%M%S"),
+            )
+            if quarantine.startswith(
+                os.path.abspath(default_storage.location) + os.sep
+            ):
+                raise CommandError(
+                    "Карантин не может находиться внутри MEDIA_ROOT."
+                )
+            options["quarantine"] = quarantine
+        self.scanned = self.young = self.removed = self.size = 0
+        started = time.monotonic()
+        roots = self.get_referenced_roots(options["chunk_size"])
+        self.stdout.write(
+            f"Файлов со ссылками: {len(roots)} "
+            f"({time.monotonic() - started:.1f} с)"
+        )
+
+        batch, batch_files, batches = [], 0, 0
+        for group in self.iter_orphans(roots, options["min_age"]):
+            batch.append(group)
+            batch_files += len(group[1])
+            if batch_files >= options["batch_size"]:
+                self.flush(batch, options)
+                batches += 1
+                self.report(batches, started)
+                batch, batch_files = [], 0
+                if options["sleep"]:
+                    time.sleep(options["sleep"])
+        if batch:
+            self.flush(batch, options)
+            batches += 1
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        if options["dry_run"]:
+            action = "Будет удалено"
+        elif quarantine:
+            action = f"Перемещено в {quarantine}"
+        else:
+            action = "Удалено"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action}: {self.removed} файлов, "
+            f"{self.size / 2 ** 20:.1f} МБ. Просмотрено {self.scanned} "
+            f"файлов за {elapsed:.1f} с ({self.scanned / elapsed:.0f} "
+            f"файлов/с), моложе --min-age: {self.young}"
+        ))
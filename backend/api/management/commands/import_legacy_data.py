@@ -0,0 +1,217 @@
+"""
+Перенос данных из таблиц прежних приложений users и recipe.
+
+Модель пользователя api.FoodgramUser нельзя подменить в базе, где
+миграции admin и authtoken уже выполнены для auth.User, поэтому api
+разворачивается в новой базе, а прежняя подключается под псевдонимом
+legacy (LEGACY_SQLITE_PATH). Данные переносятся этой командой один
+раз, в пустые таблицы api, с сохранением идентификаторов
+пользователей и рецептов.
+
+- Пользователи берутся из users_user, на которых ссылаются рецепты,
+  и дополняются учётными записями из auth_user (регистрация через
+  djoser), email которых в users_user нет; им выдаются новые
+  идентификаторы. Хэши паролей переносятся как есть.
+- Ингредиенты сопоставляются с каталогом по названию и единице
+  измерения, недостающие добавляются.
+- Теги, slug и short_link рецептов в новой схеме не используются и
+  не переносятся. Токены не переносятся: пользователи входят заново.
+"""
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.utils.timezone import is_naive, make_aware
+
+from api.models import (
+    Favorite,
+    FoodgramUser,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Subscription,
+)
+
+USER_FIELDS = (
+    "password", "last_login", "is_superuser", "username", "first_name",
+    "last_name", "email", "is_staff", "is_active", "date_joined",
+)
+
+
+def fetch(source, table, columns):
+    """
+    Строки таблицы table прежней схемы как словари. Даты без часового
+    пояса (SQLite) хранятся в UTC.
+    """
+    with source.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(columns)} FROM "
+            f"{source.ops.quote_name(table)} ORDER BY id"
+        )
+        return [
+            {
+                column: make_aware(value, timezone.utc)
+                if isinstance(value, datetime) and is_naive(value)
+                else value
+                for column, value in zip(columns, row)
+            }
+            for row in cursor.fetchall()
+        ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Перенос пользователей, рецептов, подписок, избранного и корзин "
+        "из таблиц прежних приложений users и recipe"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source", default="legacy",
+            help="Псевдоним прежней базы в DATABASES",
+        )
+
+    def handle(self, *args, **options):
+        if options["source"] not in connections.databases:
+            raise CommandError(
+                f"База {options['source']} не настроена, укажите "
+                "LEGACY_SQLITE_PATH."
+            )
+        self.source = connections[options["source"]]
+        tables = set(self.source.introspection.table_names())
+        if "users_user" not in tables or "recipe_recipe" not in tables:
+            raise CommandError("Таблиц прежней схемы в базе нет.")
+        if FoodgramUser.objects.exists() or Recipe.objects.exists():
+            raise CommandError(
+                "Данные переносятся только в пустые таблицы api."
+            )
+        with transaction.atomic():
+            counts = self.import_data(tables)
+            self.reset_sequences(
+                Recipe, RecipeIngredient, Subscription, Favorite,
+                ShoppingCart,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Перенесено: " + ", ".join(
+                f"{label} {count}" for label, count in counts.items()
+            )
+        ))
+
+    def import_data(self, tables):
+        users = FoodgramUser.objects.bulk_create(
+            FoodgramUser(**row)
+            for row in fetch(
+                self.source, "users_user", ("id",) + USER_FIELDS
+            )
+        )
+        # Учётные записи из auth_user получают новые идентификаторы
+        # после перенесённых.
+        self.reset_sequences(FoodgramUser)
+        emails = {user.email for user in users}
+        usernames = {user.username for user in users}
+        extra_users = []
+        if "auth_user" in tables:
+            for row in fetch(
+                self.source, "auth_user", ("id",) + USER_FIELDS
+            ):
+                del row["id"]
+                if (not row["email"] or row["email"] in emails
+                        or row["username"] in usernames):
+                    continue
+                extra_users.append(FoodgramUser(**row))
+                emails.add(row["email"])
+                usernames.add(row["username"])
+        FoodgramUser.objects.bulk_create(extra_users)
+
+        ingredient_ids = self.import_ingredients()
+        recipes = fetch(self.source, "recipe_recipe", (
+            "id", "author_id", "name", "image", "text", "cooking_time",
+            "pub_date",
+        ))
+        Recipe.objects.bulk_create(
+            Recipe(**{
+                key: value for key, value in row.items() if key != "pub_date"
+            })
+            for row in recipes
+        )
+        # created_at заполняется при вставке текущим временем.
+        Recipe.objects.bulk_update([
+            Recipe(id=row["id"], created_at=row["pub_date"])
+            for row in recipes
+        ], ["created_at"])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=row["recipe_id"],
+                ingredient_id=ingredient_ids[row["ingredient_id"]],
+                amount=row["amount"],
+            )
+            for row in fetch(self.source, "recipe_recipeingredient", (
+                "id", "recipe_id", "ingredient_id", "amount",
+            ))
+        )
+        counts = {
+            "пользователей": len(users) + len(extra_users),
+            "рецептов": len(recipes),
+        }
+        for model, table, label, columns in (
+            (Subscription, "users_subscription", "подписок",
+             ("id", "user_id", "author_id")),
+            (Favorite, "recipe_favorite", "избранных",
+             ("id", "user_id", "recipe_id")),
+            (ShoppingCart, "recipe_shoppingcart", "в корзинах",
+             ("id", "user_id", "recipe_id")),
+        ):
+            rows = fetch(self.source, table, columns)
+            model.objects.bulk_create(model(**row) for row in rows)
+            counts[label] = len(rows)
+        return counts
+
+    def import_ingredients(self):
+        """
+        Сопоставляет ингредиенты прежней схемы с каталогом.
+
+        :return: {прежний id: id в api_ingredient}.
+        """
+        name_length = Ingredient._meta.get_field("name").max_length
+        unit_length = Ingredient._meta.get_field(
+            "measurement_unit"
+        ).max_length
+        rows = fetch(
+            self.source, "recipe_ingredient",
+            ("id", "name", "measurement_unit"),
+        )
+        for row in rows:
+            if (len(row["name"]) > name_length
+                    or len(row["measurement_unit"]) > unit_length):
+                raise CommandError(
+                    f"Слишком длинное значение ингредиента {row['id']}."
+                )
+        catalog = {
+            (ingredient.name, ingredient.measurement_unit): ingredient.id
+            for ingredient in Ingredient.objects.all()
+        }
+        missing = {
+            (row["name"], row["measurement_unit"]) for row in rows
+        } - catalog.keys()
+        for ingredient in Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in sorted(missing)
+        ):
+            catalog[ingredient.name, ingredient.measurement_unit] = (
+                ingredient.id
+            )
+        return {
+            row["id"]: catalog[row["name"], row["measurement_unit"]]
+            for row in rows
+        }
+
+    def reset_sequences(self, *models):
+        """
+        Продолжает последовательности id после перенесённых строк.
+        """
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -1,37 +1,195 @@
-from django.core.management.base import BaseCommand
-from django.db import transaction
+import csv
 import json
-import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.catalog import bump_catalog_version
 from api.models import Ingredient
 
+FORMATS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+
+def iter_json_array(file, chunk_size=1 << 16):
+    """
+    Элементы JSON-массива из файла file без чтения файла целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, started = "", 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and not started:
+            if buffer[position] != "[":
+                raise ValueError("Ожидался массив JSON.")
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ValueError("Файл JSON оборван или некорректен.")
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        # Объект в конце буфера мог быть прочитан не полностью
+        # (например, число), если за ним нет разделителя.
+        if end == len(buffer):
+            chunk = file.read(chunk_size)
+            if chunk:
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+        yield item
+        position = end
+
+
+def iter_rows(file, file_format):
+    """
+    Пары (название, единица измерения) из файла в формате file_format.
+    """
+    if file_format == "csv":
+        for row in csv.reader(file):
+            if not row or row == ["name", "measurement_unit"]:
+                continue
+            if len(row) != 2:
+                raise ValueError(f"Ожидалось два столбца, получено {row}.")
+            yield row
+        return
+    if file_format == "ndjson":
+        items = (json.loads(line) for line in file if line.strip())
+    else:
+        items = iter_json_array(file)
+    for item in items:
+        try:
+            yield item["name"], item["measurement_unit"]
+        except (KeyError, TypeError):
+            raise ValueError(f"Некорректная запись {item!r}.")
+
 
 class Command(BaseCommand):
-    help = "Загрузка ингредиентов из файла"
+    help = (
+        "Загрузка ингредиентов из файла JSON, NDJSON или CSV. "
+        "Уже загруженные ингредиенты пропускаются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?",
+            help="Файл с ингредиентами (по умолчанию INGREDIENTS_FILE)",
+        )
+        parser.add_argument(
+            "--format", choices=sorted(set(FORMATS.values())),
+            help="Формат файла (по умолчанию по расширению)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Число строк в одной транзакции",
+        )
+        parser.add_argument(
+            "--missing-ok", action="store_true",
+            help="Не считать ошибкой отсутствие файла",
+        )
 
-    @transaction.atomic
-    def handle(self, *args, **kwargs):
-        self.load_ingredients("ingredients.json")
+    def save_batch(self, batch):
+        """
+        Добавляет ингредиенты из batch, которых ещё нет в каталоге.
 
-        self.stdout.write(
-            self.style.SUCCESS("Начальные данные успешно загружены"))
+        :return: Число добавленных ингредиентов.
+        """
+        names = {name for name, _ in batch}
+        with transaction.atomic():
+            existing = set(Ingredient.objects.filter(
+                name__in=names
+            ).values_list("name", "measurement_unit"))
+            new = [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in batch if (name, unit) not in existing
+            ]
+            if not new:
+                return 0
+            # Строки, добавленные параллельно, пропускаются по
+            # ограничению уникальности, поэтому добавленные строки
+            # считаются по базе, а не по списку new.
+            Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+            return Ingredient.objects.filter(
+                name__in=names
+            ).count() - len(existing)
 
-    def load_ingredients(self, *args):
-        json_file_path = args[0]
+    def handle(self, *args, **options):
+        path = Path(options["path"] or getattr(
+            settings, "INGREDIENTS_FILE", "ingredients.json"
+        ))
+        if not path.is_file():
+            if options["missing_ok"]:
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Файл {path} не найден, пропущено.")
+                return
+            raise CommandError(f"Файл {path} не найден.")
+        file_format = options["format"] or FORMATS.get(path.suffix.lower())
+        if file_format is None:
+            raise CommandError(
+                f"Неизвестный формат файла {path}, укажите --format."
+            )
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть положительным.")
+        name_length = Ingredient._meta.get_field("name").max_length
+        unit_length = Ingredient._meta.get_field(
+            "measurement_unit"
+        ).max_length
 
+        total = created = 0
+        batch = {}
+        started = time.monotonic()
         try:
-            with open(json_file_path, "r", encoding="utf-8") as file:
-                ingredients_list = Ingredient.objects.bulk_create([
-                    Ingredient(**ingredient_info)
-                    for ingredient_info in json.load(file)
-                ], ignore_conflicts=True)
-
-                self.stdout.write(self.style.SUCCESS(
-                    f"Successfully loaded "
-                    f"{len(ingredients_list)} ingredients. "
-                ))
-
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(
-                f"An error occurred with file "
-                f"{os.getcwd()}/{json_file_path}: {e}"
-            ))
+            with path.open(encoding="utf-8-sig", newline="") as file:
+                for name, unit in iter_rows(file, file_format):
+                    total += 1
+                    name, unit = str(name).strip(), str(unit).strip()
+                    if not name or not unit:
+                        raise ValueError(
+                            f"Пустое название или единица в строке {total}."
+                        )
+                    if len(name) > name_length or len(unit) > unit_length:
+                        raise ValueError(
+                            f"Слишком длинное значение в строке {total}."
+                        )
+                    batch[name, unit] = None
+                    if len(batch) >= options["batch_size"]:
+                        created += self.save_batch(batch)
+                        batch = {}
+                        if options["verbosity"] > 1:
+                            rate = total / (time.monotonic() - started)
+                            self.stdout.write(
+                                f"Прочитано {total} строк ({rate:.0f} "
+                                f"строк/с), добавлено {created}"
+                            )
+                if batch:
+                    created += self.save_batch(batch)
+        except (OSError, UnicodeDecodeError, ValueError, csv.Error) as error:
+            raise CommandError(
+                f"{path}: {error} Добавлено ингредиентов: {created}."
+            )
+        finally:
+            # bulk_create не отправляет сигналы post_save.
+            if created:
+                bump_catalog_version()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f"Загружено из {path}: {total} строк за {elapsed:.1f} с "
+            f"({total / elapsed:.0f} строк/с), новых ингредиентов "
+            f"{created}, пропущено {total - created}"
+        ))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import ShoppingCartTotal
+from api.services import calculate_cart_totals
+
+
+class Command(BaseCommand):
+    help = "Пересчёт или проверка итогов списков покупок"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify", action="store_true",
+            help="Только сравнить итоги с корзинами, ничего не меняя",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Размер пачки при вставке",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            self.verify()
+        else:
+            self.rebuild(options["batch_size"])
+
+    def verify(self):
+        stored = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount
+            in ShoppingCartTotal.objects.values_list(
+                "user_id", "ingredient_id", "total_amount"
+            ).iterator()
+        }
+        mismatches = 0
+        for user_id, ingredient_id, total_amount in calculate_cart_totals():
+            if stored.pop((user_id, ingredient_id), None) != total_amount:
+                mismatches += 1
+        mismatches += len(stored)
+        if mismatches:
+            raise CommandError(
+                f"Расхождений в итогах списков покупок: {mismatches}. "
+                f"Запустите команду без --verify для пересчёта."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Итоги списков покупок совпадают с корзинами"
+        ))
+
+    @transaction.atomic
+    def rebuild(self, batch_size):
+        ShoppingCartTotal.objects.all().delete()
+        created = 0
+        batch = []
+        for user_id, ingredient_id, total_amount in calculate_cart_totals():
+            batch.append(ShoppingCartTotal(
+                user_id=user_id, ingredient_id=ingredient_id,
+                total_amount=total_amount,
+            ))
+            if len(batch) >= batch_size:
+                ShoppingCartTotal.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ShoppingCartTotal.objects.bulk_create(batch)
+        created += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"Итоги списков покупок пересчитаны: {created} строк"
+        ))
@@ -0,0 +1,65 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import Worker
+
+
+def run_worker(poll_interval, burst):
+    worker = Worker(poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(burst=burst)
+
+
+class Command(BaseCommand):
+    help = "Запуск обработчиков очереди фоновых задач"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Число процессов-обработчиков",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=1.0,
+            help="Пауза в секундах, когда очередь пуста",
+        )
+        parser.add_argument(
+            "--burst", action="store_true",
+            help="Завершиться, когда очередь опустеет",
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = options["poll_interval"]
+        burst = options["burst"]
+        if options["workers"] <= 1:
+            run_worker(poll_interval, burst)
+            return
+
+        # Дочерние процессы не должны делить соединения с родителем.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=run_worker, args=(poll_interval, burst))
+            for _ in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(
+            f"Запущено обработчиков: {len(processes)}"
+        )
+
+        def stop(*args):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
+        failed = sum(1 for process in processes if process.exitcode)
+        if failed:
+            self.stderr.write(f"Обработчиков завершилось с ошибкой: {failed}")
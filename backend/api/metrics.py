@@ -0,0 +1,315 @@
+"""
+Время обработки запросов: заголовок Server-Timing и гистограммы
+в формате Prometheus.
+
+Время запроса делится на фазы:
+    db — запросы к базе данных;
+    serialize — код представления и сериализаторов без учёта db;
+    render — отрисовка ответа (JSONRenderer и т. п.) без учёта db;
+    total — всё время внутри промежуточного слоя.
+
+Замеряются только запросы к METRICS_PREFIXES (по умолчанию /api/).
+Гистограммы длительности и числа запросов к БД копятся в памяти
+процесса по маршрутам (имя URL и метод; нестандартные методы
+считаются как other). Если задана настройка METRICS_DIR, каждый
+процесс периодически сохраняет свои значения в файл
+<pid>-<время запуска>.json этого каталога, а /api/_metrics/ суммирует
+все файлы — так собираются данные всех воркеров gunicorn, в том числе
+завершившихся. Каталог нужно очищать при запуске сервера.
+"""
+import json
+import os
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack
+from time import perf_counter, time_ns
+
+from django.conf import settings
+from django.db import connections
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Метки метода ограничены: произвольный метод из запроса попал бы в
+# метки Prometheus как есть.
+METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+
+# Не чаще одного раза в столько секунд процесс пишет свой файл.
+FLUSH_INTERVAL = 1.0
+
+HISTOGRAMS = (
+    (
+        "foodgram_request_duration_seconds",
+        "Длительность обработки запроса",
+        LATENCY_BUCKETS,
+    ),
+    (
+        "foodgram_request_db_queries",
+        "Число запросов к базе данных на один запрос",
+        QUERY_BUCKETS,
+    ),
+)
+
+
+class RequestTiming:
+    """
+    Замеры одного запроса.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.view_started = self.render_started = self.render_finished = None
+        self.db_at_view = self.db_at_render = self.db_after_render = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - started
+            self.db_queries += 1
+
+    def start_view(self):
+        self.view_started = perf_counter()
+        self.db_at_view = self.db_time
+
+    def start_render(self):
+        self.render_started = perf_counter()
+        self.db_at_render = self.db_time
+
+    def finish_render(self):
+        self.render_finished = perf_counter()
+        self.db_after_render = self.db_time
+
+    def phases(self):
+        """
+        Длительности фаз в секундах: {имя: длительность}.
+        """
+        finished = perf_counter()
+        phases = {"db": self.db_time}
+        if self.view_started is not None:
+            view_finished = self.render_started or finished
+            db_at_view_end = (
+                self.db_at_render if self.render_started else self.db_time
+            )
+            phases["serialize"] = max(
+                view_finished - self.view_started
+                - (db_at_view_end - self.db_at_view),
+                0.0,
+            )
+        if self.render_finished is not None:
+            phases["render"] = max(
+                self.render_finished - self.render_started
+                - (self.db_after_render - self.db_at_render),
+                0.0,
+            )
+        phases["total"] = finished - self.started
+        return phases
+
+
+class Histogram:
+    """
+    Накопительная гистограмма: счётчики по верхним границам корзин,
+    сумма и число наблюдений.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def to_dict(self):
+        return {"counts": self.counts, "sum": self.sum}
+
+
+class MetricsRegistry:
+    """
+    Гистограммы процесса по маршрутам.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._flushed = 0.0
+        self._pid = None
+        self._file_name = None
+
+    def observe(self, route, method, duration, queries):
+        if method not in METHODS:
+            method = "other"
+        key = f"{method} {route}"
+        with self._lock:
+            histograms = self._histograms.get(key)
+            if histograms is None:
+                histograms = self._histograms[key] = [
+                    Histogram(buckets) for _, _, buckets in HISTOGRAMS
+                ]
+            histograms[0].observe(duration)
+            histograms[1].observe(queries)
+        self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: [histogram.to_dict() for histogram in histograms]
+                for key, histograms in self._histograms.items()
+            }
+
+    def flush(self, force=False):
+        """
+        Сохраняет значения процесса в METRICS_DIR (если он задан).
+        """
+        directory = getattr(settings, "METRICS_DIR", None)
+        now = perf_counter()
+        if not directory or (
+            not force and now - self._flushed < FLUSH_INTERVAL
+        ):
+            return
+        self._flushed = now
+        path = os.path.join(directory, self.get_file_name())
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(f"{path}.tmp", path)
+
+    def get_file_name(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            # Номер завершившегося воркера может достаться новому:
+            # время запуска не даёт перезаписать файл прежнего.
+            self._pid = pid
+            self._file_name = f"{pid}-{time_ns()}.json"
+        return self._file_name
+
+    def collect(self):
+        """
+        Сумма значений всех процессов (или только текущего, если
+        METRICS_DIR не задан).
+        """
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        total = {}
+        for name in os.listdir(directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for key, histograms in snapshot.items():
+                if key not in total:
+                    total[key] = histograms
+                    continue
+                for merged, histogram in zip(total[key], histograms):
+                    merged["counts"] = [
+                        a + b
+                        for a, b in zip(merged["counts"], histogram["counts"])
+                    ]
+                    merged["sum"] += histogram["sum"]
+        return total
+
+
+registry = MetricsRegistry()
+
+
+def _escape_label(value):
+    return (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+def render_prometheus(data):
+    """
+    Текст метрик в формате Prometheus exposition 0.0.4.
+    """
+    lines = []
+    for idx, (name, help_text, buckets) in enumerate(HISTOGRAMS):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for key in sorted(data):
+            method, _, route = key.partition(" ")
+            labels = (
+                f'method="{_escape_label(method)}",'
+                f'route="{_escape_label(route)}"'
+            )
+            histogram = data[key][idx]
+            cumulative = 0
+            for bound, count in zip(
+                [*buckets, "+Inf"], histogram["counts"]
+            ):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{name}_sum{{{labels}}} {histogram['sum']}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def format_server_timing(phases):
+    return ", ".join(
+        f"{name};dur={duration * 1000:.1f}"
+        for name, duration in phases.items()
+    )
+
+
+class ServerTimingMiddleware:
+    """
+    Добавляет к ответам API заголовок Server-Timing и записывает
+    длительность и число запросов к БД в гистограмму маршрута.
+
+    Для потоковых ответов учитывается только время до начала отдачи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefixes = tuple(
+            getattr(settings, "METRICS_PREFIXES", ("/api/",))
+        )
+
+    def __call__(self, request):
+        if not request.path_info.startswith(self.prefixes):
+            return self.get_response(request)
+        timing = RequestTiming()
+        request.timing = timing
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(timing)
+                )
+            response = self.get_response(request)
+        phases = timing.phases()
+        response["Server-Timing"] = format_server_timing(phases)
+        match = request.resolver_match
+        registry.observe(
+            match.view_name if match else "unmatched",
+            request.method,
+            phases["total"],
+            timing.db_queries,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, "timing"):
+            request.timing.start_view()
+
+    def process_template_response(self, request, response):
+        if not hasattr(request, "timing"):
+            return response
+        # DRF Response отрисовывается после этого вызова.
+        request.timing.start_render()
+        response.add_post_render_callback(
+            lambda response: request.timing.finish_render()
+        )
+        return response
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:33
+
+import api.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='foodgramuser',
+            managers=[
+                ('objects', api.models.FoodgramUserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_totals(apps, schema_editor):
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    ShoppingCartTotal = apps.get_model('api', 'ShoppingCartTotal')
+    ShoppingCartTotal.objects.bulk_create(
+        (
+            ShoppingCartTotal(
+                user_id=row['recipe__shoppingcarts__user'],
+                ingredient_id=row['ingredient'],
+                total_amount=row['total_amount'],
+            )
+            for row in RecipeIngredient.objects.filter(
+                recipe__shoppingcarts__isnull=False
+            ).values(
+                'recipe__shoppingcarts__user', 'ingredient'
+            ).annotate(total_amount=Sum('amount')).order_by().iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_recipe_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to='api.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Итог списка покупок',
+                'verbose_name_plural': 'Итоги списков покупок',
+                'constraints': [models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_ingredient_total')],
+            },
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:13
+
+import api.images
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodgramuser',
+            name='avatar',
+            field=api.images.RenditionImageField(blank=True, null=True, renditions=('avatar',), upload_to='users/', verbose_name='Аватар'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=api.images.RenditionImageField(default='', renditions=('card', 'detail', 'admin'), upload_to='recipes/images/', verbose_name='Изображение блюда'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:29
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(model, ingredient_id, duplicate_ids, group_field,
+                     amount_field):
+    """
+    Переносит строки model с ингредиентов duplicate_ids на ingredient_id,
+    складывая количества строк с одинаковым group_field.
+    """
+    for row in model.objects.filter(ingredient_id__in=duplicate_ids):
+        kept, created = model.objects.get_or_create(
+            ingredient_id=ingredient_id,
+            **{group_field: getattr(row, group_field)},
+            defaults={amount_field: getattr(row, amount_field)},
+        )
+        if not created:
+            setattr(kept, amount_field,
+                    getattr(kept, amount_field) + getattr(row, amount_field))
+            kept.save(update_fields=[amount_field])
+        row.delete()
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('api', 'Ingredient')
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    ShoppingCartTotal = apps.get_model('api', 'ShoppingCartTotal')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(kept_id=Min('id'), count=Count('id')).filter(
+        count__gt=1
+    ).order_by()
+    for group in duplicates.iterator():
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit'],
+        ).exclude(pk=group['kept_id']).values_list('pk', flat=True))
+        merge_duplicates(RecipeIngredient, group['kept_id'], duplicate_ids,
+                         'recipe_id', 'amount')
+        merge_duplicates(ShoppingCartTotal, group['kept_id'], duplicate_ids,
+                         'user_id', 'total_amount')
+        Ingredient.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_stored_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -1,7 +1,96 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Value
+from django.db.models.functions import RowNumber
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+
+from .images import RenditionImageField
+
+# Поля вывода сериализаторов и столбцы моделей, из которых они берутся:
+# при выборочном выводе (api.fieldsets) загружаются только нужные.
+USER_OUTPUT_COLUMNS = {
+    "email": "email",
+    "first_name": "first_name",
+    "last_name": "last_name",
+    "avatar": "avatar",
+    "avatar_renditions": "avatar",
+}
+RECIPE_OUTPUT_COLUMNS = {
+    "name": "name",
+    "image": "image",
+    "image_renditions": "image",
+    "text": "text",
+    "cooking_time": "cooking_time",
+}
+
+
+class FoodgramUserQuerySet(models.QuerySet):
+    """
+    Набор запросов пользователей с флагами, зависящими от зрителя.
+    """
+
+    def with_subscription_flag(self, viewer):
+        """
+        Аннотирует пользователей флагом is_subscribed для viewer.
+        """
+        if not viewer.is_authenticated:
+            return self.annotate(is_subscribed=Value(False))
+        return self.annotate(is_subscribed=Exists(
+            Subscription.objects.filter(user=viewer, author=OuterRef("pk"))
+        ))
+
+    def for_viewer(self, viewer, fields=None):
+        """
+        Пользователи для FoodgramUserSerializer.
+
+        :param fields: Нужные поля вывода или None (все). Столбцы и флаг
+            is_subscribed, не попавшие в fields, не выбираются.
+        """
+        users = self
+        if fields is None or "is_subscribed" in fields:
+            users = users.with_subscription_flag(viewer)
+        if fields is not None:
+            # username нужен для сортировки и курсора пагинации.
+            users = users.only("username", *{
+                USER_OUTPUT_COLUMNS[name] for name in fields
+                if name in USER_OUTPUT_COLUMNS
+            })
+        return users
+
+    def with_recipes(self, viewer, recipes_limit=None, fields=None):
+        """
+        Авторы с числом рецептов (recipes_count) и не более чем
+        recipes_limit последними рецептами каждого (limited_recipes).
+
+        Рецепты всех авторов выбираются одним запросом с оконной
+        функцией ROW_NUMBER() OVER (PARTITION BY author_id).
+
+        :param fields: Нужные поля вывода UserWithRecipesSerializer или
+            None (все).
+        """
+        users = self.for_viewer(viewer, fields)
+        if fields is None or "recipes_count" in fields:
+            users = users.annotate(recipes_count=Count("recipes"))
+        if fields is not None and "recipes" not in fields:
+            return users
+        recipes = Recipe.objects.only(
+            "author", "name", "image", "cooking_time"
+        )
+        if recipes_limit is not None:
+            recipes = recipes.annotate(row_number=models.Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=[F("created_at").desc(), F("id").desc()],
+            )).filter(row_number__lte=recipes_limit)
+        return users.prefetch_related(
+            Prefetch("recipes", queryset=recipes, to_attr="limited_recipes")
+        )
+
+
+class FoodgramUserManager(UserManager.from_queryset(FoodgramUserQuerySet)):
+    pass
 
 
 class FoodgramUser(AbstractUser):
@@ -19,14 +108,18 @@ class FoodgramUser(AbstractUser):
     )
     first_name = models.CharField(max_length=150, verbose_name="Имя")
     last_name = models.CharField(max_length=150, verbose_name="Фамилия")
-    avatar = models.ImageField(
+    avatar = RenditionImageField(
         upload_to="users/", null=True, blank=True,
-        verbose_name="Аватар"
+        verbose_name="Аватар", renditions=("avatar",)
     )
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name="Дата изменения")
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name", "password"]
 
+    objects = FoodgramUserManager()
+
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
@@ -47,11 +140,88 @@ class Ingredient(models.Model):
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(fields=["name", "measurement_unit"],
+                                    name="unique_ingredient")
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.measurement_unit})"
 
 
+class RecipeQuerySet(models.QuerySet):
+    """
+    Набор запросов рецептов.
+    """
+
+    def for_viewer(self, viewer, fields=None, author_fields=None):
+        """
+        Рецепты с флагами is_favorited / is_in_shopping_cart для viewer,
+        автором (с флагом is_subscribed) и ингредиентами.
+
+        Число запросов не зависит от количества рецептов на странице.
+
+        :param fields: Нужные поля вывода RecipeReadSerializer или None
+            (все). Столбцы, флаги и предвыборки для остальных полей
+            пропускаются.
+        :param author_fields: То же для полей автора.
+        """
+        def needed(name):
+            return fields is None or name in fields
+
+        flags = {}
+        for name, model in (
+            ("is_favorited", Favorite),
+            ("is_in_shopping_cart", ShoppingCart),
+        ):
+            if not needed(name):
+                continue
+            flags[name] = Exists(model.objects.filter(
+                user=viewer, recipe=OuterRef("pk")
+            )) if viewer.is_authenticated else Value(False)
+        recipes = self.annotate(**flags)
+        if fields is not None:
+            # created_at нужен для курсора пагинации, author_id — для
+            # ссылки на автора.
+            recipes = recipes.only("created_at", "author", *{
+                RECIPE_OUTPUT_COLUMNS[name] for name in fields
+                if name in RECIPE_OUTPUT_COLUMNS
+            })
+        if needed("author"):
+            recipes = recipes.prefetch_related(Prefetch(
+                "author",
+                queryset=FoodgramUser.objects.for_viewer(
+                    viewer, author_fields
+                ),
+            ))
+        if needed("ingredients"):
+            recipes = recipes.prefetch_related(Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient"
+                ),
+            ))
+        return recipes
+
+    def viewer_flags(self, viewer):
+        """
+        Только флаги аутентифицированного зрителя: is_favorited,
+        is_in_shopping_cart и is_subscribed (на автора рецепта) —
+        словари values().
+        """
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=viewer, recipe=OuterRef("pk")
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=viewer, recipe=OuterRef("pk")
+            )),
+            is_subscribed=Exists(Subscription.objects.filter(
+                user=viewer, author=OuterRef("author")
+            )),
+        ).values("is_favorited", "is_in_shopping_cart", "is_subscribed")
+
+
 class Recipe(models.Model):
     """
     Модель рецептов
@@ -70,9 +240,10 @@ class Recipe(models.Model):
         verbose_name="Ингредиенты",
     )
     name = models.CharField(max_length=256, verbose_name="Название рецепта")
-    image = models.ImageField(
+    image = RenditionImageField(
         upload_to="recipes/images/", default="",
-        verbose_name="Изображение блюда"
+        verbose_name="Изображение блюда",
+        renditions=("card", "detail", "admin"),
     )
     text = models.TextField(verbose_name="Описание рецепта")
     cooking_time = models.PositiveIntegerField(
@@ -81,11 +252,16 @@ class Recipe(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True,
                                       verbose_name="Дата создания")
+    # Меняется и при изменении ингредиентов рецепта (см. signals).
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name="Дата изменения")
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
 
     def __str__(self):
         return self.name
@@ -200,3 +376,105 @@ class ShoppingCart(UserRecipeBaseModel):
     class Meta(UserRecipeBaseModel.Meta):
         verbose_name = "Список покупок"
         verbose_name_plural = "Списки покупок"
+
+
+class ShoppingCartTotal(models.Model):
+    """
+    Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается при изменении корзины и ингредиентов рецептов
+    (api.services.apply_cart_total_deltas); пересчитывается командой
+    rebuild_cart_totals.
+    """
+
+    user = models.ForeignKey(
+        FoodgramUser,
+        on_delete=models.CASCADE,
+        related_name="shopping_cart_totals",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_cart_totals",
+        verbose_name="Ингредиент",
+    )
+    total_amount = models.PositiveIntegerField(verbose_name="Количество")
+
+    class Meta:
+        verbose_name = "Итог списка покупок"
+        verbose_name_plural = "Итоги списков покупок"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "ingredient"],
+                                    name="unique_user_ingredient_total")
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.ingredient}"
+
+
+class Job(models.Model):
+    """
+    Фоновая задача в очереди (см. api.jobs).
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "В очереди"
+        RUNNING = "running", "Выполняется"
+        FAILED = "failed", "Ошибка"
+
+    name = models.CharField(max_length=200, verbose_name="Задача")
+    payload = models.JSONField(default=dict, verbose_name="Аргументы")
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED,
+        verbose_name="Статус",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Попыток"
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5, verbose_name="Попыток всего"
+    )
+    run_at = models.DateTimeField(default=timezone.now,
+                                  verbose_name="Запуск не раньше")
+    locked_by = models.CharField(max_length=100, blank=True,
+                                 verbose_name="Обработчик")
+    locked_at = models.DateTimeField(null=True, blank=True,
+                                     verbose_name="Взята в работу")
+    last_error = models.TextField(blank=True, verbose_name="Ошибка")
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ["run_at", "id"]
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="job_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class StoredFile(models.Model):
+    """
+    Файл в хранилище с адресацией по содержимому и число ссылок
+    на него (см. api.storage).
+    """
+
+    name = models.CharField(max_length=255, unique=True,
+                            verbose_name="Имя файла")
+    size = models.PositiveBigIntegerField(verbose_name="Размер")
+    refcount = models.PositiveIntegerField(default=0,
+                                           verbose_name="Число ссылок")
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Файл"
+        verbose_name_plural = "Файлы"
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
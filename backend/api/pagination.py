@@ -1,6 +1,160 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = "limit"
     page_size = 6
+    max_page_size = 100
+
+
+class KeysetLimitPagination(PageLimitPagination):
+    """
+    Пагинация по номеру страницы с опциональным режимом курсора (keyset).
+
+    Режим курсора включается параметром ?cursor= (пустое значение —
+    первая страница). Страницы выбираются условием по ключу сортировки
+    вместо OFFSET, поэтому глубокие страницы не замедляются.
+    Ключ задаётся атрибутом представления cursor_ordering и должен
+    однозначно упорядочивать строки.
+    """
+
+    cursor_query_param = "cursor"
+    default_cursor_ordering = ("-created_at", "-id")
+    invalid_cursor_message = "Некорректный курсор."
+    # Точный COUNT(*) на каждой странице не нужен: число кэшируется.
+    count_cache_timeout = 60
+
+    cursor_mode = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = remove_query_param(
+            request.build_absolute_uri(), self.page_query_param
+        )
+        self.ordering = [
+            (name.lstrip("-"), name.startswith("-"))
+            for name in getattr(
+                view, "cursor_ordering", self.default_cursor_ordering
+            )
+        ]
+        fields = [
+            queryset.model._meta.get_field(name) for name, _ in self.ordering
+        ]
+        position, reverse = self.decode_cursor(
+            request.query_params[self.cursor_query_param], fields
+        )
+        page_size = self.get_page_size(request)
+        self.count = self.get_approximate_count(queryset)
+
+        rows = queryset
+        if position is not None:
+            rows = rows.filter(self.get_keyset_filter(position, reverse))
+        rows = list(rows.order_by(*(
+            ("-" if desc != reverse else "") + name
+            for name, desc in self.ordering
+        ))[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self.get_position(rows[-1], fields)
+            if position is not None and (has_more or not reverse):
+                self.previous_position = self.get_position(rows[0], fields)
+        return rows
+
+    def get_keyset_filter(self, position, reverse):
+        """
+        Условие «строго после position» для лексикографического порядка
+        по полям ключа.
+        """
+        condition = Q()
+        equal = {}
+        for (name, desc), value in zip(self.ordering, position):
+            lookup = "lt" if desc != reverse else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    @staticmethod
+    def get_position(obj, fields):
+        return [field.value_to_string(obj) for field in fields]
+
+    def decode_cursor(self, encoded, fields):
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            position = [
+                field.to_python(value)
+                for field, value in zip(fields, cursor["p"], strict=True)
+            ]
+            return position, bool(cursor.get("r"))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        cursor = {"p": position}
+        if reverse:
+            cursor["r"] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(cursor, separators=(",", ":")).encode()
+        ).decode("ascii")
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_approximate_count(self, queryset):
+        """
+        Количество строк, кэшируемое на count_cache_timeout секунд.
+        """
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            return 0
+        key = "pagination-count:" + hashlib.md5(sql.encode()).hexdigest()
+        return cache.get_or_set(
+            key, queryset.count, self.count_cache_timeout
+        )
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
@@ -0,0 +1,47 @@
+"""
+Быстрый разбор JSON через orjson.
+"""
+import re
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+from .renderers import FastJSONRenderer, orjson
+
+# orjson читает целые больше 64 бит как float, json — как int. Тело с
+# такой длинной цепочкой цифр (в числе или строке) разбирает json.
+LONG_DIGITS = re.compile(rb"\d{19}")
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser на orjson с тем же результатом и теми же ошибками.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("_", "-") not in (
+            "utf-8", "utf8"
+        ):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if not LONG_DIGITS.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        # Тело, которое orjson не принимает (NaN при STRICT_JSON = False,
+        # одиночные суррогаты) или ошибочное:
+        # результат и текст ошибки — как у JSONParser.
+        try:
+            return json.loads(
+                body.decode(encoding),
+                parse_constant=json.strict_constant if self.strict else None,
+            )
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
@@ -0,0 +1,82 @@
+"""
+Список покупок в PDF.
+
+Документ верстается reportlab platypus, который сам переносит строки
+на новые страницы. Встроенные шрифты PDF не содержат кириллицы, поэтому
+регистрируется TrueType-шрифт DejaVu Sans (или SHOPPING_LIST_PDF_FONT)
+один раз на процесс; в документ встраиваются только использованные
+глифы.
+
+Большие списки строятся фоновой задачей (см.
+api.services.get_shopping_list_pdf).
+"""
+import os
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+# Пути DejaVu Sans в Debian/Ubuntu и Alpine (пакет font-dejavu).
+FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+)
+FONT_NAME = "ShoppingListFont"
+# Без шрифта с кириллицей текст выводится встроенным шрифтом.
+FALLBACK_FONT_NAME = "Helvetica"
+
+_font_name = None
+
+
+def get_font_path():
+    path = getattr(settings, "SHOPPING_LIST_PDF_FONT", None)
+    if path:
+        return path
+    for candidate in FONT_CANDIDATES:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def get_font_name():
+    """
+    Имя зарегистрированного в reportlab шрифта списка покупок.
+    """
+    global _font_name
+    if _font_name is None:
+        path = get_font_path()
+        if path is None:
+            _font_name = FALLBACK_FONT_NAME
+        else:
+            pdfmetrics.registerFont(TTFont(FONT_NAME, path))
+            _font_name = FONT_NAME
+    return _font_name
+
+
+def render_pdf(title, lines):
+    """
+    PDF-документ с заголовком title и строками lines.
+
+    :return: Байты документа.
+    """
+    font_name = get_font_name()
+    buffer = BytesIO()
+    document = SimpleDocTemplate(
+        buffer, pagesize=A4, title=title,
+        leftMargin=inch, rightMargin=inch, topMargin=inch, bottomMargin=inch,
+    )
+    heading = ParagraphStyle("heading", fontName=font_name, fontSize=16,
+                             leading=24, spaceAfter=12)
+    body = ParagraphStyle("body", fontName=font_name, fontSize=12,
+                          leading=18)
+    document.build(
+        [Paragraph(escape(title), heading)]
+        + [Paragraph(escape(line), body) for line in lines]
+    )
+    return buffer.getvalue()
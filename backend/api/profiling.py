@@ -0,0 +1,336 @@
+"""
+Профилирование отдельных запросов API по требованию.
+
+Администратор включает профилирование заголовком X-Profile или
+параметром ?_profile= со значением cprofile (или 1) либо sample:
+    cprofile — детерминированный профиль cProfile (файл pstats);
+    sample — выборка стеков потока запроса раз в PROFILE_SAMPLE_INTERVAL
+             секунд (файл speedscope JSON), почти не замедляет запрос.
+Результат вместе с журналом SQL сохраняется в PROFILE_DIR, а его
+идентификатор возвращается в заголовке X-Profile-Id.
+
+Число профилей ограничено (PROFILE_RATE_LIMIT в минуту на все
+процессы, PROFILE_MAX_COUNT хранимых), поэтому механизм можно не
+отключать в продакшене.
+"""
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import uuid
+from time import perf_counter, time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.response import SimpleTemplateResponse
+from rest_framework.permissions import IsAdminUser
+
+from .querybudget import QueryInspector
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_QUERY_PARAM = "_profile"
+PROFILE_MODES = {"1": "cprofile", "cprofile": "cprofile", "sample": "sample"}
+
+
+def get_profile_dir():
+    return str(getattr(
+        settings, "PROFILE_DIR",
+        os.path.join(tempfile.gettempdir(), "foodgram-profiles"),
+    ))
+
+
+def get_profile_paths(profile_id):
+    """
+    Пути файлов профиля: (метаданные, данные профилировщика).
+    """
+    base = os.path.join(get_profile_dir(), profile_id)
+    return f"{base}.json", f"{base}.data"
+
+
+def take_profile_slot():
+    """
+    Разрешает не больше PROFILE_RATE_LIMIT профилей в минуту.
+    """
+    key = f"profile-rate:{int(time() // 60)}"
+    cache.add(key, 0, 60)
+    try:
+        return cache.incr(key) <= getattr(settings, "PROFILE_RATE_LIMIT", 10)
+    except ValueError:
+        return False
+
+
+def remove_old_profiles():
+    """
+    Удаляет самые старые профили сверх PROFILE_MAX_COUNT.
+    """
+    directory = get_profile_dir()
+    meta_files = sorted(
+        (entry for entry in os.scandir(directory)
+         if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    extra = len(meta_files) - getattr(settings, "PROFILE_MAX_COUNT", 100)
+    for entry in meta_files[:max(extra, 0)]:
+        for path in get_profile_paths(entry.name.removesuffix(".json")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class StackSampler:
+    """
+    Выборочный профилировщик: фоновый поток периодически снимает стек
+    потока запроса, пока профилировщик включён (между enable() и
+    disable()). Число снимков ограничено max_samples.
+    """
+
+    def __init__(self, interval, max_samples):
+        self.interval = interval
+        self.max_samples = max_samples
+        self.thread_id = threading.get_ident()
+        self.frames = {}
+        self.samples = []
+        self._stop = threading.Event()
+        self._active = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _frame_index(self, frame):
+        code = frame.f_code
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        return self.frames.setdefault(key, len(self.frames))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # Между частями потокового ответа поток запроса выполняет
+            # код сервера, он в профиль не входит.
+            if not self._active.is_set():
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_index(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            if len(self.samples) >= self.max_samples:
+                break
+
+    def enable(self):
+        self._active.set()
+        if self._thread.ident is None:
+            self._thread.start()
+
+    def disable(self):
+        self._active.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, name):
+        """
+        Профиль в формате speedscope (sampled).
+        """
+        interval = self.interval * 1000
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [
+                {"name": function, "file": file, "line": line}
+                for function, file, line in self.frames
+            ]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": interval * len(self.samples),
+                "samples": self.samples,
+                "weights": [interval] * len(self.samples),
+            }],
+        }).encode()
+
+
+class CProfiler:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def enable(self):
+        self.profile.enable()
+
+    def disable(self):
+        self.profile.disable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, name):
+        self.profile.create_stats()
+        # Формат файла pstats (Stats.dump_stats).
+        return marshal.dumps(self.profile.stats)
+
+
+class RequestProfile:
+    """
+    Профиль одного запроса: профилировщик и журнал SQL.
+    """
+
+    def __init__(self, request, mode):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.request = request
+        if mode == "sample":
+            self.profiler = StackSampler(
+                getattr(settings, "PROFILE_SAMPLE_INTERVAL", 0.005),
+                getattr(settings, "PROFILE_MAX_SAMPLES", 10000),
+            )
+        else:
+            self.profiler = CProfiler()
+        self.inspector = QueryInspector()
+        self.duration = 0.0
+        self._started = None
+
+    def resume(self):
+        self._started = perf_counter()
+        self.inspector.__enter__()
+        self.profiler.enable()
+
+    def pause(self):
+        self.profiler.disable()
+        self.inspector.__exit__(None, None, None)
+        self.duration += perf_counter() - self._started
+
+    def finish(self):
+        self.profiler.stop()
+        name = f"{self.request.method} {self.request.path}"
+        meta = {
+            "id": self.id,
+            "mode": self.mode,
+            "method": self.request.method,
+            "path": self.request.get_full_path(),
+            "user": self.request.user.pk,
+            "created": time(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "queries": [
+                {
+                    "sql": query.sql,
+                    "duration_ms": round(query.duration * 1000, 3),
+                    "field": query.field,
+                }
+                for query in self.inspector.queries
+            ],
+        }
+        data = self.profiler.dump(name)
+        os.makedirs(get_profile_dir(), exist_ok=True)
+        meta_path, data_path = get_profile_paths(self.id)
+        with open(data_path, "wb") as file:
+            file.write(data)
+        with open(meta_path, "w") as file:
+            json.dump(meta, file, ensure_ascii=False)
+        remove_old_profiles()
+
+    def stop(self):
+        self.pause()
+        self.finish()
+
+    def wrap_streaming(self, content):
+        """
+        Профилирует формирование тела потокового ответа по частям.
+        """
+        try:
+            while True:
+                self.resume()
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    return
+                finally:
+                    self.pause()
+                yield chunk
+        finally:
+            self.finish()
+
+
+def load_profile(profile_id):
+    """
+    Метаданные и данные профиля или None, если профиля нет.
+    """
+    meta_path, data_path = get_profile_paths(profile_id)
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+        with open(data_path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    return meta, data
+
+
+def format_pstats(data, limit=40):
+    """
+    Текстовая сводка профиля cProfile: функции по суммарному времени.
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(stream=stream)
+    stats.stats = marshal.loads(data)
+    stats.get_top_level_stats()
+    stats.sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+class ProfilingMixin:
+    """
+    Примесь для представлений DRF: профилирует запрос администратора,
+    если он запрошен заголовком X-Profile или параметром ?_profile=.
+    """
+
+    request_profile = None
+
+    def get_profile_mode(self, request):
+        value = request.META.get(PROFILE_HEADER) or request.GET.get(
+            PROFILE_QUERY_PARAM
+        )
+        return PROFILE_MODES.get((value or "").lower())
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        mode = self.get_profile_mode(request)
+        if (
+            mode
+            and IsAdminUser().has_permission(request, self)
+            and take_profile_slot()
+        ):
+            self.request_profile = RequestProfile(request, mode)
+            self.request_profile.resume()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        profile = self.request_profile
+        if profile is None:
+            return response
+        self.request_profile = None
+        response["X-Profile-Id"] = profile.id
+        if (
+            isinstance(response, SimpleTemplateResponse)
+            and not response.is_rendered
+        ):
+            # Отрисовка ответа тоже входит в профиль.
+            response.add_post_render_callback(
+                lambda response: profile.stop()
+            )
+            return response
+        profile.pause()
+        if response.streaming:
+            response.streaming_content = profile.wrap_streaming(
+                iter(response.streaming_content)
+            )
+        else:
+            profile.finish()
+        return response
@@ -0,0 +1,226 @@
+"""
+Учёт SQL-запросов: число, суммарное время и повторяющиеся запросы.
+
+QueryInspector подключается к соединению через execute_wrapper и
+записывает каждый запрос вместе со стеком вызовов и полем
+сериализатора, из которого запрос был сделан. Запросы одной «формы»
+(SQL без параметров), выполненные много раз, — признак N+1.
+
+Используется промежуточным слоем QueryInspectorMiddleware (в
+разработке) и контекстным менеджером query_budget (в тестах).
+"""
+import logging
+import re
+import sys
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.fields import Field
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+logger = logging.getLogger(__name__)
+
+# Сколько одинаковых запросов за один HTTP-запрос считать N+1.
+N_PLUS_ONE_THRESHOLD = 3
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def get_query_shape(sql):
+    """
+    Форма запроса: SQL без параметров, списки IN (...) любой длины
+    считаются одинаковыми.
+    """
+    return _WHITESPACE.sub(" ", _IN_LIST.sub("(...)", sql)).strip()
+
+
+def get_serializer_field(frame):
+    """
+    Поле сериализатора, при выводе которого выполняется запрос:
+    «Сериализатор.поле» для ближайшего такого кадра стека или None.
+    """
+    while frame is not None:
+        field = frame.f_locals.get("self")
+        # type() вместо isinstance(): isinstance() вычисляет ленивые
+        # объекты (например, request.user), а это новый запрос.
+        field_type = type(field)
+        name = frame.f_code.co_name
+        if (
+            issubclass(field_type, Field)
+            and field.field_name
+            and name in ("get_attribute", "to_representation")
+            # Вложенный сериализатор, выводящий свои поля, — не источник
+            # запроса; источник — одно из его полей. ListSerializer же
+            # сам загружает связанные объекты.
+            and not (
+                issubclass(field_type, BaseSerializer)
+                and not issubclass(field_type, ListSerializer)
+                and name == "to_representation"
+            )
+        ):
+            return f"{type(field.parent).__name__}.{field.field_name}"
+        frame = frame.f_back
+    return None
+
+
+def get_project_stack(frame):
+    """
+    Стек вызовов только из кода проекта.
+    """
+    stack = traceback.StackSummary.extract(
+        traceback.walk_stack(frame), lookup_lines=False
+    )
+    stack.reverse()
+    base_dir = str(settings.BASE_DIR)
+    return traceback.StackSummary.from_list([
+        entry for entry in stack
+        if entry.filename.startswith(base_dir)
+        and "site-packages" not in entry.filename
+    ])
+
+
+@dataclass
+class QueryRecord:
+    sql: str
+    shape: str
+    duration: float
+    field: str
+    stack: traceback.StackSummary
+
+
+class QueryInspector:
+    """
+    Записывает запросы, выполненные внутри блока with.
+
+    :param using: Псевдонимы соединений (по умолчанию — все).
+    """
+
+    def __init__(self, using=None):
+        self.using = using or list(connections)
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = sys._getframe(1)
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(QueryRecord(
+                sql=sql,
+                shape=get_query_shape(sql),
+                duration=perf_counter() - started,
+                field=get_serializer_field(frame),
+                stack=get_project_stack(frame),
+            ))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in self.using:
+            self._stack.enter_context(
+                connections[alias].execute_wrapper(self)
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(query.duration for query in self.queries)
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """
+        Повторяющиеся запросы: список (число повторов, первый запрос)
+        для форм, встретившихся не меньше threshold раз.
+        """
+        counts = Counter(query.shape for query in self.queries)
+        first = {}
+        for query in self.queries:
+            first.setdefault(query.shape, query)
+        return [
+            (count, first[shape])
+            for shape, count in counts.most_common()
+            if count >= threshold
+        ]
+
+    def report(self):
+        """
+        Текстовый отчёт: запросы по порядку и найденные N+1.
+        """
+        lines = [
+            f"{self.count} запросов, {self.total_time * 1000:.1f} мс:"
+        ]
+        for idx, query in enumerate(self.queries, 1):
+            source = f" [{query.field}]" if query.field else ""
+            lines.append(f"{idx}. {query.sql}{source}")
+        for count, query in self.repeated():
+            lines.append(
+                f"\nN+1: {count} запросов из {query.field or '?'}: "
+                f"{query.shape}\n" + "".join(query.stack.format())
+            )
+        return "\n".join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries, using=None):
+    """
+    Проверяет, что блок with выполняет не больше max_queries запросов.
+
+    При превышении бросает QueryBudgetExceeded со списком запросов и
+    стеком первого запроса сверх бюджета.
+    """
+    with QueryInspector(using) as inspector:
+        yield inspector
+    if inspector.count > max_queries:
+        extra = inspector.queries[max_queries]
+        raise QueryBudgetExceeded(
+            f"Бюджет {max_queries} запросов превышен.\n"
+            f"{inspector.report()}\n\n"
+            f"Запрос №{max_queries + 1} выполнен из:\n"
+            + "".join(extra.stack.format())
+        )
+
+
+class QueryInspectorMiddleware:
+    """
+    Считает запросы к базе данных для каждого HTTP-запроса.
+
+    Добавляет заголовки X-Query-Count и X-Query-Time (мс) и пишет в лог
+    предупреждение о повторяющихся запросах. Включается настройкой
+    QUERY_INSPECTOR (по умолчанию выключена). Запросы, выполненные при
+    отдаче потокового ответа, не учитываются.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_INSPECTOR", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryInspector() as inspector:
+            response = self.get_response(request)
+        response["X-Query-Count"] = str(inspector.count)
+        response["X-Query-Time"] = f"{inspector.total_time * 1000:.1f}"
+        for count, query in inspector.repeated():
+            logger.warning(
+                "N+1 в %s %s: %d запросов из %s: %s\n%s",
+                request.method, request.path, count, query.field or "?",
+                query.shape, "".join(query.stack.format()),
+            )
+        return response
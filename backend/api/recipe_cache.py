@@ -0,0 +1,149 @@
+"""
+Кэш ответов GET /api/recipes/{id}/.
+
+В кэше хранится не зависящая от зрителя часть вывода
+RecipeReadSerializer. Ключ содержит версию рецепта (меняется сигналами
+Recipe и touch_recipes()), версию каталога ингредиентов и адрес
+сайта (ссылки на изображения абсолютные). Вместе с данными хранится
+версия автора (меняется при сохранении FoodgramUser), она сверяется
+при чтении. Пока рендишены изображения рецепта или аватара автора не
+построены, в выводе адреса оригиналов и он не кэшируется. Флаги
+зрителя is_favorited, is_in_shopping_cart и is_subscribed
+подставляются при каждом ответе одним запросом.
+"""
+import hashlib
+from functools import partial
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+
+from .catalog import CATALOG_VERSION_KEY
+from .models import Recipe
+from .serializers import RecipeReadSerializer
+from .services import invalidate_shopping_lists
+from .versioning import bump_version, get_version, get_versions
+
+RECIPE_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Версия списка рецептов: меняется вместе с версией любого рецепта
+# или пользователя и при создании рецепта (валидатор ETag списка).
+RECIPE_LIST_VERSION_KEY = "recipe-list-version"
+
+
+def recipe_version_key(recipe_id):
+    return f"recipe-version:{recipe_id}"
+
+
+def user_version_key(user_id):
+    return f"user-version:{user_id}"
+
+
+def bump_recipe_version(*recipe_ids):
+    bump_version(
+        *map(recipe_version_key, recipe_ids), RECIPE_LIST_VERSION_KEY
+    )
+
+
+def touch_recipes(recipe_ids):
+    """
+    Отмечает изменение ингредиентов рецептов recipe_ids, сделанное в
+    обход Recipe.save() (админка, удаление ингредиента): одним запросом
+    обновляет дату изменения, сбрасывает готовые списки покупок и после
+    фиксации транзакции меняет версии рецептов.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now()
+    )
+    invalidate_shopping_lists(*recipe_ids)
+    transaction.on_commit(partial(bump_recipe_version, *recipe_ids))
+
+
+def bump_user_version(user_id):
+    bump_version(user_version_key(user_id), RECIPE_LIST_VERSION_KEY)
+
+
+def bump_recipe_list_version():
+    bump_version(RECIPE_LIST_VERSION_KEY)
+
+
+def get_recipe_detail_cache_key(recipe_id, request):
+    versions = get_versions(
+        [recipe_version_key(recipe_id), CATALOG_VERSION_KEY]
+    )
+    site = hashlib.md5(
+        request.build_absolute_uri("/").encode()
+    ).hexdigest()
+    return (
+        f"recipe-detail:{recipe_id}:"
+        f"{versions[recipe_version_key(recipe_id)]}:"
+        f"{versions[CATALOG_VERSION_KEY]}:{site}"
+    )
+
+
+def build_recipe_detail(recipe_id, request):
+    """
+    Вывод RecipeReadSerializer без флагов зрителя и версия автора.
+    """
+    author_id = Recipe.objects.filter(pk=recipe_id).values_list(
+        "author_id", flat=True
+    ).first()
+    if author_id is None:
+        raise Http404
+    # Версия читается до данных автора: изменение автора после этого
+    # момента сделает запись недействительной.
+    author_version = get_version(user_version_key(author_id))
+    # Флаги посчитаны как для анонимного зрителя (без запросов)
+    # и всё равно заменяются при ответе.
+    recipe = Recipe.objects.for_viewer(AnonymousUser()).filter(
+        pk=recipe_id
+    ).first()
+    if recipe is None:
+        raise Http404
+    data = RecipeReadSerializer(recipe, context={"request": request}).data
+    return {
+        "data": data,
+        "author_id": recipe.author_id,
+        "author_version": author_version,
+        "renditions_ready": all(
+            file.renditions_ready()
+            for file in (recipe.image, recipe.author.avatar) if file
+        ),
+    }
+
+
+def get_recipe_detail(recipe_id, request):
+    """
+    Данные рецепта для ответа GET /api/recipes/{id}/.
+
+    :raises Http404: Рецепта нет.
+    """
+    cache_key = get_recipe_detail_cache_key(recipe_id, request)
+    entry = cache.get(cache_key)
+    if entry is None or entry["author_version"] != get_version(
+        user_version_key(entry["author_id"])
+    ):
+        entry = build_recipe_detail(recipe_id, request)
+        if entry["renditions_ready"]:
+            cache.set(cache_key, entry, RECIPE_DETAIL_CACHE_TIMEOUT)
+    data = entry["data"]
+    if request.user.is_authenticated:
+        flags = Recipe.objects.filter(pk=recipe_id).viewer_flags(
+            request.user
+        ).first()
+        if flags is None:
+            raise Http404
+    else:
+        flags = dict.fromkeys(
+            ("is_favorited", "is_in_shopping_cart", "is_subscribed"), False
+        )
+    data["is_favorited"] = flags["is_favorited"]
+    data["is_in_shopping_cart"] = flags["is_in_shopping_cart"]
+    data["author"]["is_subscribed"] = flags["is_subscribed"]
+    return data
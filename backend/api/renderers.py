@@ -0,0 +1,61 @@
+"""
+Быстрая отрисовка JSON через orjson.
+
+FastJSONRenderer выдаёт те же байты, что и JSONRenderer DRF: дата и
+время, Decimal, UUID, ленивые строки и прочие нестандартные значения
+преобразуются кодировщиком DRF, U+2028 и U+2029 экранируются. Случаи,
+которые orjson обрабатывает иначе (отступы для браузерного API,
+UNICODE_JSON = False, STRICT_JSON = False, целые больше 64 бит),
+отрисовываются JSONRenderer. Расходятся только числа с плавающей
+точкой: экспонента записывается короче (1e23 вместо 1e+23, то же
+значение), а NaN и бесконечности orjson пишет как null, тогда как
+JSONRenderer отказывает. В моделях проекта таких чисел нет. Без
+установленного orjson класс работает как JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+if orjson is not None:
+    # Дата и время — через кодировщик DRF: orjson записывает UTC как
+    # «+00:00», а DRF — как «Z». Dataclass DRF не сериализует.
+    ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=ORJSON_OPTIONS,
+            )
+        except orjson.JSONEncodeError:
+            # Ошибка (или значение, которое понимает только json)
+            # возникнет так же, как в JSONRenderer.
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        return ret.replace(
+            b"\xe2\x80\xa8", b"\\u2028"
+        ).replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -1,9 +1,11 @@
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from rest_framework import serializers
 from djoser.serializers import (
     UserSerializer,
 )
 from rest_framework.exceptions import ValidationError, NotAuthenticated
+from .fields import ImageRenditionsField, ProcessedImageField
+from .fieldsets import SparseFieldsetMixin
 from .models import (
     FoodgramUser,
     Recipe,
@@ -12,11 +14,13 @@ from .models import (
     Favorite,
     ShoppingCart,
 )
+from .services import update_recipe_cart_totals
 
 
-class FoodgramUserSerializer(UserSerializer):
+class FoodgramUserSerializer(SparseFieldsetMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    avatar = Base64ImageField(required=False)
+    avatar = ProcessedImageField(required=False)
+    avatar_renditions = ImageRenditionsField(source="avatar")
 
     class Meta(UserSerializer.Meta):
         model = FoodgramUser
@@ -28,23 +32,28 @@ class FoodgramUserSerializer(UserSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_renditions",
         )
 
     def get_is_subscribed(self, other_user):
+        if hasattr(other_user, "is_subscribed"):
+            # Флаг уже посчитан FoodgramUserQuerySet.with_subscription_flag.
+            return other_user.is_subscribed
         request = self.context.get("request")
-        return (
+        return bool(
             request
             and request.user.is_authenticated
-            and request.user.subscriptions.filter(id=other_user.id).exists()
+            and request.user.subscriptions.filter(author=other_user).exists()
         )
 
 
 class UserAvatarSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField(required=True)
+    avatar = ProcessedImageField(required=True)
+    avatar_renditions = ImageRenditionsField(source="avatar")
 
     class Meta:
         model = FoodgramUser
-        fields = ["avatar"]
+        fields = ["avatar", "avatar_renditions"]
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -53,7 +62,9 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit")
 
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(
+    SparseFieldsetMixin, serializers.ModelSerializer
+):
     id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
     name = serializers.CharField(source="ingredient.name", read_only=True)
     measurement_unit = serializers.CharField(
@@ -66,12 +77,13 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author = FoodgramUserSerializer()
     ingredients = RecipeIngredientSerializer(
         many=True, source="recipe_ingredients"
     )
-    image = Base64ImageField()
+    image = ProcessedImageField()
+    image_renditions = ImageRenditionsField(source="image")
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -85,12 +97,16 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_renditions",
             "text",
             "cooking_time",
         )
         read_only_fields = fields
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, "is_favorited"):
+            # Флаг уже посчитан RecipeQuerySet.for_viewer.
+            return recipe.is_favorited
         user = self.context.get("request").user
         return (
             user.is_authenticated
@@ -98,6 +114,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, "is_in_shopping_cart"):
+            return recipe.is_in_shopping_cart
         user = self.context.get("request").user
         return (
             user.is_authenticated
@@ -105,11 +123,29 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeReferenceSerializer(RecipeReadSerializer):
+    """
+    Рецепт со ссылкой author_id вместо автора: авторы выводятся один раз
+    в блоке included.users (?include=users).
+    """
+
+    author = None
+    author_id = serializers.IntegerField(read_only=True)
+    fieldset_aliases = {"author_id": "author"}
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = tuple(
+            "author_id" if name == "author" else name
+            for name in RecipeReadSerializer.Meta.fields
+        )
+        read_only_fields = fields
+
+
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         many=True, source="recipe_ingredients"
     )
-    image = Base64ImageField(required=True)
+    image = ProcessedImageField(required=True)
     cooking_time = serializers.IntegerField(min_value=1)
 
     class Meta:
@@ -123,6 +159,8 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             "text",
             "cooking_time",
         )
+        # Автор — текущий пользователь (см. create).
+        read_only_fields = ("author",)
 
     def validate_ingredients(self, ingredients):
         """
@@ -166,27 +204,78 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         self.create_recipeingredient_objects(recipe, ingredients_data)
         return recipe
 
-    def update(self, recipe, validated_data):
-        ingredients_data = validated_data.pop("recipe_ingredients")
+    def update_recipeingredient_objects(self, recipe, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к ingredients_data.
 
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
+        Затрагиваются только изменившиеся строки: не более одного
+        удаления, одного обновления и одной вставки в таблицу
+        ингредиентов рецепта. Эти bulk-операции сигналов не отправляют:
+        дату изменения, списки покупок и кэш рецепта один раз обновляет
+        сохранение рецепта в update() (см. api.signals.recipe_changed).
+        """
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        old_amounts = {
+            ingredient_id: recipe_ingredient.amount
+            for ingredient_id, recipe_ingredient in existing.items()
+        }
+        new_amounts = {
+            ingredient_data["id"].id: ingredient_data["amount"]
+            for ingredient_data in ingredients_data
+        }
+        if new_amounts == old_amounts:
+            return
+
+        to_update = []
+        for ingredient_id, amount in new_amounts.items():
+            recipe_ingredient = existing.get(ingredient_id)
+            if recipe_ingredient and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        to_delete = [
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in existing.items()
+            if ingredient_id not in new_amounts
+        ]
+
+        if to_delete:
+            RecipeIngredient.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ["amount"])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in existing
+        )
+        update_recipe_cart_totals(recipe.id, old_amounts, new_amounts)
 
-        self.create_recipeingredient_objects(recipe, ingredients_data)
+    @transaction.atomic
+    def update(self, recipe, validated_data):
+        ingredients_data = validated_data.pop("recipe_ingredients", None)
+        if ingredients_data is not None:
+            self.update_recipeingredient_objects(recipe, ingredients_data)
         return super().update(recipe, validated_data)
 
 
-class RecipeMinifiedSerializer(serializers.ModelSerializer):
+class RecipeMinifiedSerializer(
+    SparseFieldsetMixin, serializers.ModelSerializer
+):
+    image_renditions = ImageRenditionsField(source="image")
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_renditions", "cooking_time")
         read_only_fields = fields
 
 
 class UserWithRecipesSerializer(FoodgramUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source="recipes.count", read_only=True
-    )
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta(FoodgramUserSerializer.Meta):
         fields = FoodgramUserSerializer.Meta.fields + (
@@ -195,11 +284,22 @@ class UserWithRecipesSerializer(FoodgramUserSerializer):
         )
 
     def get_recipes(self, user):
-        request = self.context.get("request")
-
+        if hasattr(user, "limited_recipes"):
+            # Рецепты уже выбраны FoodgramUserQuerySet.with_recipes.
+            recipes = user.limited_recipes
+        else:
+            recipes = user.recipes.all()
+            recipes_limit = self.context.get("recipes_limit")
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+
+        fieldset = self.get_fieldset()
         return RecipeMinifiedSerializer(
-            user.recipes.all()[: int(
-                request.GET.get("recipes_limit", default=10**10)
-            )],
-            many=True, read_only=True,
+            recipes, many=True, read_only=True,
+            fieldset=fieldset and fieldset.child("recipes"),
         ).data
+
+    def get_recipes_count(self, user):
+        if hasattr(user, "recipes_count"):
+            return user.recipes_count
+        return user.recipes.count()
@@ -1,7 +1,20 @@
+import csv
+import hashlib
+import json
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.db.models import Sum
 from django.utils.timezone import now
 
-from .models import RecipeIngredient
+from .catalog import get_catalog_version
+from .jobs import enqueue, job
+from .models import Recipe, RecipeIngredient, ShoppingCart, ShoppingCartTotal
+from .versioning import bump_version, get_version
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 def get_shopping_cart_ingredients(user):
@@ -9,49 +22,383 @@ def get_shopping_cart_ingredients(user):
     Получение списка ингредиентов из корзины пользователя.
     """
     return (
-        RecipeIngredient.objects.filter(recipe__shoppingcarts__user=user)
-        .values("ingredient__name", "ingredient__measurement_unit")
-        .annotate(total_amount=Sum("amount"))
+        ShoppingCartTotal.objects.filter(user=user)
+        .values(
+            "ingredient__name", "ingredient__measurement_unit", "total_amount"
+        )
         .order_by("ingredient__name")
     )
 
 
-def generate_shopping_list(ingredients, recipes):
+def calculate_cart_totals():
+    """
+    Итоги всех корзин, посчитанные заново по RecipeIngredient.
+
+    Returns:
+        Iterator[tuple]: Кортежи (user_id, ingredient_id, total_amount)
+    """
+    return (
+        RecipeIngredient.objects.filter(recipe__shoppingcarts__isnull=False)
+        .values("recipe__shoppingcarts__user", "ingredient")
+        .annotate(total_amount=Sum("amount"))
+        .values_list(
+            "recipe__shoppingcarts__user", "ingredient", "total_amount"
+        )
+        .order_by()
+        .iterator()
+    )
+
+
+def get_recipe_amounts(recipe_id):
+    """
+    Количества ингредиентов рецепта: {ingredient_id: amount}.
     """
-    Генерирует текстовый файл со списком покупок.
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id=recipe_id)
+        .values_list("ingredient_id", "amount")
+    )
+
+
+# Сколько раз повторять изменение итогов, если недостающую строку
+# одновременно вставила другая транзакция.
+CART_TOTAL_ATTEMPTS = 3
+
+
+@transaction.atomic
+def apply_cart_total_deltas(user_ids, deltas):
+    """
+    Изменяет итоги корзин пользователей user_ids на deltas.
+
+    Выполняет не более трёх запросов на запись (вставка, обновление,
+    удаление обнулившихся строк). select_for_update не блокирует ещё
+    не созданные строки, поэтому при конфликте вставки изменение
+    повторяется с уже вставленной строкой.
+
+    :param user_ids: Идентификаторы пользователей.
+    :param deltas: Изменения количеств {ingredient_id: delta}.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    for attempt in range(1, CART_TOTAL_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                write_cart_total_deltas(user_ids, deltas)
+            return
+        except IntegrityError:
+            if attempt == CART_TOTAL_ATTEMPTS:
+                raise
+
+
+def write_cart_total_deltas(user_ids, deltas):
+    existing = {
+        (total.user_id, total.ingredient_id): total
+        for total in ShoppingCartTotal.objects.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, delta in deltas.items():
+            total = existing.get((user_id, ingredient_id))
+            if total is None:
+                if delta > 0:
+                    to_create.append(ShoppingCartTotal(
+                        user_id=user_id, ingredient_id=ingredient_id,
+                        total_amount=delta,
+                    ))
+            elif total.total_amount + delta > 0:
+                total.total_amount += delta
+                to_update.append(total)
+            else:
+                to_delete.append(total.pk)
+    if to_update:
+        ShoppingCartTotal.objects.bulk_update(to_update, ["total_amount"])
+    if to_delete:
+        ShoppingCartTotal.objects.filter(pk__in=to_delete).delete()
+    if to_create:
+        ShoppingCartTotal.objects.bulk_create(to_create)
+
+
+def change_cart_totals(user_id, recipe_id, sign=1):
+    """
+    Добавляет (sign=1) или вычитает (sign=-1) ингредиенты рецепта
+    из итогов корзины пользователя.
+    """
+    apply_cart_total_deltas([user_id], {
+        ingredient_id: sign * amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+@contextmanager
+def sync_recipe_cart_totals(recipe_ids):
+    """
+    Переносит в итоги корзин изменения ингредиентов рецептов recipe_ids,
+    сделанные внутри блока with.
+    """
+    old_amounts = {
+        recipe_id: get_recipe_amounts(recipe_id)
+        for recipe_id in set(recipe_ids)
+    }
+    yield
+    for recipe_id, amounts in old_amounts.items():
+        update_recipe_cart_totals(
+            recipe_id, amounts, get_recipe_amounts(recipe_id)
+        )
+
+
+def update_recipe_cart_totals(recipe_id, old_amounts, new_amounts):
+    """
+    Переносит изменение ингредиентов рецепта в итоги корзин,
+    в которых лежит рецепт.
+    """
+    apply_cart_total_deltas(
+        ShoppingCart.objects.filter(recipe_id=recipe_id)
+        .values_list("user_id", flat=True),
+        {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        },
+    )
+
+
+def get_shopping_cart_recipes(user):
+    """
+    Получение списка рецептов из корзины пользователя.
+    """
+    return (
+        Recipe.objects.filter(shoppingcarts__user=user)
+        .values("name", "author__username")
+        .order_by("name")
+    )
+
+
+def get_shopping_list_header(file_format):
+    """
+    Заголовок списка покупок с датой составления. Он не кэшируется
+    вместе со списком и формируется при каждой выгрузке.
+    """
+    if file_format != "txt":
+        return b""
+    return (
+        f"Список покупок\n"
+        f"Дата составления: {now().strftime('%d.%m.%Y %H:%M')}\n\n"
+    ).encode()
+
+
+def iter_shopping_list_txt(ingredients, recipes):
+    """
+    Строки текстового списка покупок без заголовка
+    (см. get_shopping_list_header).
 
     Args:
-        ingredients (QuerySet): QuerySet с ингредиентами, содержащий поля:
+        ingredients (Iterable): Ингредиенты с полями:
             - ingredient__name: Название ингредиента
             - ingredient__measurement_unit: Единица измерения
             - total_amount: Общее количество ингредиента
-        recipes (QuerySet): QuerySet с рецептами, содержащий поля:
+        recipes (Iterable): Рецепты с полями:
             - name: Название рецепта
             - author__username: Имя автора рецепта
 
-    Returns:
-        str: Текст списка покупок
+    Yields:
+        str: Строки списка покупок
     """
-    products = [
-        f"{idx}. {item['ingredient__name'].capitalize()} "
-        f"({item['ingredient__measurement_unit']}) - {item['total_amount']}"
-        for idx, item in enumerate(ingredients, 1)
-    ]
+    yield "\nПродукты:\n"
+    for idx, item in enumerate(ingredients, 1):
+        yield (
+            f"{idx}. {item['ingredient__name'].capitalize()} "
+            f"({item['ingredient__measurement_unit']}) - "
+            f"{item['total_amount']}"
+        )
+    yield "\nРецепты:\n"
+    for idx, recipe in enumerate(recipes, 1):
+        yield f"{idx}. {recipe['name']} (автор: {recipe['author__username']})"
 
-    recipes_list = [
-        f"{idx}. {recipe['name']} (автор: {recipe['author__username']})"
-        for idx, recipe in enumerate(recipes, 1)
+
+class Echo:
+    """
+    Псевдофайл для csv.writer: возвращает строку вместо записи.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_shopping_list_csv(ingredients, recipes):
+    """
+    Строки списка покупок в формате CSV (только продукты).
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(["name", "measurement_unit", "amount"])
+    for item in ingredients:
+        yield writer.writerow([
+            item["ingredient__name"],
+            item["ingredient__measurement_unit"],
+            item["total_amount"],
+        ])
+
+
+def iter_shopping_list_json(ingredients, recipes):
+    """
+    Части JSON-документа со списком продуктов и рецептов.
+    """
+    def iter_array(items):
+        for idx, item in enumerate(items):
+            yield ("," if idx else "") + json.dumps(item, ensure_ascii=False)
+
+    yield '{"ingredients":['
+    yield from iter_array(
+        {
+            "name": item["ingredient__name"],
+            "measurement_unit": item["ingredient__measurement_unit"],
+            "amount": item["total_amount"],
+        }
+        for item in ingredients
+    )
+    yield '],"recipes":['
+    yield from iter_array(
+        {"name": recipe["name"], "author": recipe["author__username"]}
+        for recipe in recipes
+    )
+    yield "]}"
+
+
+# Формат: (генератор строк, разделитель строк, content type, расширение).
+SHOPPING_LIST_FORMATS = {
+    "txt": (iter_shopping_list_txt, "\n", "text/plain; charset=utf-8",
+            "txt"),
+    "csv": (iter_shopping_list_csv, "", "text/csv; charset=utf-8", "csv"),
+    "json": (iter_shopping_list_json, "", "application/json", "json"),
+}
+
+
+def shopping_list_version_key(user_id):
+    return f"shopping-list-version:{user_id}"
+
+
+def get_shopping_list_cache_key(user, file_format):
+    """
+    Ключ кэша готового списка покупок.
+
+    Ключ включает хэш содержимого корзины, версию списка пользователя
+    (меняется при правке рецептов из корзины) и версию каталога.
+    """
+    recipe_ids = ShoppingCart.objects.filter(user=user).order_by(
+        "recipe_id"
+    ).values_list("recipe_id", flat=True)
+    cart_hash = hashlib.sha1(
+        ",".join(map(str, recipe_ids)).encode()
+    ).hexdigest()
+    return (
+        f"shopping-list:{user.pk}:{file_format}:{cart_hash}:"
+        f"{get_version(shopping_list_version_key(user.pk))}:"
+        f"{get_catalog_version()}"
+    )
+
+
+def iter_shopping_list(user, file_format, cache_key=None):
+    """
+    Генератор байтов списка покупок в формате file_format.
+
+    Если передан cache_key, готовый документ без заголовка сохраняется
+    в кэш после того, как будет отдан целиком.
+    """
+    iter_lines, separator, _, _ = SHOPPING_LIST_FORMATS[file_format]
+    header = get_shopping_list_header(file_format)
+    if header:
+        yield header
+    chunks = []
+    for idx, line in enumerate(iter_lines(
+        get_shopping_cart_ingredients(user).iterator(),
+        get_shopping_cart_recipes(user).iterator(),
+    )):
+        chunk = ((separator if idx else "") + line).encode()
+        chunks.append(chunk)
+        yield chunk
+    if cache_key is not None:
+        cache.set(cache_key, b"".join(chunks), SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+SHOPPING_LIST_PDF_TITLE = "Список покупок"
+# Сколько держится отметка о поставленной задаче: если задача так и не
+# выполнилась, следующий запрос ставит её снова.
+SHOPPING_LIST_PDF_PENDING_TIMEOUT = 60 * 10
+
+
+def get_shopping_list_lines(user):
+    """
+    Строки списка покупок для PDF (без пустых строк).
+    """
+    return [
+        part
+        for line in iter_shopping_list_txt(
+            get_shopping_cart_ingredients(user).iterator(),
+            get_shopping_cart_recipes(user).iterator(),
+        )
+        for part in line.split("\n") if part
     ]
 
-    return "\n".join(
-        [
-            (
-                f"Список покупок\n"
-                f"Дата составления: {now().strftime('%d.%m.%Y %H:%M')}\n"
-            ),
-            "\nПродукты:\n",
-            *products,
-            "\nРецепты:\n",
-            *recipes_list,
-        ]
+
+@job
+def render_shopping_list_pdf(user_id, cache_key):
+    """
+    Строит PDF списка покупок пользователя user_id и кладёт в кэш.
+    """
+    from .pdf import render_pdf
+
+    cache.set(
+        cache_key,
+        render_pdf(SHOPPING_LIST_PDF_TITLE, get_shopping_list_lines(user_id)),
+        SHOPPING_LIST_CACHE_TIMEOUT,
     )
+    cache.delete(f"{cache_key}:pending")
+
+
+def get_shopping_list_pdf(user, cache_key):
+    """
+    PDF списка покупок из кэша.
+
+    Список не длиннее SHOPPING_LIST_PDF_SYNC_LIMIT строк строится
+    сразу. Более длинный строится фоновой задачей, и до её выполнения
+    возвращается None: клиент повторяет запрос позже.
+    """
+    pdf = cache.get(cache_key)
+    if pdf is not None:
+        return pdf
+    lines = get_shopping_list_lines(user)
+    if len(lines) <= getattr(settings, "SHOPPING_LIST_PDF_SYNC_LIMIT", 100):
+        from .pdf import render_pdf
+
+        pdf = render_pdf(SHOPPING_LIST_PDF_TITLE, lines)
+        cache.set(cache_key, pdf, SHOPPING_LIST_CACHE_TIMEOUT)
+        return pdf
+    if cache.add(
+        f"{cache_key}:pending", True, SHOPPING_LIST_PDF_PENDING_TIMEOUT
+    ):
+        enqueue(render_shopping_list_pdf, user_id=user.pk, cache_key=cache_key)
+        # С JOBS_EAGER задача уже выполнена.
+        return cache.get(cache_key)
+    return None
+
+
+def invalidate_shopping_lists(*recipe_ids):
+    """
+    Сбрасывает готовые списки покупок пользователей, у которых рецепты
+    recipe_ids лежат в корзине.
+    """
+    keys = [
+        shopping_list_version_key(user_id)
+        for user_id in ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list("user_id", flat=True).distinct()
+    ]
+    if keys:
+        bump_version(*keys)
@@ -0,0 +1,153 @@
+"""
+Короткие ссылки на рецепты: /s/<код>/.
+
+Код — идентификатор рецепта в base62, поэтому он уникален без
+отдельного поля и индекса и однозначно обратим. Перенаправления
+обслуживает ShortLinkMiddleware в начале цепочки промежуточных слоёв:
+без сессий, CSRF, сообщений и разбора URL. Проверенные коды хранятся
+в LRU-кэше процесса вместе с версией рецепта из общего кэша (см.
+api.recipe_cache), так что повторные переходы не обращаются к базе, а
+удаление рецепта в любом процессе делает запись недействительной.
+"""
+import re
+import string
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseNotFound, HttpResponseRedirect
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+_INDEX = {char: idx for idx, char in enumerate(ALPHABET)}
+
+SHORT_LINK_PATH = re.compile(r"^/s/([0-9A-Za-z]{1,11})/?$")
+
+
+def encode_id(value):
+    """
+    Код base62 неотрицательного числа.
+    """
+    if value < 0:
+        raise ValueError("Отрицательный идентификатор.")
+    chars = []
+    while True:
+        value, rest = divmod(value, BASE)
+        chars.append(ALPHABET[rest])
+        if not value:
+            return "".join(reversed(chars))
+
+
+def decode_code(code):
+    """
+    Число по коду base62.
+
+    :raises ValueError: Код содержит посторонние символы или не
+        каноничен (ведущие нули), т. е. не мог быть выдан encode_id.
+    """
+    value = 0
+    try:
+        for char in code:
+            value = value * BASE + _INDEX[char]
+    except KeyError:
+        raise ValueError("Некорректный код.")
+    if not code or encode_id(value) != code:
+        raise ValueError("Некорректный код.")
+    return value
+
+
+def get_short_link_path(recipe_id):
+    return f"/s/{encode_id(recipe_id)}/"
+
+
+def get_recipe_page_path(recipe_id):
+    return f"/recipes/{recipe_id}/"
+
+
+class ShortLinkCache:
+    """
+    LRU-кэш процесса: код -> (идентификатор существующего рецепта,
+    версия рецепта на момент проверки).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, code):
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is not None:
+                self._entries.move_to_end(code)
+            return entry
+
+    def set(self, code, recipe_id, version):
+        max_size = getattr(settings, "SHORT_LINK_CACHE_SIZE", 10000)
+        with self._lock:
+            self._entries[code] = (recipe_id, version)
+            self._entries.move_to_end(code)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, recipe_id):
+        with self._lock:
+            self._entries.pop(encode_id(recipe_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+short_links = ShortLinkCache()
+
+
+def resolve_short_code(code):
+    """
+    Идентификатор рецепта по коду или None, если рецепта нет.
+    """
+    from .models import Recipe
+    from .recipe_cache import recipe_version_key
+
+    entry = short_links.get(code)
+    if entry is not None:
+        recipe_id, version = entry
+        # Версия читается без создания: её меняет удаление рецепта.
+        if cache.get(recipe_version_key(recipe_id)) == version:
+            return recipe_id
+    try:
+        recipe_id = decode_code(code)
+    except ValueError:
+        return None
+    # Версия читается до проверки: удаление после этого момента сделает
+    # запись недействительной.
+    version = cache.get(recipe_version_key(recipe_id))
+    if not Recipe.objects.filter(pk=recipe_id).exists():
+        return None
+    short_links.set(code, recipe_id, version)
+    return recipe_id
+
+
+def redirect_short_link(request, code):
+    """
+    Перенаправляет с короткой ссылки на страницу рецепта.
+    """
+    recipe_id = resolve_short_code(code)
+    if recipe_id is None:
+        return HttpResponseNotFound()
+    return HttpResponseRedirect(get_recipe_page_path(recipe_id))
+
+
+class ShortLinkMiddleware:
+    """
+    Обслуживает /s/<код>/ до остальных промежуточных слоёв.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        match = SHORT_LINK_PATH.match(request.path_info)
+        if match and request.method in ("GET", "HEAD"):
+            return redirect_short_link(request, match[1])
+        return self.get_response(request)
@@ -0,0 +1,159 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens
+from .catalog import bump_catalog_version
+from .conditional import bump_viewer_state
+from .models import (
+    Favorite,
+    FoodgramUser,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+)
+from .recipe_cache import (
+    bump_recipe_list_version,
+    bump_recipe_version,
+    bump_user_version,
+)
+from .shortcodes import short_links
+from .services import (
+    get_recipe_amounts,
+    invalidate_shopping_lists,
+    update_recipe_cart_totals,
+)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    """
+    Сбрасывает индекс каталога ингредиентов при изменении ингредиента.
+    """
+    # После коммита: иначе другой процесс может перестроить индекс
+    # по старым данным уже под новой версией.
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """
+    Выход (удаление токена) действует сразу во всех процессах.
+    """
+    # Первичный ключ (это и есть токен) обнуляется после удаления.
+    keys = [instance.key]
+    transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+# Поля изображений, файлы которых освобождаются при замене и удалении.
+IMAGE_FIELDS = {FoodgramUser: "avatar", Recipe: "image"}
+
+
+@receiver(pre_save, sender=FoodgramUser)
+@receiver(pre_save, sender=Recipe)
+def image_replacing(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает файл изображения, который заменяет или убирает
+    сохранение, чтобы снять ссылку на него после сохранения.
+    """
+    field_name = IMAGE_FIELDS[sender]
+    if instance._state.adding or field_name in instance.get_deferred_fields():
+        return
+    if update_fields is not None and field_name not in update_fields:
+        return
+    file = getattr(instance, field_name)
+    # Загруженный из базы файл не менялся: лишний запрос не нужен.
+    if file and file._committed:
+        return
+    old_name = sender.objects.filter(pk=instance.pk).values_list(
+        field_name, flat=True
+    ).first()
+    if old_name and old_name != file.name:
+        instance._replaced_image = old_name
+
+
+@receiver(post_save, sender=FoodgramUser)
+@receiver(post_save, sender=Recipe)
+def image_replaced(sender, instance, **kwargs):
+    old_name = instance.__dict__.pop("_replaced_image", None)
+    if old_name:
+        sender._meta.get_field(IMAGE_FIELDS[sender]).storage.delete(old_name)
+
+
+@receiver(post_delete, sender=FoodgramUser)
+@receiver(post_delete, sender=Recipe)
+def image_owner_deleted(sender, instance, **kwargs):
+    """
+    Снимает ссылку на изображение удалённого пользователя или рецепта,
+    в том числе при каскадном удалении.
+    """
+    field_name = IMAGE_FIELDS[sender]
+    if field_name in instance.get_deferred_fields():
+        return
+    file = getattr(instance, field_name)
+    if file:
+        file.storage.delete(file.name)
+
+
+@receiver(post_save, sender=FoodgramUser)
+def user_changed(sender, instance, **kwargs):
+    """
+    Сбрасывает закэшированного по токену пользователя и данные автора
+    в кэше рецептов после изменения.
+    """
+    user_id = instance.pk
+    transaction.on_commit(lambda: bump_user_version(user_id))
+    keys = list(
+        Token.objects.filter(user=instance).values_list("key", flat=True)
+    )
+    if keys:
+        transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@receiver([post_save, post_delete], sender=Subscription)
+def viewer_state_changed(sender, instance, **kwargs):
+    """
+    Меняет версию состояния пользователя для ETag его ответов.
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_viewer_state(user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    # RecipeWriteSerializer меняет ингредиенты bulk-операциями в одной
+    # транзакции с сохранением рецепта, и этот обработчик покрывает их.
+    # Другие пути записи ингредиентов вызывают touch_recipes().
+    if created:
+        transaction.on_commit(bump_recipe_list_version)
+    else:
+        invalidate_shopping_lists(instance.pk)
+        recipe_id = instance.pk
+        transaction.on_commit(lambda: bump_recipe_version(recipe_id))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    short_links.discard(recipe_id)
+    transaction.on_commit(lambda: bump_recipe_version(recipe_id))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """
+    Вычитает удаляемый рецепт из итогов корзин, пока его ингредиенты
+    и записи корзин ещё не удалены каскадом.
+    """
+    update_recipe_cart_totals(
+        instance.pk, get_recipe_amounts(instance.pk), {}
+    )
@@ -0,0 +1,140 @@
+"""
+Хранилище загруженных файлов с адресацией по содержимому.
+
+Файл сохраняется под SHA-256 своего содержимого в каталогах по первым
+символам хэша: recipes/images/3f/a9/3fa9….jpg. Одинаковые загрузки
+(одно и то же фото в разных рецептах и аватарах) занимают одно место
+на диске, а в модели StoredFile ведётся число ссылок на файл: save()
+его увеличивает, delete() уменьшает, и файл удаляется с диска, когда
+ссылок не осталось и транзакция зафиксирована.
+
+Содержимое файла под таким именем не меняется, поэтому nginx отдаёт
+их с Cache-Control: immutable (см. infra/nginx.conf). Производные
+файлы (рендишены, api.images) лежат рядом с исходным под именем
+<хэш>.<суффикс>, пишутся save_derived() и удаляются вместе с ним.
+
+Файлы, сохранённые до появления хранилища, в StoredFile не учтены и
+удаляются сразу, как раньше.
+"""
+import hashlib
+import posixpath
+from functools import partial
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+def get_content_name(name, digest):
+    """
+    Имя файла name с содержимым, хэш которого digest.
+    """
+    directory = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(
+        directory, digest[:2], digest[2:4], f"{digest}{extension}"
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage, именующий файлы по хэшу содержимого и
+    считающий ссылки на них.
+    """
+
+    def save(self, name, content, max_length=None):
+        from .models import StoredFile
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = get_content_name(name, digest.hexdigest())
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f"Имя файла {name} длиннее {max_length} символов."
+            )
+        stored = StoredFile.objects.filter(name=name)
+        with transaction.atomic():
+            if stored.update(refcount=F("refcount") + 1):
+                return name
+            if not self.exists(name):
+                content.seek(0)
+                saved = self._save(name, content)
+                if saved != name:
+                    # Тот же файл одновременно записал другой процесс.
+                    super().delete(saved)
+            try:
+                with transaction.atomic():
+                    StoredFile.objects.create(
+                        name=name, size=content.size, refcount=1
+                    )
+            except IntegrityError:
+                stored.update(refcount=F("refcount") + 1)
+        return name
+
+    def save_derived(self, name, content):
+        """
+        Сохраняет производный файл под именем name, заменяя прежний.
+        Ссылки на него не считаются: он удаляется вместе с исходным.
+        """
+        if self.exists(name):
+            super().delete(name)
+        return super().save(name, content)
+
+    def delete(self, name):
+        """
+        Снимает ссылку на файл name. Файл удаляется после фиксации
+        транзакции, если ссылок больше нет.
+        """
+        from .models import StoredFile
+
+        if not name:
+            raise ValueError("Имя файла не может быть пустым.")
+        stored = StoredFile.objects.filter(name=name)
+        if not stored.filter(refcount__gt=0).update(
+            refcount=F("refcount") - 1
+        ) and not stored.exists():
+            self.remove(name)
+            return
+        transaction.on_commit(partial(self.collect, name))
+
+    def collect(self, name):
+        """
+        Удаляет файл name, если на него не осталось ссылок.
+        """
+        from .models import StoredFile
+
+        deleted, _ = StoredFile.objects.filter(
+            name=name, refcount=0
+        ).delete()
+        if deleted:
+            self.remove(name)
+
+    def get_derived_names(self, name):
+        """
+        Имена производных файлов name, которые есть в хранилище.
+        """
+        directory, filename = posixpath.split(name)
+        prefix = f"{posixpath.splitext(filename)[0]}."
+        try:
+            _, files = self.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [
+            posixpath.join(directory, file) for file in files
+            if file.startswith(prefix) and file != filename
+        ]
+
+    def remove(self, name):
+        """
+        Удаляет с диска файл name и его производные файлы.
+        """
+        for derived in self.get_derived_names(name):
+            super().delete(derived)
+        super().delete(name)
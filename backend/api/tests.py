@@ -1,6 +1,43 @@
-from django.test import TestCase, Client
+import base64
+import gzip
+import io
+import json
+import os
+import tempfile
+import uuid
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.signals import request_finished, request_started
+from django.db import IntegrityError, close_old_connections, connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.files.storage import default_storage
+from django.utils.translation import gettext_lazy
 from http import HTTPStatus
-from . import models
+from time import sleep
+from unittest import mock
+from PIL import Image, ImageFile
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from . import catalog, jobs, models, pdf, renderers, services
+from .management.commands import load_initial_data
+from .authentication import CachedTokenAuthentication, token_cache
+from .metrics import registry
+from .pagination import KeysetLimitPagination
+from .parsers import FastJSONParser
+from .profiling import StackSampler
+from .querybudget import QueryBudgetExceeded, QueryInspector, query_budget
+from .recipe_cache import recipe_version_key
+from .serializers import RecipeReadSerializer
+from .shortcodes import decode_code, encode_id, short_links
+from .versioning import get_version
+from .wsgi import LeanApiApplication, LeanApiHandler
 
 
 class FoodgramAPITestCase(TestCase):
@@ -28,3 +65,1685 @@ class FoodgramAPITestCase(TestCase):
                 email="vpupkan@yindex.ru"
             ).exists()
         )
+
+
+class RecipeListTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = models.FoodgramUser.objects.create_user(
+            email="author@foodgram.ru", username="author",
+            first_name="Автор", last_name="Авторов", password="pass",
+        )
+        cls.reader = models.FoodgramUser.objects.create_user(
+            email="reader@foodgram.ru", username="reader",
+            first_name="Читатель", last_name="Читателев", password="pass",
+        )
+        ingredient = models.Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        for idx in range(60):
+            recipe = models.Recipe.objects.create(
+                author=cls.author, name=f"Рецепт {idx}",
+                text="Описание", cooking_time=10,
+            )
+            models.RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=idx + 1
+            )
+        cls.favorite_recipe = recipe
+        models.Favorite.objects.create(user=cls.reader, recipe=recipe)
+        models.Subscription.objects.create(
+            user=cls.reader, author=cls.author
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Число запросов к списку рецептов не зависит от limit"""
+        with self.assertNumQueries(6):
+            self.client.get("/api/recipes/?limit=6")
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/recipes/?limit=50")
+        self.assertEqual(len(response.json()["results"]), 50)
+
+    @override_settings(QUERY_INSPECTOR=True)
+    def test_query_budget(self):
+        """Список рецептов укладывается в 5 запросов при любом limit"""
+        guest = Client()
+        for limit in (1, 6, 50, 100):
+            with query_budget(5):
+                response = guest.get(f"/api/recipes/?limit={limit}")
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertIn("X-Query-Count", response)
+
+    def test_query_inspector_is_off_by_default(self):
+        """Без QUERY_INSPECTOR заголовков X-Query-* нет"""
+        response = Client().get("/api/recipes/?limit=1")
+        self.assertNotIn("X-Query-Count", response)
+
+    def test_n_plus_one_is_detected(self):
+        """Повторяющиеся запросы находятся вместе с полем сериализатора"""
+        recipes = models.Recipe.objects.all()[:5]
+        context = {"request": mock.Mock(user=self.reader)}
+        with QueryInspector() as inspector:
+            RecipeReadSerializer(recipes, many=True, context=context).data
+        fields = {query.field for _, query in inspector.repeated()}
+        self.assertIn("RecipeReadSerializer.author", fields)
+        self.assertIn("RecipeReadSerializer.ingredients", fields)
+        self.assertIn("RecipeReadSerializer.is_favorited", fields)
+        with self.assertRaisesMessage(QueryBudgetExceeded, "N+1"):
+            with query_budget(5):
+                RecipeReadSerializer(
+                    recipes, many=True, context=context
+                ).data
+
+    def test_viewer_flags(self):
+        """Флаги зрителя берутся из аннотаций"""
+        response = self.client.get("/api/recipes/?limit=1")
+        recipe = response.json()["results"][0]
+        self.assertEqual(recipe["id"], self.favorite_recipe.id)
+        self.assertTrue(recipe["is_favorited"])
+        self.assertFalse(recipe["is_in_shopping_cart"])
+        self.assertTrue(recipe["author"]["is_subscribed"])
+        self.assertEqual(len(recipe["ingredients"]), 1)
+
+    def test_sparse_fieldset(self):
+        """?fields= и ?omit= сужают и ответ, и запросы к базе"""
+        url = (
+            "/api/recipes/?limit=6&fields=id,name,image,cooking_time,"
+            "author.first_name,author.last_name"
+        )
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get(url)
+        recipe = response.json()["results"][0]
+        self.assertEqual(
+            set(recipe), {"id", "name", "image", "cooking_time", "author"}
+        )
+        self.assertEqual(
+            recipe["author"], {"first_name": "Автор", "last_name": "Авторов"}
+        )
+        sql = " ".join(query["sql"] for query in sparse.captured_queries)
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn("recipeingredient", sql)
+        self.assertNotIn("favorite", sql)
+        with CaptureQueriesContext(connection) as full:
+            self.client.get("/api/recipes/?limit=6")
+        self.assertLess(len(sparse), len(full))
+
+        response = self.client.get(
+            "/api/recipes/?limit=1&omit=text,ingredients,author.email"
+        )
+        recipe = response.json()["results"][0]
+        self.assertNotIn("text", recipe)
+        self.assertNotIn("ingredients", recipe)
+        self.assertNotIn("email", recipe["author"])
+        self.assertTrue(recipe["is_favorited"])
+        self.assertTrue(recipe["author"]["is_subscribed"])
+
+        response = self.client.get(
+            f"/api/recipes/{self.favorite_recipe.id}/?fields=id,author.id"
+        )
+        self.assertEqual(response.json(), {
+            "id": self.favorite_recipe.id, "author": {"id": self.author.id}
+        })
+
+        response = self.client.get(
+            "/api/users/subscriptions/?fields=username,recipes.name"
+            "&recipes_limit=1"
+        )
+        self.assertEqual(response.json()["results"], [{
+            "username": "author", "recipes": [{"name": "Рецепт 59"}],
+        }])
+
+    def test_included_users(self):
+        """?include=users выводит каждого автора один раз"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/recipes/?limit=50&include=users")
+        data = response.json()
+        self.assertEqual(len(data["results"]), 50)
+        self.assertEqual(
+            {recipe["author_id"] for recipe in data["results"]},
+            {self.author.id},
+        )
+        self.assertNotIn("author", data["results"][0])
+        self.assertEqual(len(data["included"]["users"]), 1)
+        author = data["included"]["users"][0]
+        self.assertEqual(author["id"], self.author.id)
+        self.assertTrue(author["is_subscribed"])
+        user_queries = [
+            query for query in queries.captured_queries
+            if 'FROM "api_foodgramuser"' in query["sql"]
+            and "subscription" in query["sql"]
+        ]
+        self.assertEqual(len(user_queries), 1)
+
+        response = self.client.get(
+            "/api/recipes/?limit=6&include=users&fields=name,author.username"
+        )
+        data = response.json()
+        self.assertEqual(
+            set(data["results"][0]), {"name", "author_id"}
+        )
+        self.assertEqual(
+            data["included"]["users"],
+            [{"id": self.author.id, "username": "author"}],
+        )
+
+    def test_cursor_pagination(self):
+        """Курсорная пагинация проходит все рецепты в обе стороны"""
+        url = "/api/recipes/?cursor=&limit=25"
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append([recipe["id"] for recipe in data["results"]])
+            url = data["next"]
+        self.assertEqual(data["count"], 60)
+        self.assertEqual([len(page) for page in pages], [25, 25, 10])
+        expected = list(
+            models.Recipe.objects.values_list("id", flat=True)
+        )
+        self.assertEqual(sum(pages, []), expected)
+
+        previous = self.client.get(data["previous"]).json()
+        self.assertEqual(
+            [recipe["id"] for recipe in previous["results"]], pages[1]
+        )
+
+    def test_page_size_is_capped(self):
+        """Размер страницы ограничен max_page_size"""
+        with mock.patch.object(
+            KeysetLimitPagination, "max_page_size", 20
+        ):
+            for url in ("/api/recipes/?limit=100000",
+                        "/api/recipes/?cursor=&limit=100000"):
+                response = self.client.get(url)
+                self.assertEqual(len(response.json()["results"]), 20)
+
+    def test_invalid_cursor(self):
+        """Некорректный курсор возвращает 404"""
+        response = self.client.get("/api/recipes/?cursor=garbage")
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SubscriptionsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = models.FoodgramUser.objects.create_user(
+            email="reader@foodgram.ru", username="reader",
+            first_name="Читатель", last_name="Читателев", password="pass",
+        )
+        for idx in range(10):
+            author = models.FoodgramUser.objects.create_user(
+                email=f"author{idx}@foodgram.ru", username=f"author{idx}",
+                first_name="Автор", last_name="Авторов", password="pass",
+            )
+            models.Recipe.objects.bulk_create(
+                models.Recipe(author=author, name=f"Рецепт {number}",
+                              text="Описание", cooking_time=5)
+                for number in range(idx + 1)
+            )
+            models.Subscription.objects.create(
+                user=cls.reader, author=author
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_subscriptions_query_count(self):
+        """Страница подписок выбирается фиксированным числом запросов"""
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                "/api/users/subscriptions/?limit=10&recipes_limit=3"
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        authors = response.json()["results"]
+        self.assertEqual(len(authors), 10)
+        for author in authors:
+            self.assertTrue(author["is_subscribed"])
+            self.assertEqual(
+                len(author["recipes"]), min(author["recipes_count"], 3)
+            )
+        self.assertEqual(
+            sorted(author["recipes_count"] for author in authors),
+            list(range(1, 11)),
+        )
+
+    def test_subscriptions_without_recipes_limit(self):
+        """Без recipes_limit возвращаются все рецепты автора"""
+        response = self.client.get("/api/users/subscriptions/?limit=10")
+        for author in response.json()["results"]:
+            self.assertEqual(len(author["recipes"]), author["recipes_count"])
+
+
+class IngredientSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        models.Ingredient.objects.bulk_create(
+            models.Ingredient(name=name, measurement_unit="г")
+            for name in ("сахар", "Сахарная пудра", "соль", "яблоко")
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, name):
+        response = self.client.get("/api/ingredients/", {"name": name})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [ingredient["name"] for ingredient in response.json()]
+
+    def test_prefix_search_ignores_case(self):
+        """Поиск по началу названия без учёта регистра"""
+        self.assertEqual(self.search("сах"), ["сахар", "Сахарная пудра"])
+        self.assertEqual(self.search("СОЛ"), ["соль"])
+        self.assertEqual(self.search("перец"), [])
+
+    def test_index_follows_catalog_changes(self):
+        """Индекс перестраивается после изменения ингредиентов"""
+        self.assertEqual(self.search("я"), ["яблоко"])
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Ingredient.objects.create(
+                name="ягоды", measurement_unit="г"
+            )
+            models.Ingredient.objects.get(name="яблоко").delete()
+        self.assertEqual(self.search("я"), ["ягоды"])
+        with self.assertNumQueries(0):
+            self.search("я")
+
+    def test_catalog_conditional_get(self):
+        """Каталог отдаётся с ETag, повторный запрос получает 304"""
+        response = self.client.get("/api/ingredients/")
+        self.assertEqual(len(response.json()), 4)
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/ingredients/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Ingredient.objects.create(name="мёд", measurement_unit="г")
+        response = self.client.get(
+            "/api/ingredients/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_catalog_compressed_variant(self):
+        """Клиент, принимающий gzip, получает сжатый каталог"""
+        response = self.client.get(
+            "/api/ingredients/", {"name": "с"}, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            [item["name"] for item in json.loads(
+                gzip.decompress(response.content)
+            )],
+            ["сахар", "Сахарная пудра", "соль"],
+        )
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_prefix_payloads_use_fast_compression(self):
+        """Сильное сжатие — только для полного каталога"""
+        with mock.patch(
+            "api.catalog.gzip.compress", wraps=gzip.compress
+        ) as compress:
+            self.client.get("/api/ingredients/")
+            self.client.get("/api/ingredients/", {"name": "с"})
+        self.assertEqual(
+            [call.kwargs["compresslevel"] for call in compress.call_args_list],
+            [catalog.FULL_GZIP_LEVEL, catalog.PREFIX_GZIP_LEVEL],
+        )
+
+
+class ShoppingListTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = models.FoodgramUser.objects.create_user(
+            email="cook@foodgram.ru", username="cook",
+            first_name="Повар", last_name="Поваров", password="pass",
+        )
+        sugar = models.Ingredient.objects.create(
+            name="сахар", measurement_unit="г"
+        )
+        cls.salt = models.Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        for name, amount in (("Блины", 100), ("Оладьи", 50)):
+            recipe = models.Recipe.objects.create(
+                author=cls.user, name=name, text="Описание", cooking_time=5
+            )
+            models.RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=sugar, amount=amount
+            )
+            models.ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.recipe = recipe
+        cls.sugar = sugar
+        call_command("rebuild_cart_totals", stdout=io.StringIO())
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def download(self, file_format):
+        response = self.client.get(
+            "/api/recipes/download_shopping_cart/",
+            {"file_format": file_format},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return b"".join(response).decode()
+
+    def test_formats(self):
+        """Список покупок выгружается в txt, csv и json"""
+        self.assertIn("1. Сахар (г) - 150", self.download("txt"))
+        self.assertEqual(
+            self.download("csv").splitlines(),
+            ["name,measurement_unit,amount", "сахар,г,150"],
+        )
+        self.assertEqual(json.loads(self.download("json")), {
+            "ingredients": [
+                {"name": "сахар", "measurement_unit": "г", "amount": 150}
+            ],
+            "recipes": [
+                {"name": "Блины", "author": "cook"},
+                {"name": "Оладьи", "author": "cook"},
+            ],
+        })
+        response = self.client.get(
+            "/api/recipes/download_shopping_cart/", {"file_format": "xlsx"}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def get_pdf(self):
+        return self.client.get(
+            "/api/recipes/download_shopping_cart/", {"file_format": "pdf"}
+        )
+
+    def test_pdf(self):
+        """Короткий список в PDF строится сразу и кэшируется"""
+        with mock.patch(
+            "api.pdf.render_pdf", wraps=pdf.render_pdf
+        ) as render_pdf:
+            for _ in range(2):
+                response = self.get_pdf()
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response["Content-Type"], "application/pdf")
+                self.assertTrue(response.content.startswith(b"%PDF"))
+        render_pdf.assert_called_once_with("Список покупок", [
+            "Продукты:", "1. Сахар (г) - 150",
+            "Рецепты:", "1. Блины (автор: cook)", "2. Оладьи (автор: cook)",
+        ])
+
+    @override_settings(SHOPPING_LIST_PDF_SYNC_LIMIT=1)
+    def test_long_pdf_is_built_by_job(self):
+        """Длинный список в PDF строится задачей, до неё ответ 202"""
+        for _ in range(2):
+            self.assertEqual(
+                self.get_pdf().status_code, HTTPStatus.ACCEPTED
+            )
+        self.assertEqual(models.Job.objects.count(), 1)
+        jobs.Worker("test").run(burst=True)
+        response = self.get_pdf()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.content.startswith(b"%PDF"))
+
+    def test_cached_list_has_current_date(self):
+        """Дата составления не берётся из кэша"""
+        for day in (1, 2):
+            with mock.patch("api.services.now", return_value=datetime(
+                2026, 1, day, 12, 0, tzinfo=timezone.utc
+            )):
+                self.assertIn(
+                    f"Дата составления: 0{day}.01.2026 12:00\n\n\nПродукты:",
+                    self.download("txt"),
+                )
+
+    def test_cached_list_is_invalidated(self):
+        """Готовый список сбрасывается при изменении рецепта из корзины"""
+        first = self.download("csv")
+        self.assertEqual(self.download("csv"), first)
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.id}/",
+            data=json.dumps({"ingredients": [
+                {"id": self.sugar.id, "amount": 10},
+                {"id": self.salt.id, "amount": 5},
+            ]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            self.download("csv").splitlines()[1:],
+            ["сахар,г,110", "соль,г,5"],
+        )
+
+    def test_cart_totals_follow_cart(self):
+        """Итоги корзины меняются при добавлении и удалении рецептов"""
+        url = f"/api/recipes/{self.recipe.id}/shopping_cart/"
+        self.assertEqual(
+            self.client.delete(url).status_code, HTTPStatus.NO_CONTENT
+        )
+        self.assertEqual(list(
+            models.ShoppingCartTotal.objects.values_list("total_amount")
+        ), [(100,)])
+        self.assertEqual(self.client.post(url).status_code, HTTPStatus.CREATED)
+        self.assertEqual(list(
+            models.ShoppingCartTotal.objects.values_list("total_amount")
+        ), [(150,)])
+        self.recipe.delete()
+        self.assertEqual(list(
+            models.ShoppingCartTotal.objects.values_list("total_amount")
+        ), [(100,)])
+        call_command("rebuild_cart_totals", "--verify", stdout=io.StringIO())
+
+    def test_cart_totals_retry_concurrent_insert(self):
+        """Конфликт вставки итога с другой транзакцией повторяет запись"""
+        bulk_create = models.ShoppingCartTotal.objects.bulk_create
+        conflicts = [IntegrityError("unique_user_ingredient_total")]
+
+        def insert(objs, *args, **kwargs):
+            if conflicts:
+                raise conflicts.pop()
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(
+            models.ShoppingCartTotal.objects, "bulk_create",
+            side_effect=insert,
+        ) as mocked:
+            services.apply_cart_total_deltas([self.user.id], {self.salt.id: 5})
+        self.assertEqual(mocked.call_count, 2)
+        self.assertEqual(models.ShoppingCartTotal.objects.get(
+            ingredient=self.salt
+        ).total_amount, 5)
+
+    def patch_recipe(self, data):
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.id}/",
+            data=json.dumps(data), content_type="application/json",
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response
+
+    def test_title_only_edit_does_not_write_ingredients(self):
+        """Правка названия не перезаписывает ингредиенты рецепта"""
+        recipe_ingredient = self.recipe.recipe_ingredients.get()
+        for data in (
+            {"name": "Оладушки"},
+            {"name": "Оладьи", "ingredients": [
+                {"id": self.sugar.id, "amount": 50}
+            ]},
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                self.patch_recipe(data)
+            self.assertEqual([
+                query["sql"] for query in queries
+                if "api_recipeingredient" in query["sql"]
+                and not query["sql"].startswith("SELECT")
+            ], [])
+        self.assertEqual(
+            self.recipe.recipe_ingredients.get().pk, recipe_ingredient.pk
+        )
+
+    def test_ingredient_diff(self):
+        """Изменяются только отличающиеся ингредиенты"""
+        recipe_ingredient = self.recipe.recipe_ingredients.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.patch_recipe({"ingredients": [
+                {"id": self.salt.id, "amount": 7},
+            ]})
+        writes = [
+            query["sql"].split()[0] for query in queries
+            if "api_recipeingredient" in query["sql"]
+            and not query["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(writes, ["DELETE", "INSERT"])
+        self.assertFalse(models.RecipeIngredient.objects.filter(
+            pk=recipe_ingredient.pk
+        ).exists())
+        self.patch_recipe({"ingredients": [
+            {"id": self.salt.id, "amount": 8},
+        ]})
+        self.assertEqual(
+            self.download("csv").splitlines()[1:],
+            ["сахар,г,100", "соль,г,8"],
+        )
+
+    def test_removing_ingredients_query_count(self):
+        """Число запросов PATCH не зависит от числа удаляемых ингредиентов"""
+        counts = []
+        for extra in (1, 5):
+            models.RecipeIngredient.objects.bulk_create(
+                models.RecipeIngredient(
+                    recipe=self.recipe, amount=1,
+                    ingredient=models.Ingredient.objects.create(
+                        name=f"специя {extra}-{index}", measurement_unit="г"
+                    ),
+                )
+                for index in range(extra)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.patch_recipe({"ingredients": [
+                        {"id": self.sugar.id, "amount": 50},
+                    ]})
+            self.assertEqual(self.recipe.recipe_ingredients.count(), 1)
+            counts.append(len(queries))
+            recipe_updates = [
+                query["sql"] for query in queries.captured_queries
+                if query["sql"].startswith('UPDATE "api_recipe"')
+            ]
+            self.assertEqual(len(recipe_updates), 1)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_admin_ingredient_delete_touches_recipe(self):
+        """Удаление ингредиента в админке отмечается в рецепте"""
+        with services.sync_recipe_cart_totals([self.recipe.id]):
+            models.RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.salt, amount=5
+            )
+        self.assertIn("Соль (г) - 5", self.download("txt"))
+        admin = Client()
+        admin.force_login(models.FoodgramUser.objects.create_superuser(
+            email="admin@foodgram.ru", username="admin",
+            first_name="Админ", last_name="Админов", password="pass",
+        ))
+        updated_at = self.recipe.updated_at
+        version = get_version(recipe_version_key(self.recipe.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.post(
+                f"/admin/api/ingredient/{self.salt.id}/delete/",
+                {"post": "yes"},
+            )
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, updated_at)
+        self.assertNotEqual(
+            get_version(recipe_version_key(self.recipe.id)), version
+        )
+        self.assertNotIn("Соль", self.download("txt"))
+
+
+class MetricsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = models.FoodgramUser.objects.create_superuser(
+            email="admin@foodgram.ru", username="admin",
+            first_name="Админ", last_name="Админов", password="pass",
+        )
+
+    def test_server_timing(self):
+        """Ответ API содержит фазы db, serialize, render и total"""
+        response = self.client.get("/api/recipes/")
+        phases = [
+            item.split(";")[0]
+            for item in response["Server-Timing"].split(", ")
+        ]
+        self.assertEqual(phases, ["db", "serialize", "render", "total"])
+
+    def test_only_api_is_measured(self):
+        """Ответы вне API не замеряются, неизвестные методы — other"""
+        with mock.patch.object(registry, "_histograms", {}):
+            response = self.client.get("/admin/login/")
+            self.assertNotIn("Server-Timing", response)
+            self.client.generic("PROPFIND", "/api/recipes/")
+            self.assertEqual(
+                list(registry.snapshot()), ["other recipes-list"]
+            )
+
+    def test_worker_files_are_unique(self):
+        """Новый процесс с тем же pid пишет в свой файл"""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory), \
+                mock.patch.multiple(registry, _pid=None, _file_name=None):
+            registry.flush(force=True)
+            # Номер процесса совпал, а время запуска нет.
+            registry._pid = None
+            registry.flush(force=True)
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_metrics_requires_admin(self):
+        """Метрики доступны только администратору"""
+        response = self.client.get("/api/_metrics/")
+        self.assertIn(
+            response.status_code,
+            (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN),
+        )
+
+    def test_metrics_are_aggregated_across_workers(self):
+        """Метрики суммируются по файлам всех процессов"""
+        with tempfile.TemporaryDirectory() as directory:
+            other_worker = {
+                "GET recipes-list": [
+                    {"counts": [1] + [0] * 11, "sum": 0.001},
+                    {"counts": [0, 0, 1] + [0] * 6, "sum": 4},
+                ],
+            }
+            with open(os.path.join(directory, "1.json"), "w") as file:
+                json.dump(other_worker, file)
+            with override_settings(METRICS_DIR=directory), \
+                    mock.patch.object(registry, "_histograms", {}):
+                self.client.get("/api/recipes/")
+                self.client.force_login(self.admin)
+                response = self.client.get("/api/_metrics/")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        text = response.content.decode()
+        self.assertIn(
+            'foodgram_request_duration_seconds_count'
+            '{method="GET",route="recipes-list"} 2',
+            text,
+        )
+        self.assertIn(
+            'foodgram_request_db_queries_bucket'
+            '{method="GET",route="recipes-list",le="+Inf"} 2',
+            text,
+        )
+
+
+class ProfilingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = models.FoodgramUser.objects.create_superuser(
+            email="admin@foodgram.ru", username="admin",
+            first_name="Админ", last_name="Админов", password="pass",
+        )
+        cls.user = models.FoodgramUser.objects.create_user(
+            email="user@foodgram.ru", username="user",
+            first_name="Пользователь", last_name="Обычный", password="pass",
+        )
+        recipe = models.Recipe.objects.create(
+            author=cls.admin, name="Рецепт", text="Описание", cooking_time=5
+        )
+        models.RecipeIngredient.objects.create(
+            recipe=recipe, amount=10,
+            ingredient=models.Ingredient.objects.create(
+                name="сахар", measurement_unit="г"
+            ),
+        )
+        models.ShoppingCart.objects.create(user=cls.admin, recipe=recipe)
+        call_command("rebuild_cart_totals", stdout=io.StringIO())
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PROFILE_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_login(self.admin)
+
+    def test_cprofile(self):
+        """Профиль cProfile сохраняется вместе с журналом SQL"""
+        response = self.client.get("/api/recipes/?_profile=1")
+        profile_id = response["X-Profile-Id"]
+        profile = self.client.get(f"/api/_profiles/{profile_id}/").json()
+        self.assertEqual(profile["mode"], "cprofile")
+        self.assertTrue(profile["queries"])
+        self.assertIn("cumulative", profile["summary"])
+        download = self.client.get(
+            f"/api/_profiles/{profile_id}/?download=1"
+        )
+        self.assertIn(".prof", download["Content-Disposition"])
+
+    def test_sampling_streaming_response(self):
+        """Выборочный профиль потокового ответа в формате speedscope"""
+        response = self.client.get(
+            "/api/recipes/download_shopping_cart/", HTTP_X_PROFILE="sample"
+        )
+        self.assertIn("Сахар", b"".join(response.streaming_content).decode())
+        profile_id = response["X-Profile-Id"]
+        download = self.client.get(
+            f"/api/_profiles/{profile_id}/?download=1"
+        )
+        data = json.loads(download.content)
+        self.assertEqual(data["profiles"][0]["type"], "sampled")
+
+    def test_sampler_pauses(self):
+        """Выключенный сэмплер не снимает стеки"""
+        sampler = StackSampler(0.001, 10000)
+        sampler.enable()
+        while not sampler.samples:
+            sleep(0.001)
+        sampler.disable()
+        sleep(0.01)
+        count = len(sampler.samples)
+        sleep(0.02)
+        self.assertEqual(len(sampler.samples), count)
+        sampler.enable()
+        while len(sampler.samples) == count:
+            sleep(0.001)
+        sampler.stop()
+
+    def test_only_admin_and_rate_limited(self):
+        """Профилирование доступно администратору и ограничено по частоте"""
+        self.client.force_login(self.user)
+        response = self.client.get("/api/recipes/?_profile=1")
+        self.assertNotIn("X-Profile-Id", response)
+        self.client.force_login(self.admin)
+        with override_settings(PROFILE_RATE_LIMIT=1):
+            first = self.client.get("/api/recipes/?_profile=1")
+            second = self.client.get("/api/recipes/?_profile=1")
+        self.assertIn("X-Profile-Id", first)
+        self.assertNotIn("X-Profile-Id", second)
+
+
+class TokenAuthenticationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = models.FoodgramUser.objects.create_user(
+            email="user@foodgram.ru", username="user",
+            first_name="Пользователь", last_name="Обычный", password="pass",
+        )
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        token = self.client.post(
+            "/api/auth/token/login/",
+            {"email": "user@foodgram.ru", "password": "pass"},
+        ).json()["auth_token"]
+        self.client = Client(HTTP_AUTHORIZATION=f"Token {token}")
+
+    def get_token_queries(self, url="/api/users/me/"):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [
+            query for query in queries
+            if "authtoken_token" in query["sql"]
+        ]
+
+    def test_token_lookup_is_cached(self):
+        """Токен проверяется по базе только при первом запросе"""
+        self.assertEqual(len(self.get_token_queries()), 1)
+        self.assertEqual(self.get_token_queries(), [])
+        token_cache.clear()
+        # Другой процесс берёт пользователя из общего кэша.
+        self.assertEqual(self.get_token_queries(), [])
+
+    def test_cached_user_is_not_shared(self):
+        """Каждый запрос получает свой объект пользователя"""
+        key = Token.objects.get(user=self.user).key
+        authentication = CachedTokenAuthentication()
+        first, first_token = authentication.authenticate_credentials(key)
+        first.first_name = "Изменённое"
+        second, second_token = authentication.authenticate_credentials(key)
+        self.assertEqual(second.first_name, "Пользователь")
+        self.assertIsNot(first._state, second._state)
+        self.assertIs(second_token.user, second)
+        self.assertFalse(second._state.adding)
+
+    def test_logout_invalidates_token(self):
+        """После выхода токен сразу перестаёт действовать"""
+        self.get_token_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/auth/token/logout/")
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        response = self.client.get("/api/users/me/")
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_deleted_token_is_rejected(self):
+        """Удалённый токен отклоняется: сигналы api подключены"""
+        self.get_token_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(user=self.user).delete()
+        response = self.client.get("/api/users/me/")
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_user_change_invalidates_token(self):
+        """Изменение пользователя сбрасывает кэш токена"""
+        self.get_token_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        response = self.client.get("/api/users/me/")
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+
+class RecipeDetailCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = models.FoodgramUser.objects.create_user(
+            email="author@foodgram.ru", username="author",
+            first_name="Автор", last_name="Авторов", password="pass",
+        )
+        cls.reader = models.FoodgramUser.objects.create_user(
+            email="reader@foodgram.ru", username="reader",
+            first_name="Читатель", last_name="Читателев", password="pass",
+        )
+        cls.sugar = models.Ingredient.objects.create(
+            name="сахар", measurement_unit="г"
+        )
+        cls.recipe = models.Recipe.objects.create(
+            author=cls.author, name="Блины", text="Описание", cooking_time=5
+        )
+        models.RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.sugar, amount=100
+        )
+        models.Favorite.objects.create(user=cls.reader, recipe=cls.recipe)
+        models.Subscription.objects.create(
+            user=cls.reader, author=cls.author
+        )
+        cls.url = f"/api/recipes/{cls.recipe.id}/"
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_payload(self):
+        """Повторный запрос не сериализует рецепт заново"""
+        guest = Client()
+        first = guest.get(self.url).json()
+        # Только запрос валидаторов (ETag / Last-Modified).
+        with self.assertNumQueries(1):
+            second = guest.get(self.url).json()
+        self.assertEqual(first, second)
+        self.assertEqual(second["ingredients"][0]["name"], "сахар")
+
+    def test_viewer_flags_overlay(self):
+        """Флаги зрителя подставляются для каждого зрителя"""
+        Client().get(self.url)
+        client = Client()
+        client.force_login(self.reader)
+        data = client.get(self.url).json()
+        self.assertTrue(data["is_favorited"])
+        self.assertFalse(data["is_in_shopping_cart"])
+        self.assertTrue(data["author"]["is_subscribed"])
+        data = Client().get(self.url).json()
+        self.assertFalse(data["is_favorited"])
+        self.assertFalse(data["author"]["is_subscribed"])
+
+    def test_invalidation(self):
+        """Изменение рецепта, автора или ингредиента сбрасывает кэш"""
+        guest = Client()
+        guest.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = "Оладьи"
+            self.recipe.save()
+        self.assertEqual(guest.get(self.url).json()["name"], "Оладьи")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.username = "chef"
+            self.author.save()
+        data = guest.get(self.url).json()
+        self.assertEqual(data["author"]["username"], "chef")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sugar.name = "сахарная пудра"
+            self.sugar.save()
+        data = guest.get(self.url).json()
+        self.assertEqual(data["ingredients"][0]["name"], "сахарная пудра")
+
+    def test_missing_recipe(self):
+        """Несуществующий рецепт — 404"""
+        response = Client().get("/api/recipes/0/")
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ConditionalGetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = models.FoodgramUser.objects.create_user(
+            email="author@foodgram.ru", username="author",
+            first_name="Автор", last_name="Авторов", password="pass",
+        )
+        cls.reader = models.FoodgramUser.objects.create_user(
+            email="reader@foodgram.ru", username="reader",
+            first_name="Читатель", last_name="Читателев", password="pass",
+        )
+        cls.recipe = models.Recipe.objects.create(
+            author=cls.author, name="Блины", text="Описание", cooking_time=5
+        )
+        cls.url = f"/api/recipes/{cls.recipe.id}/"
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertNotModified(self, client, url, **headers):
+        response = client.get(url, headers=headers)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_recipe_detail(self):
+        """Деталь рецепта отвечает 304 без сериализации"""
+        guest = Client()
+        response = guest.get(self.url)
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            self.assertNotModified(guest, self.url, if_none_match=etag)
+        self.assertNotModified(
+            guest, self.url, if_modified_since=response["Last-Modified"]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            models.RecipeIngredient.objects.create(
+                recipe=self.recipe, amount=1,
+                ingredient=models.Ingredient.objects.create(
+                    name="мука", measurement_unit="г"
+                ),
+            )
+        response = guest.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.json()["ingredients"]), 1)
+
+    def test_viewer_flags_change_etag(self):
+        """ETag учитывает избранное, корзину и подписки зрителя"""
+        response = self.reader_client.get(self.url)
+        self.assertNotIn("Last-Modified", response)
+        etag = response["ETag"]
+        self.assertNotModified(
+            self.reader_client, self.url, if_none_match=etag
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader_client.post(f"{self.url}favorite/")
+        response = self.reader_client.get(
+            self.url, headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.json()["is_favorited"])
+        self.assertNotEqual(Client().get(self.url)["ETag"], response["ETag"])
+
+    def test_recipe_list(self):
+        """Страница списка рецептов отвечает 304, пока рецепты не менялись"""
+        url = "/api/recipes/?limit=6"
+        etag = self.reader_client.get(url)["ETag"]
+        # Только сессия и пользователь: состояние списка берётся из кэша.
+        with self.assertNumQueries(2):
+            self.assertNotModified(
+                self.reader_client, url, if_none_match=etag
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Recipe.objects.create(
+                author=self.author, name="Оладьи", text="Описание",
+                cooking_time=5,
+            )
+        response = self.reader_client.get(
+            url, headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.json()["count"], 2)
+
+    def test_recipe_list_after_delete(self):
+        """Удаление не самого нового рецепта меняет ETag списка"""
+        models.Recipe.objects.create(
+            author=self.author, name="Оладьи", text="Описание",
+            cooking_time=5,
+        )
+        guest = Client()
+        url = "/api/recipes/?limit=6"
+        response = guest.get(url)
+        self.assertNotIn("Last-Modified", response)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        response = guest.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_user_profile(self):
+        """Профиль пользователя отвечает 304 до его изменения"""
+        url = f"/api/users/{self.author.id}/"
+        etag = self.reader_client.get(url)["ETag"]
+        self.assertNotModified(self.reader_client, url, if_none_match=etag)
+        self.author.first_name = "Шеф"
+        self.author.save()
+        response = self.reader_client.get(
+            url, headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.json()["first_name"], "Шеф")
+        etag = self.reader_client.get("/api/users/me/")["ETag"]
+        self.assertNotModified(
+            self.reader_client, "/api/users/me/", if_none_match=etag
+        )
+
+
+class ShortLinkTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = models.FoodgramUser.objects.create_user(
+            email="author@foodgram.ru", username="author",
+            first_name="Автор", last_name="Авторов", password="pass",
+        )
+        cls.recipe = models.Recipe.objects.create(
+            author=author, name="Блины", text="Описание", cooking_time=5
+        )
+
+    def setUp(self):
+        short_links.clear()
+
+    def test_codes(self):
+        """Коды base62 обратимы, неканоничные коды отклоняются"""
+        for value in (0, 1, 61, 62, 12345, 2 ** 63 - 1):
+            self.assertEqual(decode_code(encode_id(value)), value)
+        self.assertEqual(encode_id(12345), "3d7")
+        for code in ("", "03d7", "3-7"):
+            with self.assertRaises(ValueError):
+                decode_code(code)
+
+    def test_get_link_and_redirect(self):
+        """Короткая ссылка ведёт на страницу рецепта"""
+        response = self.client.get(f"/api/recipes/{self.recipe.id}/get-link/")
+        link = response.json()["short-link"]
+        self.assertEqual(
+            link, f"http://testserver/s/{encode_id(self.recipe.id)}/"
+        )
+        response = self.client.get(link)
+        self.assertRedirects(
+            response, f"/recipes/{self.recipe.id}/",
+            fetch_redirect_response=False,
+        )
+        # Повторный переход — из кэша, без сессии и запросов к базе.
+        with self.assertNumQueries(0):
+            response = self.client.get(link)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertNotIn("Vary", response)
+
+    def test_unknown_and_deleted_recipe(self):
+        """Неизвестный или удалённый рецепт — 404"""
+        code = encode_id(self.recipe.id)
+        self.client.get(f"/s/{code}/")
+        self.recipe.delete()
+        for url in (f"/s/{code}/", "/s/zzzzzz/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_recipe_deleted_in_other_process(self):
+        """Удаление рецепта в другом процессе сбрасывает запись кэша"""
+        code = encode_id(self.recipe.id)
+        self.client.get(f"/s/{code}/")
+        # LRU-кэш другого процесса удаление не очищает, общая версия
+        # рецепта меняется.
+        with mock.patch.object(short_links, "discard"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.delete()
+        response = self.client.get(f"/s/{code}/")
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class LeanApiApplicationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = models.FoodgramUser.objects.create_user(
+            email="user@foodgram.ru", username="user",
+            first_name="Пользователь", last_name="Обычный", password="pass",
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        # Как django.test.Client: обработчик WSGI закрывает соединение с
+        # базой в конце запроса, а тест идёт в одной транзакции.
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        self.full_application = mock.Mock(return_value=[b"full"])
+        self.application = LeanApiApplication(self.full_application)
+
+    def call(self, path, **headers):
+        start_response = mock.Mock()
+        response = self.application(
+            RequestFactory(**headers).get(path).environ, start_response
+        )
+        return response, start_response
+
+    def test_lean_chain_skips_session_middleware(self):
+        """В облегчённой цепочке нет слоёв сессий, CSRF и сообщений"""
+        chain = LeanApiHandler()._view_middleware
+        self.assertNotIn(
+            "CsrfViewMiddleware",
+            [middleware.__self__.__class__.__name__ for middleware in chain],
+        )
+
+    def test_token_request_uses_lean_handler(self):
+        """Запрос к API по токену обслуживает облегчённый обработчик"""
+        response, start_response = self.call(
+            "/api/users/me/", HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        start_response.assert_called_once()
+        self.assertEqual(start_response.call_args.args[0], "200 OK")
+        self.assertEqual(json.loads(b"".join(response))["username"], "user")
+        self.assertNotIn("X-Frame-Options", response)
+        self.full_application.assert_not_called()
+
+    def test_session_and_admin_requests_use_full_chain(self):
+        """Запросы с сессией и вне API проходят полную цепочку"""
+        self.call("/api/users/me/", HTTP_COOKIE="sessionid=abc")
+        self.call("/admin/login/")
+        self.assertEqual(self.full_application.call_count, 2)
+
+
+class FastJSONTestCase(TestCase):
+    data = {
+        "decimal": Decimal("1.50"),
+        "datetime": datetime(2024, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc),
+        "naive": datetime(2024, 1, 2, 3, 4, 5),
+        "date": date(2024, 1, 2),
+        "time": time(3, 4, 5),
+        "uuid": uuid.UUID(int=1),
+        "lazy": gettext_lazy("Рецепт"),
+        "text": "строка\u2028с\u2029разделителями",
+        1: (1, 2 ** 40),
+        "queryset": models.Ingredient.objects.none(),
+    }
+
+    def test_renderer_matches_drf(self):
+        """Вывод совпадает с JSONRenderer, в том числе без orjson"""
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(self.data), expected
+        )
+        self.assertIn(b"\\u2028", expected)
+        big = {"value": 2 ** 70}
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(big),
+            JSONRenderer().render(big),
+        )
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(
+                renderers.FastJSONRenderer().render(self.data), expected
+            )
+
+    def test_parser_matches_drf(self):
+        """Разбор совпадает с JSONParser, ошибки — ParseError"""
+        for body in (
+            '{"a": [1, 2.5, "ы", null], "b": 123456789012345678901234}',
+            '"\\ud800"',
+        ):
+            self.assertEqual(
+                FastJSONParser().parse(io.BytesIO(body.encode())),
+                JSONParser().parse(io.BytesIO(body.encode())),
+            )
+        for body in (b"{", b"NaN"):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body))
+
+    def test_api_uses_fast_json(self):
+        """Ответы и разбор тел запросов API идут через orjson"""
+        with mock.patch.object(
+            renderers.orjson, "dumps", wraps=renderers.orjson.dumps
+        ) as dumps:
+            response = self.client.post(
+                "/api/users/",
+                {
+                    "email": "user@foodgram.ru", "username": "user",
+                    "first_name": "Пользователь", "last_name": "Обычный",
+                    "password": "Sup3r-secret",
+                },
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.json()["username"], "user")
+        dumps.assert_called()
+
+
+def make_base64_image(size=(1600, 1200), image_format="JPEG", **options):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "orange").save(buffer, image_format, **options)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/{image_format.lower()};base64,{encoded}"
+
+
+@override_settings(JOBS_EAGER=True)
+class ImagePipelineTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = models.FoodgramUser.objects.create_user(
+            email="user@foodgram.ru", username="user",
+            first_name="Пользователь", last_name="Обычный", password="pass",
+        )
+        cls.ingredient = models.Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_login(self.user)
+
+    def create_recipe(self, image):
+        return self.client.post(
+            "/api/recipes/",
+            {
+                "name": "Рецепт", "text": "Описание", "cooking_time": 5,
+                "image": image,
+                "ingredients": [{"id": self.ingredient.id, "amount": 1}],
+            },
+            content_type="application/json",
+        )
+
+    def test_recipe_image_renditions(self):
+        """Оригинал без метаданных, рендишены в WebP и JPEG"""
+        exif = Image.Exif()
+        exif[0x010F] = "Камера"
+        response = self.create_recipe(
+            make_base64_image(exif=exif.tobytes())
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.CREATED, response.content
+        )
+        recipe = models.Recipe.objects.get()
+        with Image.open(recipe.image.path) as original:
+            self.assertFalse(original.getexif())
+        for rendition, size in (
+            ("card", (480, 320)), ("detail", (1200, 900)),
+            ("admin", (100, 100)),
+        ):
+            for fmt, image_format in (("webp", "WEBP"), ("jpeg", "JPEG")):
+                name = recipe.image.rendition_name(rendition, fmt)
+                with default_storage.open(name) as file:
+                    with Image.open(file) as image:
+                        self.assertEqual(image.size, size)
+                        self.assertEqual(image.format, image_format)
+
+        data = self.client.get(f"/api/recipes/{recipe.id}/").json()
+        self.assertTrue(
+            data["image_renditions"]["card"]["webp"].endswith(".card.webp")
+        )
+
+    @override_settings(JOBS_EAGER=False)
+    def test_pending_renditions_use_original(self):
+        """До построения рендишенов отдаются адреса оригинала"""
+        recipe_id = self.create_recipe(make_base64_image()).json()["id"]
+        data = self.client.get(f"/api/recipes/{recipe_id}/").json()
+        self.assertEqual(
+            {
+                url for formats in data["image_renditions"].values()
+                for url in formats.values()
+            },
+            {data["image"]},
+        )
+        jobs.Worker("test").run(burst=True)
+        data = self.client.get(f"/api/recipes/{recipe_id}/").json()
+        self.assertTrue(
+            data["image_renditions"]["card"]["webp"].endswith(".card.webp")
+        )
+
+    def test_existing_renditions_are_not_rewritten(self):
+        """Команда достраивает только недостающие рендишены"""
+        self.create_recipe(make_base64_image())
+        recipe = models.Recipe.objects.get()
+        missing = recipe.image.rendition_name("detail", "jpeg")
+        os.remove(default_storage.path(missing))
+        with mock.patch.object(
+            default_storage, "save_derived",
+            wraps=default_storage.save_derived,
+        ) as save_derived:
+            call_command("build_image_renditions", stdout=io.StringIO())
+        self.assertEqual(
+            [call.args[0] for call in save_derived.call_args_list],
+            [missing],
+        )
+        self.assertTrue(default_storage.exists(missing))
+
+    def test_oversized_image_is_rejected(self):
+        """Размеры проверяются до распаковки изображения"""
+        image = make_base64_image()
+        with override_settings(IMAGE_MAX_SIDE=1000):
+            with mock.patch.object(ImageFile.ImageFile, "load") as load:
+                response = self.create_recipe(image)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("image", response.json())
+        load.assert_not_called()
+
+    def test_avatar_renditions_are_deleted(self):
+        """Удаление аватара удаляет и его рендишены"""
+        response = self.client.put(
+            "/api/users/me/avatar/",
+            {"avatar": make_base64_image((64, 64), "PNG")},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn("avatar", response.json()["avatar_renditions"])
+        self.user.refresh_from_db()
+        names = self.user.avatar.rendition_names()
+        self.assertTrue(all(map(default_storage.exists, names)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete("/api/users/me/avatar/")
+        self.assertFalse(default_storage.exists(self.user.avatar.name))
+        self.assertFalse(any(map(default_storage.exists, names)))
+
+    def test_replaced_avatar_is_released(self):
+        """Заменённый аватар удаляется вместе с рендишенами"""
+        names = []
+        for color in ("red", "blue"):
+            buffer = io.BytesIO()
+            Image.new("RGB", (64, 64), color).save(buffer, "PNG")
+            encoded = base64.b64encode(buffer.getvalue()).decode()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.put(
+                    "/api/users/me/avatar/",
+                    {"avatar": f"data:image/png;base64,{encoded}"},
+                    content_type="application/json",
+                )
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.user.refresh_from_db()
+            names.append(self.user.avatar.name)
+        old, new = names
+        self.assertNotEqual(old, new)
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(new))
+        self.assertEqual(
+            list(models.StoredFile.objects.values_list("name", flat=True)),
+            [new],
+        )
+
+    def test_gc_media(self):
+        """gc_media убирает старые файлы без ссылок"""
+        response = self.create_recipe(make_base64_image((64, 48)))
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        image = models.Recipe.objects.get().image
+        kept = [image.name, *image.rendition_names()]
+        orphans = [
+            "recipes/images/orphan.jpg", "recipes/images/orphan.card.webp",
+            "users/old.png",
+        ]
+        for name in [*orphans, "recipes/images/young.jpg"]:
+            path = default_storage.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(b"x")
+        for name in [*orphans, *kept]:
+            os.utime(default_storage.path(name), (0, 0))
+
+        output = io.StringIO()
+        call_command("gc_media", "--dry-run", stdout=output)
+        self.assertIn("Будет удалено: 3 файлов", output.getvalue())
+        self.assertTrue(all(map(default_storage.exists, orphans)))
+
+        with tempfile.TemporaryDirectory() as quarantine:
+            call_command(
+                "gc_media", "--quarantine", quarantine, "--batch-size", "1",
+                stdout=io.StringIO(),
+            )
+            moved = [
+                os.path.relpath(os.path.join(path, name), quarantine)
+                for path, _, files in os.walk(quarantine) for name in files
+            ]
+        self.assertEqual(len(moved), 3)
+        self.assertFalse(any(map(default_storage.exists, orphans)))
+        self.assertTrue(all(map(default_storage.exists, kept)))
+        self.assertTrue(default_storage.exists("recipes/images/young.jpg"))
+
+    def test_identical_uploads_are_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом с подсчётом ссылок"""
+        image = make_base64_image((64, 48))
+        for _ in range(2):
+            response = self.create_recipe(image)
+            self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        first, second = models.Recipe.objects.order_by("id")
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertRegex(
+            name, r"^recipes/images/(\w\w)/(\w\w)/\1\2\w{60}\.jpg$"
+        )
+        self.assertEqual(
+            models.StoredFile.objects.get(name=name).refcount, 2
+        )
+        renditions = first.image.rendition_names()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.image.delete()
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(all(map(default_storage.exists, renditions)))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.image.delete()
+        self.assertFalse(models.StoredFile.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(any(map(default_storage.exists, renditions)))
+
+    def test_deleted_file_survives_rollback(self):
+        """Файл удаляется с диска только после фиксации транзакции"""
+        response = self.create_recipe(make_base64_image((64, 48)))
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipe = models.Recipe.objects.get()
+        with self.captureOnCommitCallbacks():
+            recipe.delete()
+        self.assertTrue(default_storage.exists(recipe.image.name))
+        self.assertEqual(
+            models.StoredFile.objects.get(name=recipe.image.name).refcount, 0
+        )
+
+
+@jobs.job(max_attempts=2)
+def record_job_call(value, fail=False):
+    JobQueueTestCase.calls.append(value)
+    if fail:
+        raise RuntimeError("Сбой задачи")
+
+
+class JobQueueTestCase(TestCase):
+    calls = []
+
+    def setUp(self):
+        JobQueueTestCase.calls = []
+
+    def test_worker_runs_and_deletes_job(self):
+        """Выполненная задача удаляется из очереди"""
+        job = jobs.enqueue(record_job_call, value=1)
+        self.assertEqual(job.name, record_job_call.job_name)
+        self.assertEqual(job.status, models.Job.Status.QUEUED)
+        self.assertEqual(self.calls, [])
+        jobs.Worker("test").run(burst=True)
+        self.assertEqual(self.calls, [1])
+        self.assertFalse(models.Job.objects.exists())
+
+    def test_delayed_job_waits(self):
+        """Отложенная задача не запускается раньше срока"""
+        jobs.enqueue(record_job_call, value=1, delay=60)
+        jobs.Worker("test").run(burst=True)
+        self.assertEqual(self.calls, [])
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        """Упавшая задача повторяется с паузой, затем помечается failed"""
+        job = jobs.enqueue(record_job_call, value=1, fail=True)
+        worker = jobs.Worker("test")
+        worker.run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.Status.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, job.created_at)
+        self.assertIn("Сбой задачи", job.last_error)
+        models.Job.objects.filter(pk=job.pk).update(run_at=job.created_at)
+        worker.run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_job_is_claimed_once(self):
+        """Задачу забирает только один обработчик"""
+        jobs.enqueue(record_job_call, value=1)
+        first = jobs.Worker("first").claim()
+        self.assertEqual(first.locked_by, "first")
+        self.assertIsNone(jobs.Worker("second").claim())
+
+    def test_stale_job_is_requeued(self):
+        """Задача пропавшего обработчика возвращается в очередь"""
+        job = jobs.enqueue(record_job_call, value=1)
+        jobs.Worker("lost").claim()
+        with override_settings(JOB_LOCK_TIMEOUT=-1):
+            jobs.Worker("test").requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.Status.QUEUED)
+        self.assertEqual(job.locked_by, "")
+
+    def test_eager_mode_runs_immediately(self):
+        with override_settings(JOBS_EAGER=True):
+            self.assertIsNone(jobs.enqueue(record_job_call, value=2))
+        self.assertEqual(self.calls, [2])
+        self.assertFalse(models.Job.objects.exists())
+
+
+class IngredientLoaderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, filename, text):
+        path = os.path.join(self.directory, filename)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+        return path
+
+    def load(self, *args):
+        output = io.StringIO()
+        call_command("load_initial_data", *args, stdout=output)
+        return output.getvalue()
+
+    def catalog(self):
+        return list(models.Ingredient.objects.order_by(
+            "name", "measurement_unit"
+        ).values_list("name", "measurement_unit"))
+
+    def test_formats_and_rerun(self):
+        """JSON, NDJSON и CSV загружаются без дублей при повторе"""
+        items = [
+            {"name": "сахар", "measurement_unit": "г"},
+            {"name": "соль", "measurement_unit": "г"},
+        ]
+        paths = [
+            self.write("a.json", json.dumps(items, ensure_ascii=False)),
+            self.write("b.ndjson", "\n".join(
+                json.dumps(item, ensure_ascii=False) for item in items
+            )),
+            self.write(
+                "c.csv", "name,measurement_unit\nсахар,г\nмолоко,мл\n"
+            ),
+        ]
+        for path in paths:
+            self.load(path, "--batch-size", "1")
+        output = self.load(paths[0])
+        self.assertIn("новых ингредиентов 0, пропущено 2", output)
+        self.assertEqual(
+            self.catalog(), [("молоко", "мл"), ("сахар", "г"), ("соль", "г")]
+        )
+        response = self.client.get("/api/ingredients/", {"name": "мол"})
+        self.assertEqual(
+            [item["name"] for item in response.json()], ["молоко"]
+        )
+
+    def test_skipped_rows_are_not_counted(self):
+        """Новые строки считаются по базе, а не по попыткам вставки"""
+        path = self.write("a.csv", "сахар,г\nсоль,г\n")
+        # bulk_create с ignore_conflicts может не вставить ни одной строки.
+        with mock.patch.object(
+            models.Ingredient.objects, "bulk_create"
+        ), mock.patch.object(
+            load_initial_data, "bump_catalog_version"
+        ) as bump:
+            output = self.load(path)
+        self.assertIn("новых ингредиентов 0, пропущено 2", output)
+        bump.assert_not_called()
+
+    def test_json_is_streamed(self):
+        """Массив JSON читается по частям"""
+        items = [
+            {"name": f"ингредиент {index}", "measurement_unit": "г"}
+            for index in range(50)
+        ]
+        with open(self.write("a.json", json.dumps(items))) as file:
+            self.assertEqual(
+                list(load_initial_data.iter_json_array(file, chunk_size=7)),
+                items,
+            )
+
+    def test_errors(self):
+        """Ошибки в файле не проглатываются"""
+        with self.assertRaisesMessage(CommandError, "не найден"):
+            self.load(os.path.join(self.directory, "missing.json"))
+        self.load(os.path.join(self.directory, "missing.json"), "--missing-ok")
+        with self.assertRaises(CommandError):
+            self.load(self.write("bad.json", '[{"name": "соль"'))
+        with self.assertRaisesMessage(CommandError, "Пустое название"):
+            self.load(
+                self.write("bad.csv", "сахар,г\n,г\n"), "--batch-size", "1"
+            )
+        # Пакеты до ошибки сохранены, повторный запуск их пропустит.
+        self.assertEqual(self.catalog(), [("сахар", "г")])
+
+
+class ImportLegacyDataTestCase(TestCase):
+    LEGACY_TABLES = {
+        "users_user": (
+            "id integer, password varchar, last_login datetime, "
+            "is_superuser bool, username varchar, first_name varchar, "
+            "last_name varchar, email varchar, is_staff bool, "
+            "is_active bool, date_joined datetime, is_subscribed bool"
+        ),
+        "users_subscription": "id integer, user_id integer, author_id integer",
+        "recipe_ingredient": (
+            "id integer, name varchar, measurement_unit varchar"
+        ),
+        "recipe_recipe": (
+            "id integer, author_id integer, name varchar, image varchar, "
+            "text text, cooking_time integer, pub_date datetime, "
+            "slug varchar, short_link varchar"
+        ),
+        "recipe_recipeingredient": (
+            "id integer, recipe_id integer, ingredient_id integer, "
+            "amount integer"
+        ),
+        "recipe_favorite": "id integer, user_id integer, recipe_id integer",
+        "recipe_shoppingcart": (
+            "id integer, user_id integer, recipe_id integer"
+        ),
+    }
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            for table, columns in self.LEGACY_TABLES.items():
+                cursor.execute(f"CREATE TABLE {table} ({columns})")
+            user = (
+                "'hash', NULL, 0, %s, 'Имя', 'Фамилия', %s, 0, 1, "
+                "'2024-01-01 00:00:00', 0"
+            )
+            cursor.execute(
+                f"INSERT INTO users_user VALUES (5, {user})",
+                ["cook", "cook@foodgram.ru"],
+            )
+            cursor.execute(
+                f"INSERT INTO users_user VALUES (9, {user})",
+                ["fan", "fan@foodgram.ru"],
+            )
+            cursor.executemany(
+                "INSERT INTO recipe_ingredient VALUES (%s, %s, %s)",
+                [(1, "соль", "г"), (2, "мука", "г")],
+            )
+            cursor.execute(
+                "INSERT INTO recipe_recipe VALUES (7, 5, 'Блины', "
+                "'recipes/images/1.png', 'Описание', 20, "
+                "'2024-02-01 10:00:00', 'bliny', 'abc')"
+            )
+            cursor.executemany(
+                "INSERT INTO recipe_recipeingredient VALUES (%s, 7, %s, %s)",
+                [(1, 1, 5), (2, 2, 300)],
+            )
+            cursor.execute("INSERT INTO users_subscription VALUES (1, 9, 5)")
+            cursor.execute("INSERT INTO recipe_favorite VALUES (1, 9, 7)")
+            cursor.execute("INSERT INTO recipe_shoppingcart VALUES (1, 9, 7)")
+        models.Ingredient.objects.create(name="соль", measurement_unit="г")
+
+    def test_import(self):
+        """Данные прежней схемы переносятся с сохранением id"""
+        call_command(
+            "import_legacy_data", source="default", stdout=io.StringIO()
+        )
+        recipe = models.Recipe.objects.get(pk=7)
+        self.assertEqual(recipe.author.email, "cook@foodgram.ru")
+        self.assertEqual(recipe.created_at.year, 2024)
+        self.assertEqual(sorted(
+            recipe.recipe_ingredients.values_list(
+                "ingredient__name", "amount"
+            )
+        ), [("мука", 300), ("соль", 5)])
+        self.assertEqual(models.Ingredient.objects.count(), 2)
+        fan = models.FoodgramUser.objects.get(pk=9)
+        self.assertTrue(fan.subscriptions.filter(author_id=5).exists())
+        self.assertTrue(models.Favorite.objects.filter(user=fan).exists())
+        self.assertTrue(models.ShoppingCart.objects.filter(user=fan).exists())
+        with self.assertRaises(CommandError):
+            call_command(
+                "import_legacy_data", source="default",
+                stdout=io.StringIO(),
+            )
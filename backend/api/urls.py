@@ -1,9 +1,11 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from .views import (
     FoodgramUserViewSet,
     RecipeViewSet,
     IngredientViewSet,
+    MetricsView,
+    ProfileView,
 )
 
 router = DefaultRouter()
@@ -12,6 +14,12 @@ router.register(r"recipes", RecipeViewSet, basename="recipes")
 router.register(r"ingredients", IngredientViewSet, basename="ingredients")
 
 urlpatterns = [
+    path("_metrics/", MetricsView.as_view(), name="metrics"),
+    re_path(
+        r"^_profiles/(?P<profile_id>[0-9a-f]{32})/$",
+        ProfileView.as_view(),
+        name="profile",
+    ),
     path("", include(router.urls)),
     path("auth/", include("djoser.urls.authtoken")),
 ]
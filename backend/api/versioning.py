@@ -0,0 +1,37 @@
+"""
+Версии закэшированных данных.
+
+Версия — случайная метка в кэше Django, которая входит в ключи
+производных данных. Смена метки делает старые записи недостижимыми во
+всех процессах, а потерянная (вытесненная) метка просто заменяется
+новой.
+"""
+from uuid import uuid4
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    """
+    Текущая версия по ключу key.
+    """
+    return cache.get_or_set(key, lambda: uuid4().hex, timeout=None)
+
+
+def get_versions(keys):
+    """
+    Текущие версии для нескольких ключей одним обращением к кэшу.
+    """
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return versions
+
+
+def bump_version(*keys):
+    """
+    Меняет версии по ключам keys.
+    """
+    cache.set_many({key: uuid4().hex for key in keys}, timeout=None)
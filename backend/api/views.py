@@ -1,16 +1,24 @@
-from django.http import FileResponse
-from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
-from rest_framework.decorators import action, api_view
-from rest_framework.permissions import (
-    AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
-)
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
-
+from rest_framework.views import APIView
+
+from .catalog import catalog_response
+from .conditional import conditional_get, make_etag
+from .fieldsets import SparseFieldset
+from .metrics import registry, render_prometheus
+from .profiling import ProfilingMixin, format_pstats, load_profile
+from .recipe_cache import RECIPE_LIST_VERSION_KEY, get_recipe_detail
+from .shortcodes import get_short_link_path
+from .versioning import get_version
 from .filters import RecipeFilter
 from .models import (
     Favorite,
@@ -20,11 +28,12 @@ from .models import (
     Subscription,
     FoodgramUser,
 )
-from .pagination import PageLimitPagination
+from .pagination import KeysetLimitPagination
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
     IngredientSerializer,
     RecipeReadSerializer,
+    RecipeReferenceSerializer,
     RecipeWriteSerializer,
     RecipeMinifiedSerializer,
     UserWithRecipesSerializer,
@@ -32,21 +41,35 @@ from .serializers import (
     UserAvatarSerializer,
 )
 from .services import (
-    generate_shopping_list,
-    get_shopping_cart_ingredients
+    SHOPPING_LIST_FORMATS,
+    change_cart_totals,
+    get_shopping_list_cache_key,
+    get_shopping_list_header,
+    get_shopping_list_pdf,
+    iter_shopping_list,
 )
 
 
-class FoodgramUserViewSet(UserViewSet):
+class FoodgramUserViewSet(ProfilingMixin, UserViewSet):
     queryset = FoodgramUser.objects.all()
     serializer_class = FoodgramUserSerializer
-    pagination_class = PageLimitPagination
+    pagination_class = KeysetLimitPagination
+    cursor_ordering = ("username", "id")
     permission_classes = [AllowAny]
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def me(self, request):
         return super().me(request)
 
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        return conditional_get(
+            request,
+            lambda: Response(self.get_serializer(user).data),
+            etag=make_etag(request, "user", user.pk, user.updated_at),
+            last_modified=user.updated_at,
+        )
+
     @action(
         detail=True, methods=["put", "delete"],
         permission_classes=[IsAuthenticated]
@@ -70,30 +93,57 @@ class FoodgramUserViewSet(UserViewSet):
             raise ValidationError(detail=serializer.errors)
 
         if user.avatar:
-            user.avatar.delete(save=False)
+            # Файл освобождается сигналом после сохранения.
             user.avatar = None
             user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
         raise ValidationError(detail="У пользователя нет аватара.")
 
+    @staticmethod
+    def _get_recipes_limit(request):
+        """
+        Значение параметра recipes_limit или None, если он не задан
+        или некорректен.
+        """
+        try:
+            return max(int(request.query_params["recipes_limit"]), 0)
+        except (KeyError, ValueError):
+            return None
+
     @action(detail=False, methods=["get"],
-            permission_classes=[IsAuthenticatedOrReadOnly])
+            permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         """
         Получение списка подписок текущего пользователя.
         """
-        user = request.user
-        authors = [subscription.author
-                   for subscription in user.subscriptions.all()]
+        recipes_limit = self._get_recipes_limit(request)
+        fieldset = SparseFieldset.from_request(request)
+        authors = FoodgramUser.objects.filter(
+            subscribers__user=request.user
+        ).with_recipes(
+            request.user, recipes_limit, self._get_output_fields(fieldset)
+        ).order_by(*self.cursor_ordering)
 
         # Пагинация
         return self.get_paginated_response(
             UserWithRecipesSerializer(
                 self.paginate_queryset(authors),
-                many=True, context={"request": request}
+                many=True, context={
+                    "request": request, "recipes_limit": recipes_limit,
+                    "fieldset": fieldset,
+                }
             ).data
         )
 
+    @staticmethod
+    def _get_output_fields(fieldset):
+        """
+        Поля UserWithRecipesSerializer, попадающие в вывод, или None.
+        """
+        if not fieldset:
+            return None
+        return fieldset.filter(UserWithRecipesSerializer.Meta.fields)
+
     @action(
         detail=True, methods=["post", "delete"],
         permission_classes=[IsAuthenticated]
@@ -112,8 +162,17 @@ class FoodgramUserViewSet(UserViewSet):
                 raise ValidationError(
                     detail="Вы уже подписаны на этого пользователя."
                 )
+            recipes_limit = self._get_recipes_limit(request)
+            fieldset = SparseFieldset.from_request(request)
             serializer = UserWithRecipesSerializer(
-                author, context={"request": request}
+                FoodgramUser.objects.with_recipes(
+                    request.user, recipes_limit,
+                    self._get_output_fields(fieldset),
+                ).get(pk=author.pk),
+                context={
+                    "request": request, "recipes_limit": recipes_limit,
+                    "fieldset": fieldset,
+                }
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -123,20 +182,117 @@ class FoodgramUserViewSet(UserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ProfilingMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrReadOnly]
-    pagination_class = PageLimitPagination
+    pagination_class = KeysetLimitPagination
+    cursor_ordering = ("-created_at", "-id")
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
     def get_serializer_class(self):
-        return (
-            RecipeWriteSerializer
-            if self.action in ["create", "update", "partial_update"]
-            else RecipeReadSerializer
+        if self.action in ["create", "update", "partial_update"]:
+            return RecipeWriteSerializer
+        if self.includes_users():
+            return RecipeReferenceSerializer
+        return RecipeReadSerializer
+
+    def includes_users(self):
+        """
+        Запрошен ли список рецептов с авторами в included.users
+        (?include=users).
+        """
+        return self.action == "list" and "users" in (
+            self.request.query_params.get("include", "").split(",")
+        )
+
+    def list(self, request, *args, **kwargs):
+        # Валидатор страницы — версия списка рецептов (без запросов к
+        # базе) и сама страница из URL. Last-Modified у списка нет:
+        # удаление рецепта не меняет дат оставшихся.
+        return conditional_get(
+            request,
+            lambda: self.get_list_response(request, *args, **kwargs),
+            etag=make_etag(
+                request, "recipes", request.get_full_path(),
+                get_version(RECIPE_LIST_VERSION_KEY),
+            ),
         )
 
+    def get_list_response(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if self.includes_users() and self.get_fieldset().includes("author"):
+            response.data["included"] = {"users": self.get_included_users({
+                recipe["author_id"] for recipe in response.data["results"]
+            })}
+        return response
+
+    def get_included_users(self, author_ids):
+        """
+        Авторы рецептов страницы, каждый один раз. Флаг is_subscribed
+        для всех считается в том же запросе.
+        """
+        fieldset = self.get_fieldset().child("author").require("id")
+        authors = FoodgramUser.objects.filter(pk__in=author_ids).for_viewer(
+            self.request.user,
+            fieldset.filter(FoodgramUserSerializer.Meta.fields),
+        ).order_by("id")
+        return FoodgramUserSerializer(
+            authors, many=True, context=self.get_serializer_context(),
+            fieldset=fieldset,
+        ).data
+
+    def retrieve(self, request, *args, **kwargs):
+        # Ответ собирается из кэша, только флаги зрителя — из базы.
+        pk = self.kwargs["pk"]
+        if not pk.isdigit():
+            raise Http404
+        state = Recipe.objects.filter(pk=pk).values(
+            "updated_at", "author__updated_at"
+        ).first()
+        if state is None:
+            raise Http404
+        return conditional_get(
+            request,
+            lambda: Response(self.get_fieldset().prune(
+                get_recipe_detail(int(pk), request)
+            )),
+            etag=make_etag(
+                request, "recipe", pk, *state.values(),
+                repr(self.get_fieldset()),
+            ),
+            last_modified=max(state.values()),
+        )
+
+    def get_fieldset(self):
+        """
+        Поля вывода, выбранные параметрами ?fields= и ?omit=.
+        """
+        return SparseFieldset.from_request(self.request)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ("list", "retrieve"):
+            context["fieldset"] = self.get_fieldset()
+        return context
+
+    def get_queryset(self):
+        if self.action in ("list", "retrieve"):
+            fieldset = self.get_fieldset()
+            if not fieldset and not self.includes_users():
+                return Recipe.objects.for_viewer(self.request.user)
+            fields = fieldset.filter(RecipeReadSerializer.Meta.fields)
+            if self.includes_users():
+                # Авторы выбираются отдельно, в get_included_users.
+                fields = [name for name in fields if name != "author"]
+            return Recipe.objects.for_viewer(
+                self.request.user, fields,
+                fieldset.child("author").filter(
+                    FoodgramUserSerializer.Meta.fields
+                ),
+            )
+        return Recipe.objects.all()
+
     @staticmethod
     def _handle_recipe_action(model, user, recipe, request_method):
         """
@@ -148,9 +304,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         :return: Response с данными или ошибкой.
         """
         if request_method == "POST":
-            _, created = model.objects.get_or_create(
-                user=user, recipe=recipe
-            )
+            with transaction.atomic():
+                _, created = model.objects.get_or_create(
+                    user=user, recipe=recipe
+                )
+                if created and model is ShoppingCart:
+                    change_cart_totals(user.id, recipe.id)
 
             if not created:
                 raise ValidationError(detail=(
@@ -161,7 +320,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         elif request_method == "DELETE":
-            get_object_or_404(model, user=user, recipe=recipe).delete()
+            with transaction.atomic():
+                get_object_or_404(model, user=user, recipe=recipe).delete()
+                if model is ShoppingCart:
+                    change_cart_totals(user.id, recipe.id, sign=-1)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         raise ValidationError(detail="Некорректное действие.")
@@ -190,53 +352,131 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self._handle_recipe_action(
             ShoppingCart, request.user, recipe, request.method)
 
-    @action(detail=False, permission_classes=[IsAuthenticatedOrReadOnly])
+    @action(detail=True, url_path="get-link", permission_classes=[AllowAny])
+    def get_link(self, request, pk=None):
+        """
+        Возвращает короткую ссылку на рецепт.
+        """
+        recipe = self.get_object()
+        return Response({
+            "short-link": request.build_absolute_uri(
+                get_short_link_path(recipe.id)
+            )
+        })
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        ingredients = get_shopping_cart_ingredients(request.user)
+        """
+        Выгрузка списка покупок в формате txt (по умолчанию), csv, json
+        или pdf.
+
+        Готовый документ кэшируется по содержимому корзины; без кэша
+        он генерируется потоком. Длинный PDF строится в фоне: до его
+        готовности ответ 202, запрос нужно повторить.
+        """
+        file_format = request.query_params.get("file_format", "txt")
+        if file_format == "pdf":
+            return self.download_shopping_cart_pdf(request)
+        if file_format not in SHOPPING_LIST_FORMATS:
+            raise ValidationError(detail=(
+                "Поддерживаемые форматы: "
+                f"{', '.join(SHOPPING_LIST_FORMATS)}, pdf."
+            ))
+        _, _, content_type, extension = SHOPPING_LIST_FORMATS[file_format]
+
+        cache_key = get_shopping_list_cache_key(request.user, file_format)
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(
+                get_shopping_list_header(file_format) + content,
+                content_type=content_type,
+            )
+        else:
+            response = StreamingHttpResponse(
+                iter_shopping_list(request.user, file_format, cache_key),
+                content_type=content_type,
+            )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{extension}"'
+        )
+        return response
 
-        recipes = (
-            Recipe.objects.filter(shoppingcarts__user=request.user).distinct()
+    def download_shopping_cart_pdf(self, request):
+        pdf = get_shopping_list_pdf(
+            request.user, get_shopping_list_cache_key(request.user, "pdf")
         )
+        if pdf is None:
+            return Response(
+                {"detail": "Список покупок готовится, повторите запрос."},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Retry-After": "5"},
+            )
+        response = HttpResponse(pdf, content_type="application/pdf")
+        response["Content-Disposition"] = (
+            'attachment; filename="shopping_list.pdf"'
+        )
+        return response
+
 
-        shopping_list = generate_shopping_list(ingredients, recipes)
+class IngredientViewSet(ProfilingMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Ingredient.objects.all()
+    serializer_class = IngredientSerializer
 
-        return FileResponse(shopping_list,
-                            content_type="text/plain; charset=utf-8",
-                            filename="shopping_list.txt")
+    def list(self, request, *args, **kwargs):
+        # Список и автодополнение отдаются из каталога в памяти.
+        return catalog_response(request, request.query_params.get("name", ""))
+
+    def get_queryset(self):
+        name = self.request.GET.get("name")
+        if name:
+            return self.queryset.filter(name__istartswith=name)
+        return self.queryset
 
 
-@api_view(["GET"])
-def get_recipe_short_link(request, id):
+class MetricsView(APIView):
     """
-    Создает и возвращает короткую ссылку на рецепт.
+    Гистограммы времени ответа и числа запросов к БД по маршрутам
+    в формате Prometheus.
     """
-    # Предварительная валидация: проверяем, что id является ключом рецепта
-    get_object_or_404(Recipe, id=id)
 
-    return Response(
-        {
-            "short-link": request.build_absolute_uri(
-                reverse("redirect_short_link", kwargs={"short_id": id})
-            )
-        },
-        status=status.HTTP_200_OK,
-    )
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus(registry.collect()),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
 
 
-def redirect_short_link(request, short_id):
+class ProfileView(APIView):
     """
-    Перенаправляет с короткой ссылки на страницу рецепта.
+    Сохранённый профиль запроса: метаданные, журнал SQL и сводка.
+    С параметром ?download=1 отдаётся файл профилировщика (pstats
+    или speedscope JSON).
     """
-    get_object_or_404(Recipe, id=short_id)
-    return redirect(f"recipes/{short_id}")
 
+    permission_classes = [IsAdminUser]
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Ingredient.objects.all()
-    serializer_class = IngredientSerializer
-
-    def get_queryset(self):
-        name = self.request.GET.get("name")
-        if name:
-            return self.queryset.filter(name__istartswith=name)
-        return self.queryset
+    def get(self, request, profile_id):
+        profile = load_profile(profile_id)
+        if profile is None:
+            return Response(
+                {"detail": "Профиль не найден."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        meta, data = profile
+        if request.query_params.get("download"):
+            if meta["mode"] == "sample":
+                filename = f"{profile_id}.speedscope.json"
+            else:
+                filename = f"{profile_id}.prof"
+            response = HttpResponse(
+                data, content_type="application/octet-stream"
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="{filename}"'
+            )
+            return response
+        if meta["mode"] == "cprofile":
+            meta["summary"] = format_pstats(data)
+        return Response(meta)
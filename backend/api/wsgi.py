@@ -0,0 +1,98 @@
+"""
+Отдельный обработчик WSGI для запросов к API.
+
+API аутентифицирует по токену и не использует сессии, сообщения, CSRF
+и X-Frame-Options. MIDDLEWARE остаётся полной цепочкой Django (её
+используют админка, браузерный API DRF и тестовый клиент), а
+LeanApiApplication направляет запросы к LEAN_API_PREFIXES, у которых
+нет cookie сессии или есть заголовок Authorization: Token, в
+LeanApiHandler — обработчик с той же цепочкой без слоёв
+LEAN_API_SKIPPED_MIDDLEWARE.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.core.handlers.wsgi import WSGIHandler, get_path_info
+from django.http import parse_cookie
+from django.utils.module_loading import import_string
+
+DEFAULT_LEAN_API_SKIPPED_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+
+def get_lean_api_middleware():
+    skipped = getattr(
+        settings, "LEAN_API_SKIPPED_MIDDLEWARE",
+        DEFAULT_LEAN_API_SKIPPED_MIDDLEWARE,
+    )
+    return [path for path in settings.MIDDLEWARE if path not in skipped]
+
+
+def is_lean_environ(environ):
+    """
+    Можно ли обработать запрос без сессий, CSRF и сообщений.
+    """
+    prefixes = tuple(getattr(settings, "LEAN_API_PREFIXES", ("/api/",)))
+    if not prefixes or not get_path_info(environ).startswith(prefixes):
+        return False
+    if environ.get("HTTP_AUTHORIZATION", "").startswith("Token "):
+        return True
+    return settings.SESSION_COOKIE_NAME not in parse_cookie(
+        environ.get("HTTP_COOKIE", "")
+    )
+
+
+class LeanApiHandler(WSGIHandler):
+    """
+    Обработчик WSGI с цепочкой get_lean_api_middleware().
+    """
+
+    # Повторяет синхронную ветку BaseHandler.load_middleware, которая
+    # всегда читает settings.MIDDLEWARE.
+    def load_middleware(self, is_async=False):
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+        handler = convert_exception_to_response(self._get_response)
+        for path in reversed(get_lean_api_middleware()):
+            try:
+                middleware = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if middleware is None:
+                raise ImproperlyConfigured(
+                    f"Middleware factory {path} returned None."
+                )
+            if hasattr(middleware, "process_view"):
+                self._view_middleware.insert(0, middleware.process_view)
+            if hasattr(middleware, "process_template_response"):
+                self._template_response_middleware.append(
+                    middleware.process_template_response
+                )
+            if hasattr(middleware, "process_exception"):
+                self._exception_middleware.append(
+                    middleware.process_exception
+                )
+            handler = convert_exception_to_response(middleware)
+        self._middleware_chain = handler
+
+
+class LeanApiApplication:
+    """
+    Выбирает обработчик для каждого запроса: облегчённый для запросов
+    к API по токену или без сессии, application для остальных.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.lean_application = LeanApiHandler()
+
+    def __call__(self, environ, start_response):
+        if is_lean_environ(environ):
+            return self.lean_application(environ, start_response)
+        return self.application(environ, start_response)
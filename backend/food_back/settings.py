@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,15 +28,21 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'users',
-    'recipe',
     'rest_framework',
     'rest_framework.authtoken',
-    'djoser'
+    'djoser',
+    'django_filters',
+    'api',
 ]
 
+AUTH_USER_MODEL = 'api.FoodgramUser'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # /s/<код>/ обслуживается до сессий, CSRF и сообщений.
+    'api.shortcodes.ShortLinkMiddleware',
+    'api.metrics.ServerTimingMiddleware',
+    'api.querybudget.QueryInspectorMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -44,6 +51,18 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Запросы к API по токену или без сессии food_back.wsgi передаёт
+# обработчику api.wsgi.LeanApiHandler: цепочка MIDDLEWARE без слоёв
+# LEAN_API_SKIPPED_MIDDLEWARE.
+LEAN_API_PREFIXES = ('/api/',)
+LEAN_API_SKIPPED_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
 ROOT_URLCONF = 'food_back.urls'
 
 TEMPLATES = [
@@ -63,12 +82,34 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'food_back.wsgi.application'
 
-DATABASES = {
-    'default': {
+# В docker-compose база общая у backend и обработчиков очереди
+# (run_workers): PostgreSQL из сервиса db, параметры в .env.
+if os.getenv('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB'),
+            'USER': os.getenv('POSTGRES_USER', 'django'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'db'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Прежняя база приложений users и recipe, из которой данные переносит
+# команда import_legacy_data (см. README.md).
+if os.getenv('LEGACY_SQLITE_PATH'):
+    DATABASES['legacy'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('LEGACY_SQLITE_PATH'),
     }
-}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -95,4 +136,77 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Том media в infra/docker-compose.yml монтируется в /app/media/, откуда
+# файлы отдаёт nginx.
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Общий кэш процессов gunicorn и обработчиков очереди: через него
+# версии (api.versioning) сбрасывают кэши во всех процессах сразу.
+# Без REDIS_URL кэш свой у каждого процесса (runserver, тесты).
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Кэш проверки токенов (api.authentication).
+AUTH_TOKEN_CACHE_TTL = 300
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_SHARED = True
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# X-Query-Count/X-Query-Time и предупреждения о N+1 в логе. Включается
+# явно (QUERY_INSPECTOR=1), а не вместе с DEBUG: подсчёт запросов
+# замедляет каждый ответ.
+QUERY_INSPECTOR = os.getenv('QUERY_INSPECTOR', '').lower() in ('1', 'true')
+
+# Общий каталог для метрик воркеров gunicorn (/api/_metrics/).
+METRICS_DIR = os.getenv('METRICS_DIR')
+
+# Профили запросов администраторов (X-Profile, ?_profile=).
+PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/foodgram-profiles')
+PROFILE_RATE_LIMIT = 10
+PROFILE_MAX_COUNT = 100
+
+# Очередь фоновых задач (api.jobs, manage.py run_workers).
+JOBS_EAGER = False
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10
+JOB_RETRY_MAX_DELAY = 3600
+JOB_LOCK_TIMEOUT = 600
+
+# Каталог ингредиентов для load_initial_data (JSON, NDJSON или CSV)
+INGREDIENTS_FILE = os.getenv(
+    'INGREDIENTS_FILE', BASE_DIR / 'ingredients.json'
+)
+
+# Загруженные файлы именуются по хэшу содержимого (api.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
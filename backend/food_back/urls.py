@@ -5,9 +5,7 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/auth/', include('djoser.urls.authtoken')),
-    path('api/', include('users.urls')),
-    path('api/', include('recipe.urls')),
+    path('api/', include('api.urls')),
 ]
 
 if settings.DEBUG:
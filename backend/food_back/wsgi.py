@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_back.settings')
 
 application = get_wsgi_application()
+
+# Запросы к API по токену обслуживаются без сессий, CSRF и сообщений.
+from api.wsgi import LeanApiApplication  # noqa: E402
+
+application = LeanApiApplication(application)
@@ -1,25 +0,0 @@
-from django.contrib import admin
-from django.contrib.auth.models import User
-from django.contrib.auth.admin import UserAdmin
-from .models import Recipe, Ingredient
-
-@admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('name', 'measurement_unit')
-    search_fields = ('name',)
-
-@admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
-    search_fields = ('name', 'author__username')
-   
-    def favorite_count(self, obj):
-        return obj.favorites.count()
-    favorite_count.short_description = 'Количество добавлений в избранное'
-
-
-class CustomUserAdmin(UserAdmin):
-    search_fields = ('username', 'email')
-
-admin.site.unregister(User)
-admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
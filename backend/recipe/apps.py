@@ -1,6 +0,0 @@
-from django.apps import AppConfig
-
-
-class RecipeConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'recipe'
@@ -1,89 +0,0 @@
-# Generated by Django 5.2.1 on 2025-05-31 08:59
-
-import django.core.validators
-from django.db import migrations, models
-
-
-class Migration(migrations.Migration):
-
-    initial = True
-
-    dependencies = [
-    ]
-
-    operations = [
-        migrations.CreateModel(
-            name='Favorite',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-            ],
-            options={
-                'verbose_name': 'favorite',
-                'verbose_name_plural': 'favorites',
-            },
-        ),
-        migrations.CreateModel(
-            name='Ingredient',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('name', models.CharField(max_length=200, verbose_name='ingredient name')),
-                ('measurement_unit', models.CharField(max_length=200, verbose_name='measurement unit')),
-            ],
-            options={
-                'verbose_name': 'ingredient',
-                'verbose_name_plural': 'ingredients',
-            },
-        ),
-        migrations.CreateModel(
-            name='Recipe',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('name', models.CharField(max_length=200, verbose_name='recipe name')),
-                ('image', models.ImageField(upload_to='recipes/images/', verbose_name='image')),
-                ('text', models.TextField(verbose_name='description')),
-                ('cooking_time', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='cooking time')),
-                ('pub_date', models.DateTimeField(auto_now_add=True, verbose_name='publication date')),
-                ('slug', models.SlugField(blank=True, max_length=200, unique=True, verbose_name='slug')),
-                ('short_link', models.CharField(blank=True, max_length=8, unique=True, verbose_name='short link')),
-            ],
-            options={
-                'verbose_name': 'recipe',
-                'verbose_name_plural': 'recipes',
-                'ordering': ['-pub_date'],
-            },
-        ),
-        migrations.CreateModel(
-            name='RecipeIngredient',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('amount', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='amount')),
-            ],
-            options={
-                'verbose_name': 'recipe ingredient',
-                'verbose_name_plural': 'recipe ingredients',
-            },
-        ),
-        migrations.CreateModel(
-            name='ShoppingCart',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-            ],
-            options={
-                'verbose_name': 'shopping cart',
-                'verbose_name_plural': 'shopping carts',
-            },
-        ),
-        migrations.CreateModel(
-            name='Tag',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('name', models.CharField(max_length=200, unique=True, verbose_name='tag name')),
-                ('color', models.CharField(max_length=7, unique=True, verbose_name='color in HEX')),
-                ('slug', models.SlugField(max_length=200, unique=True, verbose_name='slug')),
-            ],
-            options={
-                'verbose_name': 'tag',
-                'verbose_name_plural': 'tags',
-            },
-        ),
-    ]